@@ -0,0 +1,294 @@
+import os
+import queue
+import logging
+import threading
+from contextlib import contextmanager, closing
+from datetime import datetime
+
+# ################################################################################
+# #                           Database Configurations
+# ################################################################################
+# Read when a backend is created rather than at import, so the .env file
+# loaded by the CLI at startup applies
+
+def db_config():
+    """Return the MySQL connection settings from the environment."""
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),  # Default to localhost
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASSWORD", ""),
+        "database": os.getenv("DB_NAME"),
+    }
+
+def sqlite_path():
+    """Return the SQLite database file from the environment."""
+    return os.getenv("SQLITE_PATH", "alysio.db")
+
+# ################################################################################
+# #                           Backend Interface
+# ################################################################################
+
+class Backend:
+    """Runs the staging -> validate -> upsert flow against one database engine.
+
+    Loaders only talk to the database through a backend: they insert staging
+    rows with ``cursor.executemany`` using ``placeholder`` and call the methods
+    below for everything the MySQL build implements as stored procedures.
+    """
+
+    name = None
+    placeholder = "%s"
+    Error = Exception
+    # Prefix of the target tables (alysio.*) for queries run outside the procedures
+    targets = ""
+
+    @contextmanager
+    def connect(self):
+        """Yield an open connection; roll back on error and always close it."""
+        connection = self._connect()
+        try:
+            yield connection
+        except Exception:
+            connection.rollback()
+            logging.warning("Transaction rolled back due to error.")
+            raise
+        finally:
+            connection.close()
+
+    @contextmanager
+    def cursor(self, connection):
+        """Yield a cursor on the connection and close it afterwards."""
+        with closing(connection.cursor()) as cursor:
+            yield cursor
+
+    @contextmanager
+    def streaming_cursor(self, connection):
+        """Yield a cursor that fetches rows from the server as they are read, for large scans."""
+        with self.cursor(connection) as cursor:
+            yield cursor
+
+    def _connect(self):
+        raise NotImplementedError
+
+    # Batch Functions
+    def insert_batch_record(self, cursor):
+        """Insert a new record into the batch table and return its ID."""
+        start_time = datetime.now()
+        insert_query = f"""
+        INSERT INTO batch (start_time, status)
+        VALUES ({self.placeholder}, {self.placeholder})
+        """
+        cursor.execute(insert_query, (start_time.strftime("%Y-%m-%d %H:%M:%S"), 'IN_PROGRESS'))
+        return cursor.lastrowid
+
+    def update_batch_record(self, cursor, batch_id, exceptions=None):
+        """Update the batch record with end time, status and any non-fatal exceptions."""
+        end_time = datetime.now()
+        update_query = f"""
+        UPDATE batch
+        SET end_time = {self.placeholder}, status = {self.placeholder}, exceptions = {self.placeholder}
+        WHERE id = {self.placeholder}
+        """
+        if exceptions is not None:
+            exceptions = exceptions[:500]
+        cursor.execute(update_query, (end_time.strftime("%Y-%m-%d %H:%M:%S"), 'COMPLETED', exceptions, batch_id))
+
+    def fail_batch_record(self, batch_id, error):
+        """Mark the batch as failed on a fresh connection; only logs if the database cannot be reached."""
+        try:
+            with self.connect() as connection:
+                with self.cursor(connection) as cursor:
+                    cursor.execute(f"""
+                        UPDATE batch
+                        SET status = {self.placeholder}, exceptions = {self.placeholder}
+                        WHERE id = {self.placeholder}
+                    """, ('FAILED', f"Error: {error}"[:500], batch_id))
+                    connection.commit()
+        except self.Error as err:
+            logging.error("Could not mark batch %d as failed: %s", batch_id, err)
+
+    # Source Manifest
+    def get_source_manifest(self, cursor, entity):
+        """Return the manifest rows of the entity keyed by file path."""
+        cursor.execute(f"""
+        SELECT file_path, size, mtime_ns, sha256, batch_id
+        FROM source_manifest
+        WHERE entity = {self.placeholder}
+        """, (entity,))
+        return {
+            file_path: {"size": size, "mtime_ns": mtime_ns, "sha256": sha256, "batch_id": batch_id}
+            for file_path, size, mtime_ns, sha256, batch_id in cursor.fetchall()
+        }
+
+    def record_source_manifest(self, cursor, entity, fingerprints, batch_id):
+        """Replace the manifest rows of the entity with the files loaded by the batch."""
+        loaded_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.execute(f"DELETE FROM source_manifest WHERE entity = {self.placeholder}", (entity,))
+        placeholders = ', '.join([self.placeholder] * 7)
+        cursor.executemany(f"""
+        INSERT INTO source_manifest (entity, file_path, size, mtime_ns, sha256, batch_id, loaded_at)
+        VALUES ({placeholders})
+        """, [
+            (entity, fp["file_path"], fp["size"], fp["mtime_ns"], fp["sha256"], batch_id, loaded_at)
+            for fp in fingerprints
+        ])
+
+    def max_packet_bytes(self, cursor):
+        """Return the largest statement the server accepts, or None if unlimited."""
+        return None
+
+    # Execute Procedures
+    def truncate_staging_tables(self, cursor, tables):
+        raise NotImplementedError
+
+    def run_validations(self, cursor):
+        raise NotImplementedError
+
+    def upsert(self, cursor, entity, batch_id):
+        raise NotImplementedError
+
+    def soft_delete_missing(self, cursor, entity, batch_id):
+        raise NotImplementedError
+
+    def refresh_summaries(self, cursor, batch_id):
+        raise NotImplementedError
+
+    def rebuild_summaries(self, cursor):
+        raise NotImplementedError
+
+    def maintain_activity_partitions(self, cursor, months_ahead, retain_months):
+        raise NotImplementedError
+
+
+# ################################################################################
+# #                           MySQL Backend
+# ################################################################################
+
+class MySQLBackend(Backend):
+    """MySQL server with the stored procedures from schema/procedures.sql."""
+
+    name = "mysql"
+    placeholder = "%s"
+    targets = "alysio."
+
+    UPSERT_PROCEDURES = {
+        "companies": "UpsertCompanies",
+        "contacts": "UpsertContacts",
+        "opportunities": "UpsertOpportunities",
+        "activities": "UpsertActivities",
+    }
+
+    def __init__(self, config=None):
+        import mysql.connector
+
+        self.connector = mysql.connector
+        self.Error = mysql.connector.Error
+        self.config = config or db_config()
+
+    def _connect(self):
+        return self.connector.connect(**self.config)
+
+    @contextmanager
+    def streaming_cursor(self, connection):
+        """Yield an unbuffered cursor; fetchmany pulls rows from the server instead of a client-side copy"""
+        with closing(connection.cursor(buffered=False)) as cursor:
+            yield cursor
+
+    def max_packet_bytes(self, cursor):
+        """Return max_allowed_packet; executemany sends one multi-row INSERT per chunk"""
+        cursor.execute("SELECT @@max_allowed_packet")
+        return int(cursor.fetchone()[0])
+
+    def truncate_staging_tables(self, cursor, tables):
+        """Truncate the given staging tables"""
+        for table in tables:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+
+    def run_validations(self, cursor):
+        """Run Validations"""
+        cursor.execute("CALL run_validations()")
+
+    def upsert(self, cursor, entity, batch_id):
+        """Upsert staged rows of the entity into its target table"""
+        cursor.execute(f"CALL {self.UPSERT_PROCEDURES[entity]}(%s)", (batch_id,))
+
+    def soft_delete_missing(self, cursor, entity, batch_id):
+        """Tombstone the rows of the entity missing from its staging table; return how many"""
+        cursor.execute("CALL SoftDeleteMissing(%s, %s, @deleted)", (entity, batch_id))
+        cursor.execute("SELECT @deleted")
+        return int(cursor.fetchone()[0])
+
+    def refresh_summaries(self, cursor, batch_id):
+        """Fold the rows changed by the batch into the summary tables"""
+        cursor.execute("CALL RefreshSummaries(%s)", (batch_id,))
+
+    def rebuild_summaries(self, cursor):
+        """Recompute the summary tables from scratch"""
+        cursor.execute("CALL RebuildSummaries()")
+
+    def maintain_activity_partitions(self, cursor, months_ahead, retain_months):
+        """Create future activity partitions and archive expired ones"""
+        cursor.execute("CALL MaintainActivityPartitions(%s, %s)", (months_ahead, retain_months))
+
+
+# ################################################################################
+# #                           Connection Pool
+# ################################################################################
+
+class ConnectionPool:
+    """Up to size open connections of a backend, shared by reader threads.
+
+    Connections are opened on first use and lent to one thread at a time.
+    Each loan ends with a rollback, so a pooled MySQL connection does not
+    keep reading the snapshot of its previous transaction. A connection
+    that raised is closed instead of returned.
+    """
+
+    def __init__(self, backend, size):
+        self.backend = backend
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """Yield a pooled connection, waiting while all of them are in use."""
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self.backend._connect()
+
+            healthy = False
+            try:
+                yield connection
+                connection.rollback()
+                healthy = True
+            finally:
+                if healthy:
+                    self._idle.put(connection)
+                else:
+                    connection.close()
+
+    def close(self):
+        """Close the idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# ################################################################################
+# #                           Backend Factory
+# ################################################################################
+
+def get_backend(name=None):
+    """Return the backend selected by name or the DB_BACKEND environment variable."""
+    name = (name or os.getenv("DB_BACKEND", "mysql")).lower()
+    if name == "mysql":
+        return MySQLBackend()
+    if name == "sqlite":
+        from sqlite_backend import SQLiteBackend
+
+        return SQLiteBackend()
+    raise ValueError(f"Unknown DB_BACKEND '{name}', expected 'mysql' or 'sqlite'.")
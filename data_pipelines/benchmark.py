@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from backends import Backend
+from profiling import time_stages, stop_timing
+from source_files import resolve_source_files
+from pipeline import ENTITIES, SOURCE_DIRECTORY
+
+# Baseline the harness compares against, and the drop in rows/sec that
+# counts as a regression
+BASELINE_PATH = os.getenv("BENCHMARK_BASELINE", "benchmark_baseline.json")
+REGRESSION_THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", 0.2))
+
+# Client-side stages reported per entity; 'load' is the whole loader call
+BENCHMARK_STAGES = ['read', 'normalize', 'validate', 'dates', 'encode', 'load']
+
+# ################################################################################
+# #                           Recording Backend
+# ################################################################################
+
+class RecordingCursor:
+    """DB-API cursor stand-in that records statements instead of running them."""
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = {}
+        self.params = 0
+        self.lastrowid = 0
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.statements += 1
+        self.params += len(params or ())
+        self.rowcount = 0
+        if query.lstrip().upper().startswith('INSERT'):
+            self.lastrowid += 1
+            self.rowcount = 1
+
+    def executemany(self, query, rows):
+        table = query.split()[2]
+        self.statements += 1
+        self.rows[table] = self.rows.get(table, 0) + len(rows)
+        self.params += sum(len(row) for row in rows)
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+class RecordingConnection:
+    """Connection stand-in handing out one RecordingCursor."""
+
+    def __init__(self):
+        self.recorder = RecordingCursor()
+        self.commits = 0
+
+    def cursor(self):
+        return self.recorder
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+class RecordingBackend(Backend):
+    """Backend without a server: procedure calls are recorded as statements and return nothing."""
+
+    name = "recording"
+    placeholder = "%s"
+
+    def _connect(self):
+        return RecordingConnection()
+
+    def truncate_staging_tables(self, cursor, tables):
+        for table in tables:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+
+    def run_validations(self, cursor):
+        cursor.execute("CALL run_validations()")
+
+    def upsert(self, cursor, entity, batch_id):
+        cursor.execute(f"CALL Upsert{entity.capitalize()}(%s)", (batch_id,))
+
+    def soft_delete_missing(self, cursor, entity, batch_id):
+        cursor.execute("CALL SoftDeleteMissing(%s, %s, @deleted)", (entity, batch_id))
+        return 0
+
+    def refresh_summaries(self, cursor, batch_id):
+        cursor.execute("CALL RefreshSummaries(%s)", (batch_id,))
+
+    def rebuild_summaries(self, cursor):
+        cursor.execute("CALL RebuildSummaries()")
+
+    def maintain_activity_partitions(self, cursor, months_ahead, retain_months):
+        cursor.execute("CALL MaintainActivityPartitions(%s, %s)", (months_ahead, retain_months))
+
+# ################################################################################
+# #                           Throughput Measurement
+# ################################################################################
+
+def measure_entity(backend, loader, table_name, entity, file_paths):
+    """Run the loader once against the recording backend; return rows and seconds per stage."""
+    timer = time_stages()
+    try:
+        with backend.connect() as connection:
+            with backend.cursor(connection) as cursor:
+                started = time.perf_counter()
+                loader(backend, cursor, file_paths)
+                seconds = {"load": time.perf_counter() - started}
+                rows = cursor.rows.get(table_name, 0)
+                statements, params = cursor.statements, cursor.params
+    finally:
+        stop_timing()
+
+    for (stage_entity, name), total in timer.totals.items():
+        if stage_entity == entity and name in BENCHMARK_STAGES:
+            seconds[name] = total["seconds"]
+    return {"rows": rows, "statements": statements, "params": params, "seconds": seconds}
+
+def run_benchmark(repeat=3, sources=None):
+    """Load every entity repeat times and return the best rows/sec per entity and stage."""
+    backend = RecordingBackend()
+    sources = sources or {}
+    results = {}
+
+    for entity, file_name, table_name, loader in ENTITIES:
+        file_paths = resolve_source_files(SOURCE_DIRECTORY, file_name, sources.get(entity))
+        runs = [measure_entity(backend, loader, table_name, entity, file_paths) for _ in range(repeat)]
+        rows = runs[0]["rows"]
+        results[entity] = {
+            "rows": rows,
+            "statements": runs[0]["statements"],
+            "params": runs[0]["params"],
+            # Best of the runs, so a busy machine does not read as a regression
+            "rows_per_sec": {
+                name: round(max(rows / run["seconds"][name] for run in runs if run["seconds"].get(name)))
+                for name in BENCHMARK_STAGES
+                if rows and all(run["seconds"].get(name) for run in runs)
+            },
+        }
+    return results
+
+def find_regressions(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return a message for every stage whose rows/sec fell more than threshold below the baseline."""
+    regressions = []
+    for entity, expected in baseline.items():
+        measured = results.get(entity, {}).get("rows_per_sec", {})
+        for name, expected_rate in expected.get("rows_per_sec", {}).items():
+            rate = measured.get(name)
+            if rate is not None and rate < expected_rate * (1 - threshold):
+                regressions.append(f"{entity}.{name}: {rate} rows/s, baseline {expected_rate} rows/s "
+                                   f"({rate / expected_rate - 1:+.0%})")
+    return regressions
+
+def format_results(results):
+    """Return the results as a table with one line per entity."""
+    lines = [f"{'entity':<14}{'rows':>8}{'stmts':>7}{'params':>9}"
+             + "".join(f"{name + ' r/s':>15}" for name in BENCHMARK_STAGES)]
+    for entity, result in results.items():
+        lines.append(f"{entity:<14}{result['rows']:>8}{result['statements']:>7}{result['params']:>9}"
+                     + "".join(f"{result['rows_per_sec'].get(name, '-'):>15}" for name in BENCHMARK_STAGES))
+    return "\n".join(lines)
+
+# ################################################################################
+# #                           Main Function
+# ################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure client-side rows/sec of the loaders against a recording cursor, without a database.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per entity; the best one is reported.")
+    parser.add_argument('--baseline', help=f"Baseline JSON to compare against (default: {BASELINE_PATH}). "
+                                           "Given explicitly, a missing file fails the run.")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Allowed drop in rows/sec below the baseline, e.g. 0.2 for 20%%.")
+    parser.add_argument('--save-baseline', action='store_true', help="Write the results as the new baseline.")
+    parser.add_argument('--source', action='append', default=[], metavar='ENTITY=PATH',
+                        help="File, directory or glob of shards to load for an entity. Can be repeated.")
+    args = parser.parse_args(argv)
+    baseline_path = args.baseline or BASELINE_PATH
+
+    # The loaders log every chunk; keep the report readable
+    logging.getLogger().setLevel(logging.WARNING)
+    sources = dict(source.partition('=')[::2] for source in args.source)
+    results = run_benchmark(args.repeat, sources)
+    print(format_results(results))
+
+    if args.save_baseline:
+        with open(baseline_path, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Baseline written to {baseline_path}.")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; run with --save-baseline to create one.")
+        return 1 if args.baseline else 0
+
+    with open(baseline_path) as baseline_file:
+        regressions = find_regressions(results, json.load(baseline_file), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
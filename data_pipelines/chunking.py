@@ -0,0 +1,132 @@
+import os
+import logging
+import threading
+
+# Rows per chunk to start from, and the bounds the controller stays within
+INITIAL_CHUNK_ROWS = int(os.getenv("LOAD_CHUNK_ROWS", 10000))
+MIN_CHUNK_ROWS = int(os.getenv("LOAD_MIN_CHUNK_ROWS", 500))
+MAX_CHUNK_ROWS = int(os.getenv("LOAD_MAX_CHUNK_ROWS", 200000))
+
+# Resident memory the loader should stay under; unset disables the check
+MEMORY_CEILING_MB = os.getenv("LOAD_MEMORY_CEILING_MB")
+
+# Growth and back-off factors, and the change in rows/sec that counts as
+# better or worse rather than noise
+GROWTH_FACTOR = 1.5
+SHRINK_FACTOR = 0.75
+THROUGHPUT_TOLERANCE = 0.05
+
+# Share of the memory ceiling above which chunks stop growing
+MEMORY_GROWTH_LIMIT = 0.9
+
+# Share of max_allowed_packet one multi-row INSERT may fill
+PACKET_HEADROOM = 0.8
+
+# ################################################################################
+# #                           Process Memory
+# ################################################################################
+
+def current_rss_bytes():
+    """Return the resident set size of this process, or None if it cannot be read."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+# ################################################################################
+# #                           Chunk Size Controller
+# ################################################################################
+
+class AdaptiveChunker:
+    """Chooses the number of rows per chunk while an entity is loading.
+
+    Readers ask for ``size`` before each chunk; the loader reports every
+    insert round trip with ``record``. The size keeps growing while rows/sec
+    improve, and reverses direction when they drop. It is capped so one INSERT fits in
+    the server's max_allowed_packet, and halved whenever the process RSS is
+    above the memory ceiling. Thread-safe, since shards are read in parallel.
+    """
+
+    def __init__(self, name, max_packet_bytes=None, memory_ceiling_bytes=None,
+                 initial_rows=INITIAL_CHUNK_ROWS, min_rows=MIN_CHUNK_ROWS, max_rows=MAX_CHUNK_ROWS):
+        self.name = name
+        self.max_packet_bytes = max_packet_bytes
+        self.memory_ceiling_bytes = memory_ceiling_bytes
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self._size = max(min_rows, min(initial_rows, max_rows))
+        self._rate = None
+        self._direction = 1
+        self._row_bytes = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_backend(cls, backend, cursor, name):
+        """Return a chunker limited by the backend's packet size and LOAD_MEMORY_CEILING_MB."""
+        ceiling = int(MEMORY_CEILING_MB) * 1024 * 1024 if MEMORY_CEILING_MB else None
+        return cls(name, backend.max_packet_bytes(cursor), ceiling)
+
+    @property
+    def size(self):
+        with self._lock:
+            return self._size
+
+    def _packet_limit(self):
+        if not self.max_packet_bytes or not self._row_bytes:
+            return self.max_rows
+        return max(self.min_rows, int(self.max_packet_bytes * PACKET_HEADROOM / self._row_bytes))
+
+    def record(self, rows, seconds, row_bytes=None):
+        """Adjust the chunk size after inserting rows in seconds.
+
+        row_bytes is the estimated size of one row in the INSERT statement.
+        """
+        if rows <= 0 or seconds <= 0:
+            return
+
+        with self._lock:
+            previous = self._size
+            rate = rows / seconds
+            if row_bytes:
+                # Keep the widest rows seen so the packet cap stays safe
+                self._row_bytes = max(self._row_bytes or 0, row_bytes)
+
+            rss = current_rss_bytes() if self.memory_ceiling_bytes else None
+            near_ceiling = rss is not None and rss > self.memory_ceiling_bytes * MEMORY_GROWTH_LIMIT
+            if rss is not None and rss > self.memory_ceiling_bytes:
+                self._size = int(self._size / 2)
+                self._direction = -1
+                reason = f"RSS {rss // (1024 * 1024)} MB above the ceiling"
+            else:
+                # Hill climbing on smoothed rows/sec: keep moving the size in the
+                # direction that helped and turn around when throughput drops
+                smoothed = rate if self._rate is None else (rate + self._rate) / 2
+                if self._rate is None or smoothed > self._rate * (1 + THROUGHPUT_TOLERANCE):
+                    step = self._direction
+                    reason = f"throughput improved to {smoothed:.0f} rows/s"
+                elif smoothed < self._rate * (1 - THROUGHPUT_TOLERANCE):
+                    self._direction = -self._direction
+                    step = self._direction
+                    reason = f"throughput dropped to {smoothed:.0f} rows/s"
+                else:
+                    step = 0
+                    reason = None
+                self._rate = smoothed
+
+                if step > 0 and not near_ceiling:
+                    self._size = int(self._size * GROWTH_FACTOR)
+                elif step < 0:
+                    self._size = int(self._size * SHRINK_FACTOR)
+
+            self._size = max(self.min_rows, min(self._size, self.max_rows, self._packet_limit()))
+            if self._size != previous:
+                logging.info("Chunk size for %s: %d -> %d rows (%s).", self.name, previous, self._size,
+                             reason or "max_allowed_packet")
@@ -0,0 +1,170 @@
+import sys
+import logging
+import argparse
+import importlib
+
+# Per-entity loaders in foreign key order: (module, batch function). Modules
+# are imported only when their entity runs, so pandas and pandera are not
+# loaded for --help, bad arguments or runs whose sources are unchanged
+ENTITIES = {
+    'companies': ('load_csv_to_mysql_for_companies', 'Companies_csv_to_DB'),
+    'contacts': ('load_json_to_mysql_for_contacts', 'Contacts_json_to_DB'),
+    'opportunities': ('load_csv_to_mysql_for_opportunities', 'Opportunities_csv_to_DB'),
+    'activities': ('load_json_to_mysql_for_activities', 'Activies_json_to_DB'),
+}
+
+# Runs every entity, in its own batch or with --single-batch in one
+ALL_COMMAND = 'all'
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# ################################################################################
+# #                           Startup
+# ################################################################################
+
+def load_environment():
+    """Load the .env file into the environment, if python-dotenv is installed."""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+def configure_logging(log_file=None):
+    """Log to stdout and to log_file if given; rows rejected by inserts go to failed_rows.log."""
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=handlers)
+
+    fail_handler = logging.FileHandler('failed_rows.log', delay=True)  # Only created on the first failed row
+    fail_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    logging.getLogger('fail_logger').addHandler(fail_handler)
+
+def load_entity(entity):
+    """Import the loader module of the entity and return it."""
+    return importlib.import_module(ENTITIES[entity][0])
+
+# ################################################################################
+# #                           Arguments
+# ################################################################################
+
+def parse_args(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--force', action='store_true',
+                        help="Reload even if the source files are unchanged since the last load.")
+    common.add_argument('--snapshot', action='store_true',
+                        help="Treat the sources as a full extract: rows no longer in them are soft-deleted. "
+                             "Skipped for an entity when any of its shards failed or lost invalid chunks.")
+    common.add_argument('--export', nargs='?', const='export', default=None, metavar='DIR',
+                        help="After each batch, export the rows it touched to Parquet under "
+                             "DIR/<entity>/batch_id=<N>/ (default: export).")
+    common.add_argument('--profile', nargs='?', const='profiles', default=None, metavar='DIR',
+                        help="Profile each stage (read, normalize, validate, dates, encode, executemany, procedures) "
+                             "per entity and write .prof files and stages.csv under DIR (default: profiles).")
+    common.add_argument('--log-file', metavar='FILE',
+                        help="Also write the log to FILE. An entity command defaults to its loader's log file.")
+
+    parser = argparse.ArgumentParser(
+        prog='main',
+        description="Load the Salesforce extracts into the database. Without a command, every entity is loaded.")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+    run_all = commands.add_parser(ALL_COMMAND, parents=[common], help="Load every entity in foreign key order.")
+    run_all.add_argument('--single-batch', action='store_true',
+                         help="Load all entities in one batch with a single validation pass and commit.")
+    run_all.add_argument('--source', action='append', default=[], metavar='ENTITY=PATH',
+                         help="File, directory or glob of shards to load for an entity, "
+                              "e.g. activities='data/salesforce/activities/part-*.json'. Can be repeated.")
+
+    for entity in ENTITIES:
+        run_entity = commands.add_parser(entity, parents=[common], help=f"Load {entity} in its own batch.")
+        run_entity.add_argument('--source', metavar='PATH',
+                                help=f"File, directory or glob of {entity} shards to load.")
+
+    # `python main [--force ...]` without a command keeps loading every entity
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or (argv[0] not in commands.choices and argv[0] not in ('-h', '--help')):
+        argv.insert(0, ALL_COMMAND)
+    args = parser.parse_args(argv)
+
+    if args.command == ALL_COMMAND:
+        args.sources = {}
+        for source in args.source:
+            entity, _, path = source.partition('=')
+            if entity not in ENTITIES or not path:
+                run_all.error(f"--source expects ENTITY=PATH with ENTITY one of {', '.join(ENTITIES)}, got '{source}'.")
+            args.sources[entity] = path
+    else:
+        args.sources = {args.command: args.source} if args.source else {}
+    return args
+
+# ################################################################################
+# #                           Main Function
+# ################################################################################
+
+def main(argv=None):
+    args = parse_args(argv)
+    load_environment()
+
+    from profiling import enable_profiling, write_profiles
+
+    if args.command == ALL_COMMAND:
+        configure_logging(args.log_file)
+    else:
+        configure_logging(args.log_file or load_entity(args.command).LOG_FILE)
+
+    if args.profile:
+        enable_profiling(args.profile)
+    try:
+        succeeded = run(args)
+    finally:
+        write_profiles()
+    return 0 if succeeded else 1
+
+def export(batch_id, entities, output_dir):
+    """Export the rows the committed batch touched; return False if that failed. The load stands either way."""
+    from export import export_batch
+
+    return export_batch(batch_id, entities, output_dir) is not None
+
+def run(args):
+    """Run the loads of the command; return False if any of them or their exports failed.
+
+    A load whose sources are unchanged counts as a success. A failed entity
+    does not stop the ones after it.
+    """
+    from source_manifest import UNCHANGED
+
+    if args.command == ALL_COMMAND and args.single_batch:
+        from pipeline import run_pipeline
+
+        logging.info("Starting single-batch ETL run.")
+        batch_id = run_pipeline(force=args.force, sources=args.sources, snapshot=args.snapshot)
+        if batch_id is None:
+            logging.error("Single-batch ETL run failed.")
+            return False
+        if batch_id is UNCHANGED:
+            logging.info("Single-batch ETL run loaded nothing.")
+        elif args.export:
+            return export(batch_id, list(ENTITIES), args.export)
+        return True
+
+    succeeded = True
+    entities = list(ENTITIES) if args.command == ALL_COMMAND else [args.command]
+    for entity in entities:
+        func = getattr(load_entity(entity), ENTITIES[entity][1])
+        script_name = func.__name__  # Get the function name dynamically
+        logging.info(f"Starting ETL script: {script_name}")
+
+        # Call the function
+        batch_id = func(force=args.force, source=args.sources.get(entity), snapshot=args.snapshot)
+
+        if batch_id is None:
+            logging.error(f"ETL script {script_name} failed.")
+            succeeded = False
+            continue
+        logging.info(f"ETL script {script_name} completed successfully.")
+        if batch_id is not UNCHANGED and args.export and not export(batch_id, [entity], args.export):
+            succeeded = False
+    return succeeded
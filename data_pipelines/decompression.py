@@ -0,0 +1,123 @@
+import io
+import os
+import gzip
+import queue
+import threading
+
+# Source extensions decompressed on the fly
+COMPRESSION_FORMATS = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+
+# Decompressed bytes handed over per block, and how many blocks the
+# background thread may run ahead of the parser
+DECOMPRESS_BLOCK_SIZE = 1024 * 1024
+DECOMPRESS_QUEUE_BLOCKS = 8
+
+# ################################################################################
+# #                           Compression Formats
+# ################################################################################
+
+def compression_format(file_path):
+    """Return 'gzip' or 'zstd' for compressed files, None otherwise."""
+    return COMPRESSION_FORMATS.get(os.path.splitext(file_path)[1].lower())
+
+def strip_compression(file_path):
+    """Return the path without its compression extension, e.g. contacts.json for contacts.json.gz."""
+    if compression_format(file_path):
+        return os.path.splitext(file_path)[0]
+    return file_path
+
+def open_decompressed(file_path, compression):
+    """Open a blocking binary stream of the decompressed file."""
+    if compression == 'gzip':
+        return gzip.open(file_path, 'rb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("Reading .zst files requires the 'zstandard' package.") from e
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+    raise ValueError(f"Unknown compression format '{compression}'.")
+
+# ################################################################################
+# #                           Threaded Reader
+# ################################################################################
+
+class ThreadedDecompressor(io.RawIOBase):
+    """Read-only stream whose data is decompressed by a background thread.
+
+    The thread decompresses the file block by block into a bounded queue, so
+    decompression overlaps with parsing in the reading thread and memory use
+    stays at a few blocks. Errors raised by the thread are re-raised on read.
+    """
+
+    def __init__(self, file_path, compression):
+        super().__init__()
+        self._blocks = queue.Queue(maxsize=DECOMPRESS_QUEUE_BLOCKS)
+        self._buffer = memoryview(b'')
+        self._eof = False
+        self._error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._produce,
+            args=(file_path, compression),
+            name=f"decompress-{os.path.basename(file_path)}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _produce(self, file_path, compression):
+        try:
+            with open_decompressed(file_path, compression) as stream:
+                while not self._stop.is_set():
+                    block = stream.read(DECOMPRESS_BLOCK_SIZE)
+                    self._put(block)
+                    if not block:
+                        return
+        except Exception as e:
+            self._error = e
+            self._put(b'')
+
+    def _put(self, block):
+        # Wait for room in the queue, but give up once the reader has closed
+        while not self._stop.is_set():
+            try:
+                self._blocks.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            if self._eof:
+                return 0
+            block = self._blocks.get()
+            if not block:
+                self._eof = True
+                if self._error is not None:
+                    raise self._error
+                return 0
+            self._buffer = memoryview(block)
+
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+        super().close()
+
+def open_source(file_path):
+    """Open a source file for binary reading, decompressing .gz and .zst files in a background thread."""
+    compression = compression_format(file_path)
+    if compression is None:
+        return open(file_path, 'rb')
+    return io.BufferedReader(ThreadedDecompressor(file_path, compression), DECOMPRESS_BLOCK_SIZE)
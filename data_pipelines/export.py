@@ -0,0 +1,223 @@
+import os
+import sys
+import logging
+import argparse
+from decimal import Decimal
+from functools import lru_cache
+from backends import get_backend
+from profiling import stage
+
+# Root of the Parquet dataset: <EXPORT_DIRECTORY>/<entity>/batch_id=<N>/part-0.parquet
+EXPORT_DIRECTORY = os.getenv("EXPORT_DIRECTORY", "export")
+
+# Rows fetched from the server per round trip; each fetch is written as one row group
+EXPORT_FETCH_ROWS = int(os.getenv("EXPORT_FETCH_ROWS", 50000))
+EXPORT_COMPRESSION = os.getenv("EXPORT_COMPRESSION", "zstd")
+
+# Target tables in foreign key order
+EXPORT_ENTITIES = ['companies', 'contacts', 'opportunities', 'activities']
+
+# ################################################################################
+# #                           Schema
+# ################################################################################
+
+@lru_cache(maxsize=None)
+def export_schemas():
+    """Build the Arrow schema of every exported table on first use, so pyarrow is only imported for exports.
+
+    batch_id is the partition key and lives in the directory name, not in
+    the files. Tombstones are exported too, with is_deleted set.
+    """
+    import pyarrow
+
+    timestamp = pyarrow.timestamp('us')
+    tombstone = [
+        ("is_deleted", pyarrow.bool_()),
+        ("deleted_batch_id", pyarrow.int32()),
+    ]
+    return {
+        "companies": pyarrow.schema([
+            ("company_id", pyarrow.int32()),
+            ("source_id", pyarrow.string()),
+            ("name", pyarrow.string()),
+            ("domain", pyarrow.string()),
+            ("industry", pyarrow.string()),
+            ("size", pyarrow.string()),
+            ("country", pyarrow.string()),
+            ("created_date", timestamp),
+            ("is_customer", pyarrow.bool_()),
+            ("annual_revenue", pyarrow.int64()),
+            *tombstone,
+        ]),
+        "contacts": pyarrow.schema([
+            ("contact_id", pyarrow.int32()),
+            ("source_id", pyarrow.string()),
+            ("email", pyarrow.string()),
+            ("first_name", pyarrow.string()),
+            ("last_name", pyarrow.string()),
+            ("title", pyarrow.string()),
+            ("company_id", pyarrow.int32()),
+            ("phone", pyarrow.string()),
+            ("status", pyarrow.string()),
+            ("created_date", timestamp),
+            ("last_modified", timestamp),
+            *tombstone,
+        ]),
+        "opportunities": pyarrow.schema([
+            ("opportunity_id", pyarrow.int32()),
+            ("source_id", pyarrow.string()),
+            ("name", pyarrow.string()),
+            ("contact_id", pyarrow.int32()),
+            ("company_id", pyarrow.int32()),
+            ("amount", pyarrow.decimal128(15, 2)),
+            ("stage", pyarrow.string()),
+            ("product", pyarrow.string()),
+            ("probability", pyarrow.uint8()),
+            ("created_date", timestamp),
+            ("close_date", timestamp),
+            ("is_closed", pyarrow.bool_()),
+            ("forecast_category", pyarrow.string()),
+            *tombstone,
+        ]),
+        "activities": pyarrow.schema([
+            ("activity_id", pyarrow.int32()),
+            ("source_id", pyarrow.string()),
+            ("contact_id", pyarrow.int32()),
+            ("opportunity_id", pyarrow.int32()),
+            ("type", pyarrow.string()),
+            ("subject", pyarrow.string()),
+            ("timestamp", timestamp),
+            ("duration_minutes", pyarrow.uint16()),
+            ("outcome", pyarrow.string()),
+            ("notes", pyarrow.string()),
+            *tombstone,
+        ]),
+    }
+
+def to_array(column, field):
+    """Return one fetched column as an Arrow array of the field's type.
+
+    The type is inferred from the driver's values and then cast, which
+    covers MySQL's typed values (datetime, 0/1 booleans) as well as SQLite's
+    text dates. Decimals go through Decimal(str()), since SQLite returns
+    amounts as int or float.
+    """
+    import pyarrow
+
+    if pyarrow.types.is_decimal(field.type):
+        return pyarrow.array([None if value is None else Decimal(str(value)) for value in column], type=field.type)
+    return pyarrow.array(column).cast(field.type)
+
+def rows_to_table(rows, schema):
+    """Return the fetched rows as an Arrow table of the schema."""
+    import pyarrow
+
+    columns = list(zip(*rows))
+    return pyarrow.Table.from_arrays([to_array(column, field) for column, field in zip(columns, schema)], schema=schema)
+
+# ################################################################################
+# #                           Export Functions
+# ################################################################################
+
+def partition_path(output_dir, entity, batch_id):
+    """Return the Parquet file of the entity's rows for the batch."""
+    return os.path.join(output_dir, entity, f"batch_id={batch_id}", "part-0.parquet")
+
+def export_entity(backend, connection, entity, batch_id, output_dir=EXPORT_DIRECTORY):
+    """Write the rows of the entity stamped with batch_id to Parquet; return the row count.
+
+    The rows are streamed through a server-side cursor, EXPORT_FETCH_ROWS at
+    a time, and each fetch is written as one row group, so memory stays flat
+    whatever the batch size. The file is written under a temporary name and
+    renamed when complete, so readers never see a partial file. A batch
+    that did not touch the entity writes nothing.
+    """
+    import pyarrow.parquet
+
+    schema = export_schemas()[entity]
+    path = partition_path(output_dir, entity, batch_id)
+    temp_path = path + ".tmp"
+    writer = None
+    rows_written = 0
+
+    with stage('export', entity):
+        with backend.streaming_cursor(connection) as cursor:
+            cursor.execute(f"""
+            SELECT {', '.join(schema.names)}
+            FROM {backend.targets}{entity}
+            WHERE batch_id = {backend.placeholder}
+            """, (batch_id,))
+            try:
+                while True:
+                    rows = cursor.fetchmany(EXPORT_FETCH_ROWS)
+                    if not rows:
+                        break
+                    if writer is None:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        writer = pyarrow.parquet.ParquetWriter(temp_path, schema, compression=EXPORT_COMPRESSION)
+                    writer.write_table(rows_to_table(rows, schema))
+                    rows_written += len(rows)
+            except Exception:
+                if writer is not None:
+                    writer.close()
+                    os.remove(temp_path)
+                raise
+            if writer is not None:
+                writer.close()
+
+    if writer is None:
+        logging.info("Batch %d did not touch %s, nothing to export.", batch_id, entity)
+        return 0
+    os.replace(temp_path, path)
+    logging.info("Exported %d %s rows of batch %d to %s.", rows_written, entity, batch_id, path)
+    return rows_written
+
+def latest_completed_batch(backend, cursor):
+    """Return the ID of the latest COMPLETED batch, or None."""
+    cursor.execute(f"SELECT MAX(id) FROM batch WHERE status = {backend.placeholder}", ('COMPLETED',))
+    return cursor.fetchone()[0]
+
+def export_batch(batch_id=None, entities=None, output_dir=EXPORT_DIRECTORY, backend=None):
+    """Export the rows touched by the batch (default: the latest COMPLETED one); return rows per entity, or None if failed."""
+    backend = backend or get_backend()
+    entities = entities or EXPORT_ENTITIES
+
+    try:
+        with backend.connect() as connection:
+            if batch_id is None:
+                with backend.cursor(connection) as cursor:
+                    batch_id = latest_completed_batch(backend, cursor)
+                if batch_id is None:
+                    logging.info("No completed batch to export.")
+                    return {}
+
+            return {entity: export_entity(backend, connection, entity, batch_id, output_dir) for entity in entities}
+
+    except backend.Error as err:
+        logging.error("Database error occurred: %s", err)
+
+    except Exception as ex:
+        logging.critical("An unexpected error occurred while exporting batch %s: %s", batch_id, ex)
+
+# ################################################################################
+# #                           Main Function
+# ################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export the target rows touched by a batch to Parquet, partitioned by entity and batch_id.")
+    parser.add_argument('--batch-id', type=int, help="Batch to export (default: the latest COMPLETED batch).")
+    parser.add_argument('--entity', action='append', choices=EXPORT_ENTITIES,
+                        help="Entity to export (default: all). Can be repeated.")
+    parser.add_argument('--output', default=EXPORT_DIRECTORY, metavar='DIR',
+                        help=f"Root of the Parquet dataset (default: {EXPORT_DIRECTORY}).")
+    args = parser.parse_args(argv)
+
+    from cli import load_environment, configure_logging
+
+    load_environment()
+    configure_logging()
+    return 0 if export_batch(args.batch_id, args.entity, args.output) is not None else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
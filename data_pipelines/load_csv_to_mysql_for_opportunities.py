@@ -1,267 +1,156 @@
-import mysql.connector
-from mysql.connector import Error
-import pandas as pd
-import pandera as pa
-from pandera.errors import SchemaErrors
-from pandera.typing import Series
-from pandera import Column, Check
-import os
+import sys
 import logging
-from datetime import datetime
-from dotenv import load_dotenv
+from functools import lru_cache
+from backends import get_backend
+from source_manifest import skip_unchanged_sources, complete_sources, UNCHANGED
+from profiling import stage
+from source_files import resolve_source_files, describe_failed_shards
+from snapshots import soft_delete_missing
+from normalization import standardize_opportunity_names
 
-
-# ################################################################################
-# #                           Database Configurations
-# ################################################################################
-load_dotenv()
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "localhost"),  # Default to localhost
-    "user": os.getenv("DB_USER", "root"),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "database": os.getenv("DB_NAME"),
-}
-
-logging.basicConfig(
-    level=logging.INFO,  # Set the logging level
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("load_csv_to_mysql_for_opportunities.log"),  # Main log file
-        logging.StreamHandler()  # Also log to console
-    ]
-)
-
-# Dedicated logger for failed rows
-fail_logger = logging.getLogger('fail_logger')
-fail_logger.setLevel(logging.ERROR)
-fail_handler = logging.FileHandler('failed_rows.log')  # Log for failed rows
-fail_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-fail_logger.addHandler(fail_handler)
-# ################################################################################
-# #                           Batch Functions
-# ################################################################################
-
-def insert_batch_record(cursor):
-    """Insert a new record into the batch table and return its ID."""
-    start_time = datetime.now()
-    insert_query = """
-    INSERT INTO batch (start_time, status)
-    VALUES (%s, %s)
-    """
-    cursor.execute(insert_query, (start_time, 'IN_PROGRESS'))
-    return cursor.lastrowid
-
-def update_batch_record(cursor, batch_id):
-    """Update the batch record with end time and status."""
-    end_time = datetime.now()
-    update_query = """
-    UPDATE batch
-    SET end_time = %s, status = %s
-    WHERE id = %s
-    """
-    cursor.execute(update_query, (end_time, 'COMPLETED', batch_id))
-    
-# ################################################################################
-# #                           Execute Procedures
-# ################################################################################
-
-def truncate_staging_tables(cursor):
-    """Truncate all staging tables"""
-    query = """
-    Truncate Table stg_opportunities
-    """
-    cursor.execute(query)
-    return
-
-def run_validations(cursor):
-    """Run Validations"""
-    query = """
-    CALL run_validations()
-    """
-    cursor.execute(query)
-    return
-
-def upsert_opportunities(cursor,batch_id):
-    """Upsert Opportunities Data"""
-    query = """
-    CALL UpsertOpportunities(%s)
-    """
-    cursor.execute(query,(batch_id,))
-    return
+# Log file of the opportunities loader when it runs on its own
+LOG_FILE = "load_csv_to_mysql_for_opportunities.log"
 
 # ################################################################################
 # #                           Processing Functions
 # ################################################################################
 
-def load_opportunities(cursor, file_path):
-    """Process and load opportunities.csv."""
+def load_opportunities(backend, cursor, file_paths):
+    """Process and load the opportunities shards; return (staged, failed) per shard."""
+    from staging import load_csv_to_db
+
     opportunities_headers = [
-        'id', 
-        'name', 
-        'contact_id', 
-        'company_id', 
-        'amount', 
-        'stage', 
-        'product', 
-        'probability', 
-        'created_date', 
-        'close_date', 
-        'is_closed', 
+        'id',
+        'name',
+        'contact_id',
+        'company_id',
+        'amount',
+        'stage',
+        'product',
+        'probability',
+        'created_date',
+        'close_date',
+        'is_closed',
         'forecast_category'
     ]
     datetime_columns =[
-        'created_date', 
+        'created_date',
         'close_date'
     ]
-    print(f"Processing: {file_path}")
-    load_csv_to_db(cursor, file_path, opportunities_headers, datetime_columns, 'stg_opportunities')
+    logging.info("Processing files: %s", file_paths)
+    return load_csv_to_db(backend, cursor, file_paths, opportunities_headers, datetime_columns, 'stg_opportunities', opportunity_schema(),
+                          domains=opportunity_domains, normalizers=opportunity_normalizers)
 
 # ################################################################################
-# #                           Loading Functions
-# ################################################################################    
-
-# Define the schema for opportunities
-OpportunitySchema = pa.DataFrameSchema({
-    "id": Column(pa.String, nullable=False),
-    "name": Column(pa.String, nullable=False),
-    "contact_id": Column(pa.String, nullable=False),
-    "company_id": Column(pa.String, nullable=False),  # Assuming `atr` meant `str`
-    "amount": Column(pa.Int, nullable=False),
-    "stage": Column(pa.String, nullable=False),
-    "product": Column(pa.String, nullable=False),
-    "probability": Column(pa.Int, nullable=False),
-    "created_date": Column(
-        pa.String, 
-        nullable=False, 
-        checks=Check(lambda s: pd.to_datetime(s, errors="coerce").notna(), 
-                     error="Invalid date format in created_date")
-    ),
-    "close_date": Column(
-        pa.String, 
-        nullable=False, 
-        checks=Check(lambda s: pd.to_datetime(s, errors="coerce").notna(), 
-                     error="Invalid date format in close_date")
-    ),
-    "is_closed": Column(pa.Bool, nullable=False),
-    "forecast_category": Column(pa.String, nullable=False),
-})
-
-# Modify the load_csv_to_db function to include validation
-def load_csv_to_db(cursor, file_path, headers, datetime_columns, table_name):
-    """Load a CSV file into the specified database table in chunks and validate using pandera."""
-    if not os.path.exists(file_path):
-        logging.error("The file %s does not exist.", file_path)
-        raise FileNotFoundError(f"The file {file_path} does not exist.")
-    
-    chunk_size = 10000  # Set the size of chunks to read at once
-
-    try:
-        # Initialize a reader to process the CSV file in chunks
-        chunk_iter = pd.read_csv(file_path, chunksize=chunk_size)
-
-        for chunk_df in chunk_iter:
-            logging.info("Processing chunk with %d rows...", len(chunk_df))
-
-            # Ensure the DataFrame columns match the provided headers
-            if list(chunk_df.columns) != headers:
-                logging.warning("The columns in the chunk don't match the expected headers.")
-                logging.warning("Expected headers: %s", headers)
-                logging.warning("Found headers: %s", list(chunk_df.columns))
-
-            # If extra columns exist, log them
-            extra_columns = set(chunk_df.columns) - set(headers)
-            if extra_columns:
-                logging.warning("Extra columns found in the chunk: %s", extra_columns)
-
-            # Align the DataFrame to the expected headers (if any columns are missing, they will be NaN)
-            chunk_df = chunk_df[headers]
-            logging.info("Aligned chunk DataFrame columns to the expected headers.")
-
-            # Validate the chunk DataFrame using pandera
-            try:
-                # Use pandera to validate the chunk
-                OpportunitySchema.validate(chunk_df)
-                logging.info("Chunk data is valid according to pandera schema.")
-            except pa.errors.SchemaErrors as e:
-                logging.error("Validation failed for chunk: %s", e)
-                continue  # Skip this chunk if validation fails
-
-            # Convert datetime columns to the desired format
-            for col in datetime_columns:
-                chunk_df[col] = pd.to_datetime(chunk_df[col], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
-                logging.info("Formatted datetime column: %s", col)
-
-            # Create placeholders for the insert query
-            placeholders = ', '.join(['%s'] * len(chunk_df.columns))
-            insert_query = f"INSERT INTO {table_name} ({', '.join(headers)}) VALUES ({placeholders})"
-
-            # Collect all rows for batch insert
-            rows_to_insert = [tuple(row) for _, row in chunk_df.iterrows()]
+# #                           Schema
+# ################################################################################
 
-            try:
-                # Use executemany for batch insert
-                cursor.executemany(insert_query, rows_to_insert)
-                logging.info("Batch insert successful: %d rows inserted into %s.", len(rows_to_insert), table_name)
-            except Error as e:
-                logging.error("Error during batch insert for chunk: %s", e)
+# Known values of the low-cardinality columns, read as categoricals
+opportunity_domains = {
+    "stage": ["Prospecting", "Qualification", "Proposal", "Negotiation", "Closed Won", "Closed Lost"],
+    "product": ["Basic", "Pro", "Enterprise"],
+    "forecast_category": ["Pipeline", "Best Case", "Commit", "Closed"],
+}
 
-            # Log failed rows to a separate log file
-            for idx, row in chunk_df.iterrows():
-                try:
-                    cursor.execute(insert_query, tuple(row))
-                except Error as e:
-                    fail_logger.error("Failed to insert row %d: %s. Error: %s", idx, row.to_dict(), e)
+# Opportunity names embed the company ('COMP005 - Pro Deal'), standardized like company names
+opportunity_normalizers = {
+    "name": standardize_opportunity_names,
+}
 
-    except Exception as e:
-        logging.critical("Error loading CSV file %s: %s", file_path, e)
+# Define the schema for opportunities
+@lru_cache(maxsize=None)
+def opportunity_schema():
+    """Build the opportunities schema on first use, so pandera is only imported when rows are loaded."""
+    import pandera as pa
+    from pandera import Column
+    from staging import domain_check
+
+    return pa.DataFrameSchema({
+        "id": Column(pa.String, nullable=False),
+        "name": Column(pa.String, nullable=False),
+        "contact_id": Column(pa.String, nullable=False),
+        "company_id": Column(pa.String, nullable=False),  # Assuming `atr` meant `str`
+        "amount": Column(pa.Int, nullable=False),
+        "stage": Column(pa.Category, nullable=False,
+                        checks=domain_check(opportunity_domains["stage"], error="Invalid stage value")),
+        "product": Column(pa.Category, nullable=False,
+                          checks=domain_check(opportunity_domains["product"], error="Invalid product value")),
+        "probability": Column(pa.Int, nullable=False),
+        # Parsed by parse_datetime_columns; unparseable dates are NaT and fail nullable=False
+        "created_date": Column(pa.DateTime, nullable=False),
+        "close_date": Column(pa.DateTime, nullable=False),
+        "is_closed": Column(pa.Bool, nullable=False),
+        "forecast_category": Column(
+            pa.Category,
+            nullable=False,
+            checks=domain_check(opportunity_domains["forecast_category"], error="Invalid forecast category value")
+        ),
+    })
 
 # ################################################################################
 # #                           Main Function
 # ################################################################################
-def Opportunities_csv_to_DB():
+def Opportunities_csv_to_DB(backend=None, force=False, source=None, snapshot=False):
+    """Load the opportunities shards in their own batch; return the batch ID, UNCHANGED if skipped, or None if failed.
+
+    With snapshot, the shards are a full extract and opportunities missing from it are soft-deleted.
+    """
+    backend = backend or get_backend()
     directory_path = 'data/salesforce'
+    file_name = "opportunities.csv"
     batch_id = None
-    
+
     try:
-        with mysql.connector.connect(**DB_CONFIG) as connection:
-            with connection.cursor() as cursor:
-                batch_id = insert_batch_record(cursor)
-                truncate_staging_tables(cursor)
+        file_paths = resolve_source_files(directory_path, file_name, source)
+
+        with backend.connect() as connection:
+            with backend.cursor(connection) as cursor:
+                skip, fingerprints = skip_unchanged_sources(backend, cursor, 'opportunities', file_paths, force)
+                if skip:
+                    return UNCHANGED
+
+                batch_id = backend.insert_batch_record(cursor)
+                with stage('truncate_staging_tables', 'opportunities'):
+                    backend.truncate_staging_tables(cursor, ['stg_opportunities'])
                 connection.commit()
                 logging.info("Batch record created with ID: %d", batch_id)
-    
-                file_name = "opportunities.csv"
-                file_path = os.path.join(directory_path, file_name)
-                logging.info("Processing file: %s", file_name)
-                load_opportunities(cursor, file_path)
-    
-                run_validations(cursor)
+
+                staged, failed = load_opportunities(backend, cursor, file_paths)
+
+                with stage('run_validations', 'opportunities'):
+                    backend.run_validations(cursor)
                 logging.info("Validations completed.")
-    
-                upsert_opportunities(cursor, batch_id)
+
+                with stage('upsert', 'opportunities'):
+                    backend.upsert(cursor, 'opportunities', batch_id)
                 logging.info("Procedure executed: upsert_opportunities.")
-               
-                update_batch_record(cursor, batch_id)
+
+                if snapshot:
+                    soft_delete_missing(backend, cursor, 'opportunities', batch_id, staged, failed)
+
+                with stage('refresh_summaries', 'opportunities'):
+                    backend.refresh_summaries(cursor, batch_id)
+                logging.info("Procedure executed: refresh_summaries.")
+
+                # Failed and partly rejected shards stay out of the manifest so the next run retries them
+                loaded = complete_sources(fingerprints, staged, failed)
+                backend.record_source_manifest(cursor, 'opportunities', loaded, batch_id)
+                backend.update_batch_record(cursor, batch_id, describe_failed_shards(failed))
                 connection.commit()
                 logging.info("Batch with ID %d loaded successfully.", batch_id)
-    
-    except mysql.connector.Error as err:
+                return batch_id
+
+    except backend.Error as err:
         logging.error("Database error occurred: %s", err)
-        if 'connection' in locals() and connection.is_connected():
-            connection.rollback()
-            logging.warning("Transaction rolled back due to error.")
-            
+        if batch_id is not None:
+            backend.fail_batch_record(batch_id, err)
+
     except Exception as ex:
         logging.critical("An unexpected error occurred: %s", ex)
-        if 'batch_id' in locals():
-            with mysql.connector.connect(**DB_CONFIG) as connection:
-                with connection.cursor() as cursor:
-                    cursor.execute("""
-                        UPDATE batch
-                        SET status = %s, exceptions = %s
-                        WHERE id = %s
-                    """, ('FAILED', f"Error: {err}", batch_id))
-                    connection.commit()
+        if batch_id is not None:
+            backend.fail_batch_record(batch_id, ex)
 
 if __name__ == '__main__':
-    main()
+    from cli import main
+
+    sys.exit(main(['opportunities', *sys.argv[1:]]))
@@ -1,247 +1,157 @@
-import mysql.connector
-from mysql.connector import Error
-import pandas as pd
-import pandera as pa
-from pandera.errors import SchemaErrors
-from pandera.typing import Series
-from pandera import Column, Check
+import sys
 import os
 import logging
-from datetime import datetime
-from dotenv import load_dotenv
+from functools import lru_cache
+from backends import get_backend
+from source_manifest import skip_unchanged_sources, complete_sources, UNCHANGED
+from profiling import stage
+from source_files import resolve_source_files, describe_failed_shards
+from snapshots import soft_delete_missing
 
+# Monthly partitions of alysio.activities kept ahead of today, and how many
+# months of history stay in the live table before being archived
+ACTIVITY_PARTITIONS_AHEAD = int(os.getenv("ACTIVITY_PARTITIONS_AHEAD", 3))
+ACTIVITY_RETENTION_MONTHS = int(os.getenv("ACTIVITY_RETENTION_MONTHS", 24))
 
-# ################################################################################
-# #                           Database Configurations
-# ################################################################################
-load_dotenv()
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "localhost"),  # Default to localhost
-    "user": os.getenv("DB_USER", "root"),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "database": os.getenv("DB_NAME"),
-}
-
-logging.basicConfig(
-    level=logging.INFO,  # Set the logging level
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("load_json_to_mysql_for_activities.log"),  # Main log file
-        logging.StreamHandler()  # Also log to console
-    ]
-)
-
-# Dedicated logger for failed rows
-fail_logger = logging.getLogger('fail_logger')
-fail_logger.setLevel(logging.ERROR)
-fail_handler = logging.FileHandler('failed_rows.log')  # Log for failed rows
-fail_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-fail_logger.addHandler(fail_handler)
-# ################################################################################
-# #                           Batch Functions
-# ################################################################################
-
-def insert_batch_record(cursor):
-    """Insert a new record into the batch table and return its ID."""
-    start_time = datetime.now()
-    insert_query = """
-    INSERT INTO batch (start_time, status)
-    VALUES (%s, %s)
-    """
-    cursor.execute(insert_query, (start_time, 'IN_PROGRESS'))
-    return cursor.lastrowid
-
-def update_batch_record(cursor, batch_id):
-    """Update the batch record with end time and status."""
-    end_time = datetime.now()
-    update_query = """
-    UPDATE batch
-    SET end_time = %s, status = %s
-    WHERE id = %s
-    """
-    cursor.execute(update_query, (end_time, 'COMPLETED', batch_id))
-    
-# ################################################################################
-# #                           Execute Procedures
-# ################################################################################
-
-def truncate_staging_tables(cursor):
-    """Truncate all staging tables"""
-    query = """
-    Truncate Table stg_activities
-    """
-    cursor.execute(query)
-    return
-
-def run_validations(cursor):
-    """Run Validations"""
-    query = """
-    CALL run_validations()
-    """
-    cursor.execute(query)
-    return
-
-def upsert_activities(cursor,batch_id):
-    """Upsert Activities Data"""
-    query = """
-    CALL UpsertActivities(%s)
-    """
-    cursor.execute(query,(batch_id,))
-    return
+# Log file of the activities loader when it runs on its own
+LOG_FILE = "load_json_to_mysql_for_activities.log"
 
 # ################################################################################
 # #                           Processing Functions
 # ################################################################################
 
-def load_activities(cursor, file_path):
-    """Process and load activities.json."""
+def load_activities(backend, cursor, file_paths):
+    """Process and load the activities shards; return (staged, failed) per shard."""
+    from staging import load_json_to_db
+
     activities_headers = [
-        'id', 
-        'contact_id', 
-        'opportunity_id', 
-        'type', 
-        'subject', 
-        'timestamp', 
-        'duration_minutes', 
-        'outcome', 
+        'id',
+        'contact_id',
+        'opportunity_id',
+        'type',
+        'subject',
+        'timestamp',
+        'duration_minutes',
+        'outcome',
         'notes'
     ]
     datetime_columns =[
         'timestamp'
     ]
-    print(f"Processing: {file_path}")
-    load_json_to_db(cursor, file_path, activities_headers, datetime_columns, 'stg_activities')
+    logging.info("Processing files: %s", file_paths)
+    return load_json_to_db(backend, cursor, file_paths, activities_headers, datetime_columns, 'stg_activities', activity_schema(),
+                           domains=activity_domains)
 
 # ################################################################################
-# #                           Loading Functions
-# ################################################################################    
+# #                           Schema
+# ################################################################################
 
-# Define the ActivitySchema class as below
-activity_schema = pa.DataFrameSchema({
-    "id": Column(pa.String, nullable=False),
-    "contact_id": Column(pa.String, nullable=False),
-    "opportunity_id": Column(pa.String, nullable=True),
-    "type": Column(pa.String, nullable=False),
-    "subject": Column(pa.String, nullable=False),
-    "timestamp": Column(pa.DateTime, nullable=False),
-    "duration_minutes": Column(
-        pa.Int,
-        nullable=False,
-        checks=Check(lambda s: s >= 0, error="Duration must be non-negative")
-    ),
-    "outcome": Column(
-        pa.String,
-        nullable=False,
-        checks=Check(lambda s: s.isin(["Completed", "Rescheduled", "No Show"]), 
-                     error="Outcome must be one of: Completed, Rescheduled, No Show")
-    ),
-    "notes": Column(pa.String, nullable=True),  # Assuming notes can be nullable
-})
-
-def load_json_to_db(cursor, file_path, headers, datetime_columns, table_name):
-    """Load a JSON file into the specified database table in chunks and validate using pandera."""
-    if not os.path.exists(file_path):
-        logging.error("The file %s does not exist.", file_path)
-        raise FileNotFoundError(f"The file {file_path} does not exist.")
-    
-    try:
-        # Initialize a reader to process the JSON file in chunks
-        chunk_df = pd.read_json(file_path)
-
-        logging.info("Processing chunk with %d rows...", len(chunk_df))
-        # Ensure the DataFrame columns match the provided headers
-        if list(chunk_df.columns) != headers:
-            logging.warning("The columns in the chunk don't match the expected headers.")
-            logging.warning("Expected headers: %s", headers)
-            logging.warning("Found headers: %s", list(chunk_df.columns))
-        # If extra columns exist, log them
-        extra_columns = set(chunk_df.columns) - set(headers)
-        if extra_columns:
-            logging.warning("Extra columns found in the chunk: %s", extra_columns)
-        # Align the DataFrame to the expected headers (if any columns are missing, they will be NaN)
-        chunk_df = chunk_df[headers]
-        logging.info("Aligned chunk DataFrame columns to the expected headers.")
-        # Validate the chunk DataFrame using pandera
-        try:
-            # Use pandera to validate the chunk
-            activity_schema.validate(chunk_df)
-            logging.info("Chunk data is valid according to pandera schema.")
-        except SchemaErrors as e:
-            logging.error("Validation failed for chunk: %s", e)
-        # Convert datetime columns to the desired format
-        for col in datetime_columns:
-            chunk_df[col] = pd.to_datetime(chunk_df[col], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
-            logging.info("Formatted datetime column: %s", col)
-        # Create placeholders for the insert query
-        placeholders = ', '.join(['%s'] * len(chunk_df.columns))
-        insert_query = f"INSERT INTO {table_name} ({', '.join(headers)}) VALUES ({placeholders})"
-        # Collect all rows for batch insert
-        rows_to_insert = [tuple(row) for _, row in chunk_df.iterrows()]
-        try:
-            # Use executemany for batch insert
-            cursor.executemany(insert_query, rows_to_insert)
-            logging.info("Batch insert successful: %d rows inserted into %s.", len(rows_to_insert), table_name)
-        except Error as e:
-            logging.error("Error during batch insert for chunk: %s", e)
-        # Log failed rows to a separate log file
-        for idx, row in chunk_df.iterrows():
-            try:
-                cursor.execute(insert_query, tuple(row))
-            except Error as e:
-                fail_logger.error("Failed to insert row %d: %s. Error: %s", idx, row.to_dict(), e)
-
-    except Exception as e:
-        logging.critical("Error loading JSON file %s: %s", file_path, e)
+# Known values of the low-cardinality columns, read as categoricals
+activity_domains = {
+    "type": ["email", "call", "meeting", "demo", "task"],
+    "outcome": ["Completed", "Rescheduled", "No Show"],
+}
 
+# Define the ActivitySchema class as below
+@lru_cache(maxsize=None)
+def activity_schema():
+    """Build the activities schema on first use, so pandera is only imported when rows are loaded."""
+    import pandera as pa
+    from pandera import Column, Check
+    from staging import domain_check
+
+    return pa.DataFrameSchema({
+        "id": Column(pa.String, nullable=False),
+        "contact_id": Column(pa.String, nullable=False),
+        "opportunity_id": Column(pa.String, nullable=True),
+        "type": Column(pa.Category, nullable=False,
+                       checks=domain_check(activity_domains["type"], error="Invalid activity type")),
+        "subject": Column(pa.String, nullable=False),
+        "timestamp": Column(pa.DateTime, nullable=False),
+        "duration_minutes": Column(
+            pa.Int,
+            nullable=False,
+            checks=Check(lambda s: s >= 0, error="Duration must be non-negative")
+        ),
+        "outcome": Column(
+            pa.Category,
+            nullable=False,
+            checks=domain_check(activity_domains["outcome"],
+                                error="Outcome must be one of: Completed, Rescheduled, No Show")
+        ),
+        "notes": Column(pa.String, nullable=True),  # Assuming notes can be nullable
+    })
 
 # ################################################################################
 # #                           Main Function
 # ################################################################################
-def Activies_json_to_DB():
+def Activies_json_to_DB(backend=None, force=False, source=None, snapshot=False):
+    """Load the activities shards in their own batch; return the batch ID, UNCHANGED if skipped, or None if failed.
+
+    With snapshot, the shards are a full extract and activities missing from it are soft-deleted.
+    """
+    backend = backend or get_backend()
     directory_path = 'data/salesforce'
+    file_name = "activities.json"
     batch_id = None
-    
+
     try:
-        with mysql.connector.connect(**DB_CONFIG) as connection:
-            with connection.cursor() as cursor:
-                batch_id = insert_batch_record(cursor)
-                truncate_staging_tables(cursor)
+        file_paths = resolve_source_files(directory_path, file_name, source)
+
+        with backend.connect() as connection:
+            with backend.cursor(connection) as cursor:
+                skip, fingerprints = skip_unchanged_sources(backend, cursor, 'activities', file_paths, force)
+                if skip:
+                    return UNCHANGED
+
+                # Partition DDL commits implicitly, so run it between transactions, before the batch starts
+                connection.commit()
+                with stage('maintain_activity_partitions', 'activities'):
+                    backend.maintain_activity_partitions(cursor, ACTIVITY_PARTITIONS_AHEAD, ACTIVITY_RETENTION_MONTHS)
+                logging.info("Procedure executed: maintain_activity_partitions.")
+
+                batch_id = backend.insert_batch_record(cursor)
+                with stage('truncate_staging_tables', 'activities'):
+                    backend.truncate_staging_tables(cursor, ['stg_activities'])
                 connection.commit()
                 logging.info("Batch record created with ID: %d", batch_id)
-    
-                file_name = "activities.json"
-                file_path = os.path.join(directory_path, file_name)
-                logging.info("Processing file: %s", file_name)
-                load_activities(cursor, file_path)
-    
-                run_validations(cursor)
+
+                staged, failed = load_activities(backend, cursor, file_paths)
+
+                with stage('run_validations', 'activities'):
+                    backend.run_validations(cursor)
                 logging.info("Validations completed.")
-    
-                logging.info("Procedure executed: upsert_opportunities.")
-                upsert_activities(cursor, batch_id)
+
+                with stage('upsert', 'activities'):
+                    backend.upsert(cursor, 'activities', batch_id)
                 logging.info("Procedure executed: upsert_activities.")
-    
-                update_batch_record(cursor, batch_id)
+
+                if snapshot:
+                    soft_delete_missing(backend, cursor, 'activities', batch_id, staged, failed)
+
+                with stage('refresh_summaries', 'activities'):
+                    backend.refresh_summaries(cursor, batch_id)
+                logging.info("Procedure executed: refresh_summaries.")
+
+                # Failed and partly rejected shards stay out of the manifest so the next run retries them
+                loaded = complete_sources(fingerprints, staged, failed)
+                backend.record_source_manifest(cursor, 'activities', loaded, batch_id)
+                backend.update_batch_record(cursor, batch_id, describe_failed_shards(failed))
                 connection.commit()
                 logging.info("Batch with ID %d loaded successfully.", batch_id)
-    
-    except mysql.connector.Error as err:
+                return batch_id
+
+    except backend.Error as err:
         logging.error("Database error occurred: %s", err)
-        if 'connection' in locals() and connection.is_connected():
-            connection.rollback()
-            logging.warning("Transaction rolled back due to error.")
-            
+        if batch_id is not None:
+            backend.fail_batch_record(batch_id, err)
+
     except Exception as ex:
         logging.critical("An unexpected error occurred: %s", ex)
-        if 'batch_id' in locals():
-            with mysql.connector.connect(**DB_CONFIG) as connection:
-                with connection.cursor() as cursor:
-                    cursor.execute("""
-                        UPDATE batch
-                        SET status = %s, exceptions = %s
-                        WHERE id = %s
-                    """, ('FAILED', f"Error: {err}", batch_id))
-                    connection.commit()
+        if batch_id is not None:
+            backend.fail_batch_record(batch_id, ex)
 
 if __name__ == '__main__':
-    main()
+    from cli import main
+
+    sys.exit(main(['activities', *sys.argv[1:]]))
@@ -0,0 +1,135 @@
+import os
+import re
+import json
+import logging
+from functools import lru_cache
+
+# Country calling code added to national numbers, and their length (NANP)
+DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "1")
+NATIONAL_NUMBER_DIGITS = 10
+
+# Digits allowed after the '+' of an E.164 number
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+
+# Canonical industries, company name aliases and legal suffixes to strip
+STANDARDIZATION_DICTIONARY = os.getenv(
+    "STANDARDIZATION_DICTIONARY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reference', 'company_standardization.json'),
+)
+
+# Distinct raw values each resolver remembers for the rest of the run
+STANDARDIZATION_CACHE_SIZE = int(os.getenv("STANDARDIZATION_CACHE_SIZE", 65536))
+
+# ################################################################################
+# #                           Contact Normalization
+# ################################################################################
+# Vectorized over a whole column of a chunk; missing values stay missing.
+
+def normalize_emails(emails):
+    """Return the emails trimmed and lowercased."""
+    return emails.str.strip().str.lower()
+
+def normalize_phones(phones):
+    """Return the phone numbers in E.164, e.g. +15551096556 for +1-555-109-6556.
+
+    Separators, spaces, brackets and extensions are dropped. A leading 00
+    counts as '+', and national numbers without a country code get
+    DEFAULT_COUNTRY_CODE. Numbers that cannot be written in E.164 are only
+    trimmed, so run_validations still flags them.
+    """
+    trimmed = phones.str.strip()
+    number = trimmed.str.replace(r'\s*(?:x|ext\.?)\s*\d+$', '', regex=True, case=False)
+    digits = number.str.replace(r'\D', '', regex=True)
+
+    has_plus = number.str.startswith('+', na=False)
+    has_prefix = ~has_plus & digits.str.startswith('00', na=False)
+    digits = digits.mask(has_prefix, digits.str[2:])
+    international = has_plus | has_prefix
+
+    length = digits.str.len()
+    national = ~international & (length == NATIONAL_NUMBER_DIGITS)
+    with_code = (~international & (length == NATIONAL_NUMBER_DIGITS + len(DEFAULT_COUNTRY_CODE))
+                 & digits.str.startswith(DEFAULT_COUNTRY_CODE, na=False))
+    digits = digits.mask(national, DEFAULT_COUNTRY_CODE + digits)
+
+    valid = ((international | national | with_code)
+             & digits.str.len().between(E164_MIN_DIGITS, E164_MAX_DIGITS)
+             & ~digits.str.startswith('0', na=True))
+    return ('+' + digits).where(valid, trimmed)
+
+# ################################################################################
+# #                           Company Standardization
+# ################################################################################
+# Resolvers work on one raw value and are memoized, so a value seen in any
+# earlier chunk or shard is not resolved again; map_distinct calls them once
+# per distinct value of a chunk.
+
+@lru_cache(maxsize=None)
+def load_dictionary(path=STANDARDIZATION_DICTIONARY):
+    """Return the standardization dictionary with lowercased keys, read once per run."""
+    with open(path) as dictionary_file:
+        dictionary = json.load(dictionary_file)
+
+    suffixes = sorted(dictionary.get("legal_suffixes", []), key=len, reverse=True)
+    return {
+        "industry": {raw.lower(): canonical for raw, canonical in dictionary.get("industry", {}).items()},
+        "company_names": {raw.lower(): canonical for raw, canonical in dictionary.get("company_names", {}).items()},
+        # A trailing suffix after a space or comma, e.g. "Acme, Inc." or "Acme Ltd"
+        "legal_suffix": re.compile(r'[\s,]+(?:' + '|'.join(map(re.escape, suffixes)) + r')\.?$', re.IGNORECASE)
+                        if suffixes else None,
+    }
+
+def collapse_spaces(value):
+    """Return the value trimmed, with runs of whitespace collapsed to one space."""
+    return ' '.join(value.split())
+
+@lru_cache(maxsize=STANDARDIZATION_CACHE_SIZE)
+def standardize_industry(industry):
+    """Return the canonical industry for a raw value such as 'tech'; unknown values are only trimmed."""
+    cleaned = collapse_spaces(industry)
+    canonical = load_dictionary()["industry"].get(cleaned.lower())
+    if canonical is None:
+        logging.warning("Industry '%s' is not in the standardization dictionary, loading it as is.", cleaned)
+        return cleaned
+    return canonical
+
+@lru_cache(maxsize=STANDARDIZATION_CACHE_SIZE)
+def standardize_company_name(name):
+    """Return the company name without legal suffixes, or its canonical alias from the dictionary."""
+    dictionary = load_dictionary()
+    cleaned = collapse_spaces(name)
+    suffix = dictionary["legal_suffix"]
+    while suffix is not None:
+        # Strip stacked suffixes such as "Pty Ltd", but never the whole name
+        stripped = suffix.sub('', cleaned)
+        if stripped == cleaned or not stripped:
+            break
+        cleaned = stripped
+    return dictionary["company_names"].get(cleaned.lower(), cleaned)
+
+@lru_cache(maxsize=STANDARDIZATION_CACHE_SIZE)
+def standardize_opportunity_name(name):
+    """Return an opportunity name such as 'COMP005 - Pro Deal' with its company part standardized."""
+    parts = re.split(r'\s+-\s+', name.strip(), maxsplit=1)
+    if len(parts) < 2:
+        return collapse_spaces(name)
+    company, deal = parts
+    return f"{standardize_company_name(company)} - {collapse_spaces(deal)}"
+
+def map_distinct(values, resolve):
+    """Return the column with resolve applied once per distinct non-missing value."""
+    mapping = {value: resolve(value) for value in values.dropna().unique()}
+    return values.map(mapping)
+
+def standardize_industries(industries):
+    """Return the industries mapped to their canonical values."""
+    return map_distinct(industries, standardize_industry)
+
+def standardize_company_names(names):
+    """Return the company names standardized."""
+    return map_distinct(names, standardize_company_name)
+
+def standardize_opportunity_names(names):
+    """Return the opportunity names with their embedded company names standardized."""
+    return map_distinct(names, standardize_opportunity_name)
@@ -0,0 +1,116 @@
+import logging
+from backends import get_backend
+from source_manifest import skip_unchanged_sources, complete_sources, UNCHANGED
+from profiling import stage
+from source_files import resolve_source_files, describe_failed_shards
+from snapshots import soft_delete_missing
+from load_csv_to_mysql_for_companies import load_companies
+from load_json_to_mysql_for_contacts import load_contacts
+from load_csv_to_mysql_for_opportunities import load_opportunities
+from load_json_to_mysql_for_activities import (
+    load_activities,
+    ACTIVITY_PARTITIONS_AHEAD,
+    ACTIVITY_RETENTION_MONTHS,
+)
+
+SOURCE_DIRECTORY = 'data/salesforce'
+
+# Entities in foreign key order: (entity, source file, staging table, loader)
+ENTITIES = [
+    ('companies', 'companies.csv', 'stg_companies', load_companies),
+    ('contacts', 'contacts.json', 'stg_contacts', load_contacts),
+    ('opportunities', 'opportunities.csv', 'stg_opportunities', load_opportunities),
+    ('activities', 'activities.json', 'stg_activities', load_activities),
+]
+
+# ################################################################################
+# #                           Main Function
+# ################################################################################
+
+def run_pipeline(backend=None, force=False, sources=None, snapshot=False):
+    """Load all entities in one batch; return the batch ID, UNCHANGED if skipped, or None if failed.
+
+    The staging tables are cleared once, validated once and upserted in
+    foreign key order, and the whole run is committed together, so every
+    row it touches carries the same batch_id. Entities whose source files
+    are unchanged are left out of the batch. sources optionally maps an
+    entity to a file, directory or glob of shards. With snapshot, every
+    loaded entity is a full extract and its rows missing from it are
+    soft-deleted.
+    """
+    backend = backend or get_backend()
+    sources = sources or {}
+    batch_id = None
+
+    try:
+        file_paths = {
+            entity: resolve_source_files(SOURCE_DIRECTORY, file_name, sources.get(entity))
+            for entity, file_name, _, _ in ENTITIES
+        }
+
+        with backend.connect() as connection:
+            with backend.cursor(connection) as cursor:
+                pending = []
+                for entity, _, _, loader in ENTITIES:
+                    skip, fingerprints = skip_unchanged_sources(backend, cursor, entity, file_paths[entity], force)
+                    if not skip:
+                        pending.append((entity, file_paths[entity], loader, fingerprints))
+
+                if not pending:
+                    logging.info("No source files changed since the last load, nothing to do.")
+                    return UNCHANGED
+
+                # Partition DDL commits implicitly, so run it between transactions, before the batch starts
+                if any(entity == 'activities' for entity, _, _, _ in pending):
+                    connection.commit()
+                    with stage('maintain_activity_partitions'):
+                        backend.maintain_activity_partitions(cursor, ACTIVITY_PARTITIONS_AHEAD, ACTIVITY_RETENTION_MONTHS)
+                    logging.info("Procedure executed: maintain_activity_partitions.")
+
+                batch_id = backend.insert_batch_record(cursor)
+                with stage('truncate_staging_tables'):
+                    backend.truncate_staging_tables(cursor, [table_name for _, _, table_name, _ in ENTITIES])
+                connection.commit()
+                logging.info("Batch record created with ID: %d", batch_id)
+
+                staged, failed = {}, {}
+                for entity, entity_paths, loader, _ in pending:
+                    staged[entity], failed[entity] = loader(backend, cursor, entity_paths)
+
+                with stage('run_validations'):
+                    backend.run_validations(cursor)
+                logging.info("Validations completed.")
+
+                for entity, _, _, _ in pending:
+                    with stage('upsert', entity):
+                        backend.upsert(cursor, entity, batch_id)
+                    logging.info("Procedure executed: upsert_%s.", entity)
+
+                if snapshot:
+                    for entity, _, _, _ in pending:
+                        soft_delete_missing(backend, cursor, entity, batch_id, staged[entity], failed[entity])
+
+                with stage('refresh_summaries'):
+                    backend.refresh_summaries(cursor, batch_id)
+                logging.info("Procedure executed: refresh_summaries.")
+
+                # Failed and partly rejected shards stay out of the manifest so the next run retries them
+                for entity, _, _, fingerprints in pending:
+                    loaded = complete_sources(fingerprints, staged[entity], failed[entity])
+                    backend.record_source_manifest(cursor, entity, loaded, batch_id)
+                backend.update_batch_record(cursor, batch_id, describe_failed_shards(
+                    {file_path: error for shards in failed.values() for file_path, error in shards.items()}))
+                connection.commit()
+                logging.info("Batch with ID %d loaded successfully. Rows staged: %s", batch_id,
+                             ", ".join(f"{entity}={sum(shards.values())}" for entity, shards in staged.items()))
+                return batch_id
+
+    except backend.Error as err:
+        logging.error("Database error occurred: %s", err)
+        if batch_id is not None:
+            backend.fail_batch_record(batch_id, err)
+
+    except Exception as ex:
+        logging.critical("An unexpected error occurred: %s", ex)
+        if batch_id is not None:
+            backend.fail_batch_record(batch_id, ex)
@@ -0,0 +1,155 @@
+import os
+import csv
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Profiler or timer of the current run; None unless --profile was given or a benchmark is running
+_profiler = None
+
+# ################################################################################
+# #                           Stage Profiler
+# ################################################################################
+
+class StageTimer:
+    """Adds up calls and wall time per entity and stage.
+
+    A stage entered while another stage is active in the same thread is
+    counted as part of the outer one, so nested stages are not timed twice.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name, entity):
+        if getattr(self._local, 'active', False):
+            yield
+            return
+
+        key = (entity or 'all', name)
+        self._local.active = True
+        state = self._start(key)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            extra = self._stop(key, state)
+            self._local.active = False
+            with self._lock:
+                total = self.totals.setdefault(key, {"calls": 0, "seconds": 0.0})
+                total["calls"] += 1
+                total["seconds"] += seconds
+                for field, value in extra.items():
+                    total[field] = max(total.get(field, 0), value)
+
+    def _start(self, key):
+        return None
+
+    def _stop(self, key, state):
+        return {}
+
+class StageProfiler(StageTimer):
+    """Collects cProfile stats and tracemalloc peaks per entity and stage on top of the timings.
+
+    Every thread keeps its own cProfile.Profile per (entity, stage), since a
+    profiler only sees the thread that enabled it; they are merged when the
+    results are written. Stages run one at a time across threads: since
+    Python 3.12 only one profiler can be active per process, and the
+    tracemalloc peak is process-wide. Shard readers and the inserting thread
+    take turns while profiling, and the time spent waiting for the turn is
+    not counted.
+    """
+
+    def __init__(self, output_dir):
+        super().__init__()
+        self.output_dir = output_dir
+        self.profiles = {}
+        self._turn = threading.Lock()
+
+    def _profile(self, key):
+        profiles = self._local.__dict__.setdefault('profiles', {})
+        if key not in profiles:
+            profiles[key] = cProfile.Profile()
+            with self._lock:
+                self.profiles.setdefault(key, []).append(profiles[key])
+        return profiles[key]
+
+    def _start(self, key):
+        profile = self._profile(key)
+        self._turn.acquire()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        profile.enable()
+        return profile, start_memory
+
+    def _stop(self, key, state):
+        profile, start_memory = state
+        try:
+            profile.disable()
+            return {"peak_bytes": max(0, tracemalloc.get_traced_memory()[1] - start_memory)}
+        finally:
+            self._turn.release()
+
+    def write(self):
+        """Write <entity>.<stage>.prof files and stages.csv; return the output directory."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            for (entity, name), profiles in self.profiles.items():
+                stats = pstats.Stats(*profiles)
+                stats.dump_stats(os.path.join(self.output_dir, f"{entity}.{name}.prof"))
+
+            with open(os.path.join(self.output_dir, 'stages.csv'), 'w', newline='') as summary_file:
+                writer = csv.writer(summary_file)
+                writer.writerow(['entity', 'stage', 'calls', 'seconds', 'peak_kb'])
+                for (entity, name), total in sorted(self.totals.items(), key=lambda item: -item[1]["seconds"]):
+                    writer.writerow([entity, name, total["calls"], f"{total['seconds']:.3f}",
+                                     total["peak_bytes"] // 1024])
+        return self.output_dir
+
+# ################################################################################
+# #                           Module Interface
+# ################################################################################
+
+def enable_profiling(output_dir='profiles'):
+    """Start profiling the stages of this run into a timestamped folder under output_dir."""
+    global _profiler
+    tracemalloc.start()
+    _profiler = StageProfiler(os.path.join(output_dir, datetime.now().strftime('%Y%m%d_%H%M%S')))
+    logging.info("Profiling enabled, writing results to %s", _profiler.output_dir)
+
+def time_stages():
+    """Time the stages of the following loads without profiling them; return the StageTimer."""
+    global _profiler
+    _profiler = StageTimer()
+    return _profiler
+
+def stop_timing():
+    """Stop collecting stage timings started by time_stages."""
+    global _profiler
+    _profiler = None
+
+def stage(name, entity=None):
+    """Return a context manager that profiles one stage of an entity; a no-op unless profiling is on."""
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.stage(name, entity)
+
+def write_profiles():
+    """Write the collected profiles and stop tracemalloc; return the output directory or None."""
+    global _profiler
+    if _profiler is None:
+        return None
+    output_dir = _profiler.write()
+    tracemalloc.stop()
+    _profiler = None
+    logging.info("Profiles written to %s (load the .prof files with pstats or snakeviz).", output_dir)
+    return output_dir
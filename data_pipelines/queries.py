@@ -0,0 +1,245 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from backends import get_backend, ConnectionPool
+
+# Connections shared by the readers, and the result cache: entries kept, their
+# lifetime in seconds, and how often the batch table is polled for new loads
+QUERY_POOL_SIZE = int(os.getenv("QUERY_POOL_SIZE", 5))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 300))
+QUERY_CACHE_CHECK_SECONDS = float(os.getenv("QUERY_CACHE_CHECK_SECONDS", 1))
+
+# Returned by ResultCache.get for keys it does not hold
+MISSING = object()
+
+# ################################################################################
+# #                           Queries
+# ################################################################################
+# Read the target and summary tables directly through a cursor; tombstoned
+# rows (is_deleted) are left out. Source ids are the Salesforce ids.
+
+def fetch_dicts(cursor):
+    """Return the remaining rows of the cursor as dicts keyed by column name."""
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def query_activity_timeline(backend, cursor, contact_id=None, opportunity_id=None, since=None, limit=100):
+    """Return the latest activities of one contact or opportunity, newest first."""
+    if (contact_id is None) == (opportunity_id is None):
+        raise ValueError("Pass exactly one of contact_id and opportunity_id.")
+    t, p = backend.targets, backend.placeholder
+    if contact_id is not None:
+        column, owner = "A.contact_id", f"SELECT contact_id FROM {t}contacts WHERE source_id = {p} AND is_deleted = 0"
+        params = [contact_id]
+    else:
+        column, owner = "A.opportunity_id", f"SELECT opportunity_id FROM {t}opportunities WHERE source_id = {p} AND is_deleted = 0"
+        params = [opportunity_id]
+
+    window = ""
+    if since is not None:
+        # Lets MySQL prune the activity partitions before the window
+        window = f"AND A.timestamp >= {p}"
+        params.append(since.strftime("%Y-%m-%d %H:%M:%S") if hasattr(since, "strftime") else since)
+
+    cursor.execute(f"""
+    SELECT A.source_id, A.type, A.subject, A.timestamp, A.duration_minutes, A.outcome, A.notes,
+        DC.source_id AS contact_source_id,
+        O.source_id AS opportunity_source_id
+    FROM {t}activities A
+    LEFT JOIN {t}contacts DC ON DC.contact_id = A.contact_id
+    LEFT JOIN {t}opportunities O ON O.opportunity_id = A.opportunity_id
+    WHERE {column} = ({owner})
+    AND A.is_deleted = 0
+    {window}
+    ORDER BY A.timestamp DESC
+    LIMIT {p}
+    """, (*params, limit))
+    return fetch_dicts(cursor)
+
+def query_contact_360(backend, cursor, source_id, activity_limit=50):
+    """Return the contact with its company, opportunities and latest activities, or None if unknown."""
+    t, p = backend.targets, backend.placeholder
+    cursor.execute(f"""
+    SELECT contact_id, company_id, source_id, email, first_name, last_name, title, phone, status,
+        created_date, last_modified
+    FROM {t}contacts
+    WHERE source_id = {p} AND is_deleted = 0
+    """, (source_id,))
+    contacts = fetch_dicts(cursor)
+    if not contacts:
+        return None
+    contact = contacts[0]
+    contact_id, company_id = contact.pop("contact_id"), contact.pop("company_id")
+
+    cursor.execute(f"""
+    SELECT source_id, name, domain, industry, size, country, created_date, is_customer, annual_revenue
+    FROM {t}companies
+    WHERE company_id = {p} AND is_deleted = 0
+    """, (company_id,))
+    companies = fetch_dicts(cursor)
+
+    cursor.execute(f"""
+    SELECT source_id, name, amount, stage, product, probability, created_date, close_date, is_closed,
+        forecast_category
+    FROM {t}opportunities
+    WHERE contact_id = {p} AND is_deleted = 0
+    ORDER BY close_date DESC
+    """, (contact_id,))
+    opportunities = fetch_dicts(cursor)
+
+    return {
+        "contact": contact,
+        "company": companies[0] if companies else None,
+        "opportunities": opportunities,
+        "activities": query_activity_timeline(backend, cursor, contact_id=source_id, limit=activity_limit),
+    }
+
+def query_pipeline_by_stage(backend, cursor):
+    """Return opportunity counts and amounts per stage, largest weighted pipeline first."""
+    cursor.execute(f"""
+    SELECT stage,
+        SUM(opportunity_count) AS opportunity_count,
+        SUM(open_count) AS open_count,
+        SUM(total_amount) AS total_amount,
+        SUM(weighted_amount) AS weighted_amount
+    FROM {backend.targets}summary_pipeline
+    GROUP BY stage
+    ORDER BY weighted_amount DESC
+    """)
+    return fetch_dicts(cursor)
+
+# ################################################################################
+# #                           Result Cache
+# ################################################################################
+
+class ResultCache:
+    """LRU cache of query results whose entries expire ttl seconds after they were stored.
+
+    clear() starts a new generation; a result computed during an older one
+    is not stored, so a query that raced a completed batch is not cached.
+    """
+
+    def __init__(self, size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached result for key, or MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, generation):
+        """Store the result computed during generation, evicting the least recently used entry."""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry and start a new generation."""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+# ################################################################################
+# #                           Query Service
+# ################################################################################
+
+class QueryService:
+    """Cached, pooled access to the common CRM lookups for the API tier.
+
+    Results are cached per query and arguments for up to QUERY_CACHE_TTL
+    seconds. At most every QUERY_CACHE_CHECK_SECONDS the service reads the
+    count and latest id of COMPLETED batches (covered by idx_batch_status_id)
+    and clears the cache when they change, so a finished load is visible
+    right away. Cached results are shared between callers; treat them as
+    read-only.
+    """
+
+    def __init__(self, backend=None, pool_size=QUERY_POOL_SIZE, cache_size=QUERY_CACHE_SIZE,
+                 ttl=QUERY_CACHE_TTL, check_interval=QUERY_CACHE_CHECK_SECONDS):
+        self.backend = backend or get_backend()
+        self.pool = ConnectionPool(self.backend, pool_size)
+        self.cache = ResultCache(cache_size, ttl)
+        self.check_interval = check_interval
+        self._completed = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the pooled connections."""
+        self.pool.close()
+
+    def completed_batches(self):
+        """Return (count, latest id) of the COMPLETED batches."""
+        with self.pool.connection() as connection:
+            with self.backend.cursor(connection) as cursor:
+                cursor.execute(f"SELECT COUNT(*), MAX(id) FROM batch WHERE status = {self.backend.placeholder}",
+                               ('COMPLETED',))
+                return tuple(cursor.fetchone())
+
+    def _check_batches(self):
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+
+        completed = self.completed_batches()
+        with self._lock:
+            if completed != self._completed:
+                if self._completed is not None:
+                    logging.info("Batch %s completed, clearing the query cache.", completed[1])
+                    self.cache.clear()
+                self._completed = completed
+
+    def _cached(self, key, query, *args, **kwargs):
+        self._check_batches()
+        result = self.cache.get(key)
+        if result is not MISSING:
+            return result
+
+        generation = self.cache.generation
+        with self.pool.connection() as connection:
+            with self.backend.cursor(connection) as cursor:
+                result = query(self.backend, cursor, *args, **kwargs)
+        self.cache.put(key, result, generation)
+        return result
+
+    def contact_360(self, source_id, activity_limit=50):
+        """Return the contact with its company, opportunities and latest activities, or None if unknown."""
+        return self._cached(("contact_360", source_id, activity_limit),
+                            query_contact_360, source_id, activity_limit)
+
+    def pipeline_by_stage(self):
+        """Return opportunity counts and amounts per stage, largest weighted pipeline first."""
+        return self._cached(("pipeline_by_stage",), query_pipeline_by_stage)
+
+    def activity_timeline(self, contact_id=None, opportunity_id=None, since=None, limit=100):
+        """Return the latest activities of one contact or opportunity (source ids), newest first."""
+        return self._cached(("activity_timeline", contact_id, opportunity_id, since, limit),
+                            query_activity_timeline, contact_id, opportunity_id, since, limit)
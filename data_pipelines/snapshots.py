@@ -0,0 +1,27 @@
+import logging
+from profiling import stage
+
+# ################################################################################
+# #                           Snapshot Deletes
+# ################################################################################
+
+def soft_delete_missing(backend, cursor, entity, batch_id, staged, failed):
+    """Tombstone the rows of the entity a full snapshot no longer has; return how many, or None if skipped.
+
+    Run after the upsert, while staging still holds the snapshot. A row
+    counts as present if its id was staged at all, valid or not. Since any
+    row missing from staging is deleted, nothing is deleted when a shard
+    failed or lost chunks to validation, or when no rows were staged.
+    """
+    if failed:
+        logging.warning("Snapshot of %s is incomplete (%s), skipping delete detection.",
+                        entity, "; ".join(f"{file_path}: {error}" for file_path, error in failed.items()))
+        return None
+    if not sum(staged.values()):
+        logging.warning("No %s rows were staged, skipping delete detection.", entity)
+        return None
+
+    with stage('soft_delete_missing', entity):
+        deleted = backend.soft_delete_missing(cursor, entity, batch_id)
+    logging.info("Snapshot of %s: %d rows missing from the source were soft-deleted.", entity, deleted)
+    return deleted
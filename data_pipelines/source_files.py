@@ -0,0 +1,82 @@
+import os
+import glob
+from decompression import COMPRESSION_FORMATS, strip_compression
+
+# ################################################################################
+# #                           Source Formats
+# ################################################################################
+
+# Source extensions read with pyarrow instead of the pandas text parsers
+COLUMNAR_FORMATS = {
+    '.parquet': 'parquet',
+    '.arrow': 'ipc',
+    '.feather': 'ipc',
+    '.ipc': 'ipc',
+}
+
+def columnar_format(file_path):
+    """Return 'parquet' or 'ipc' for columnar files, None for text files."""
+    return COLUMNAR_FORMATS.get(os.path.splitext(strip_compression(file_path))[1].lower())
+
+# ################################################################################
+# #                           Source Files
+# ################################################################################
+
+def resolve_source_file(directory_path, file_name):
+    """Return the source path for file_name, preferring a columnar export of the same name.
+
+    e.g. data/salesforce/companies.parquet is loaded instead of companies.csv
+    when both exist, and companies.csv.gz or companies.csv.zst when only the
+    compressed export exists.
+    """
+    stem = os.path.splitext(file_name)[0]
+    for extension in COLUMNAR_FORMATS:
+        candidate = os.path.join(directory_path, stem + extension)
+        if os.path.exists(candidate):
+            return candidate
+
+    file_path = os.path.join(directory_path, file_name)
+    if not os.path.exists(file_path):
+        for extension in COMPRESSION_FORMATS:
+            if os.path.exists(file_path + extension):
+                return file_path + extension
+    return file_path
+
+def list_shards(directory_path, file_name):
+    """Return the files in directory_path that hold the same kind of data as file_name."""
+    extensions = {os.path.splitext(file_name)[1].lower()} | set(COLUMNAR_FORMATS)
+    return sorted(
+        entry.path for entry in os.scandir(directory_path)
+        if entry.is_file() and os.path.splitext(strip_compression(entry.name))[1].lower() in extensions
+    )
+
+def resolve_source_files(directory_path, file_name, source=None):
+    """Return the shard paths of an entity.
+
+    source may be a file, a directory of shards or a glob such as
+    'data/salesforce/activities/part-*.json'. Without it, a directory named
+    after the entity (data/salesforce/activities/) is used when present, and
+    the single file from resolve_source_file otherwise.
+    """
+    if source is None:
+        shard_directory = os.path.join(directory_path, os.path.splitext(file_name)[0])
+        if not os.path.isdir(shard_directory):
+            return [resolve_source_file(directory_path, file_name)]
+        source = shard_directory
+
+    if os.path.isdir(source):
+        file_paths = list_shards(source, file_name)
+    elif glob.has_magic(source):
+        file_paths = sorted(path for path in glob.glob(source) if os.path.isfile(path))
+    else:
+        file_paths = [source]
+
+    if not file_paths:
+        raise FileNotFoundError(f"No source files match {source}.")
+    return file_paths
+
+def describe_failed_shards(failed):
+    """Return a batch exceptions message for the failed shards, or None if all loaded."""
+    if not failed:
+        return None
+    return "Failed shards: " + "; ".join(f"{file_path}: {error}" for file_path, error in failed.items())
@@ -0,0 +1,86 @@
+import os
+import hashlib
+import logging
+
+# Read size for hashing source files
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Returned by the loaders instead of a batch ID when no source file changed
+UNCHANGED = object()
+
+# ################################################################################
+# #                           Fingerprints
+# ################################################################################
+
+def file_sha256(file_path):
+    """Return the SHA-256 hex digest of the file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def stat_fingerprint(file_path):
+    """Return the size and mtime of the file; the hash is filled in on demand."""
+    stat = os.stat(file_path)
+    return {
+        "file_path": file_path,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": None,
+    }
+
+# ################################################################################
+# #                           Manifest Checks
+# ################################################################################
+
+def check_sources(backend, cursor, entity, file_paths):
+    """Compare the entity's source files with the manifest.
+
+    Returns (unchanged, fingerprints). A file whose size and mtime match the
+    manifest is trusted without reading it; one with the same size but a new
+    mtime is hashed, so a touched but identical file still counts as
+    unchanged. Files are only hashed in full when they will be loaded.
+    """
+    manifest = backend.get_source_manifest(cursor, entity)
+    fingerprints = [stat_fingerprint(file_path) for file_path in file_paths]
+    unchanged = bool(manifest) and set(manifest) == set(file_paths)
+
+    for fingerprint in fingerprints:
+        previous = manifest.get(fingerprint["file_path"])
+        if not unchanged or previous is None or previous["size"] != fingerprint["size"]:
+            unchanged = False
+            break
+        if previous["mtime_ns"] == fingerprint["mtime_ns"]:
+            fingerprint["sha256"] = previous["sha256"]
+        else:
+            fingerprint["sha256"] = file_sha256(fingerprint["file_path"])
+            unchanged = fingerprint["sha256"] == previous["sha256"]
+
+    if unchanged:
+        return True, fingerprints
+
+    for fingerprint in fingerprints:
+        if fingerprint["sha256"] is None:
+            fingerprint["sha256"] = file_sha256(fingerprint["file_path"])
+    return False, fingerprints
+
+def complete_sources(fingerprints, staged, failed):
+    """Return the fingerprints of the shards staged in full.
+
+    Shards that failed or lost chunks to validation (in failed with a
+    SkippedRowsError) are left out, so the manifest does not record them
+    and the next run loads the entity again.
+    """
+    return [fp for fp in fingerprints if fp["file_path"] in staged and fp["file_path"] not in failed]
+
+def skip_unchanged_sources(backend, cursor, entity, file_paths, force=False):
+    """Return (skip, fingerprints) for the entity's sources and log the decision."""
+    if force:
+        logging.info("Force reload requested for %s.", entity)
+        return False, [dict(stat_fingerprint(file_path), sha256=file_sha256(file_path)) for file_path in file_paths]
+
+    unchanged, fingerprints = check_sources(backend, cursor, entity, file_paths)
+    if unchanged:
+        logging.info("Source files for %s are unchanged since the last load, skipping.", entity)
+    return unchanged, fingerprints
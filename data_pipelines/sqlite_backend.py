@@ -0,0 +1,568 @@
+import os
+import sqlite3
+import logging
+from backends import Backend, sqlite_path
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'schema', 'init_sqlite.sql')
+# Bump when init_sqlite.sql changes; every statement in it is IF NOT EXISTS,
+# so older database files are brought up to date by re-running it
+SCHEMA_VERSION = 4
+
+# Columns added to existing tables after their first release: (table, column,
+# definition). CREATE TABLE IF NOT EXISTS leaves older tables as they are, so
+# these are added first; indexes in init_sqlite.sql may refer to them
+ADDED_COLUMNS = [
+    ("companies", "is_deleted", "INTEGER NOT NULL DEFAULT 0"),
+    ("companies", "deleted_batch_id", "INTEGER"),
+    ("contacts", "is_deleted", "INTEGER NOT NULL DEFAULT 0"),
+    ("contacts", "deleted_batch_id", "INTEGER"),
+    ("opportunities", "is_deleted", "INTEGER NOT NULL DEFAULT 0"),
+    ("opportunities", "deleted_batch_id", "INTEGER"),
+    ("activities", "is_deleted", "INTEGER NOT NULL DEFAULT 0"),
+    ("activities", "deleted_batch_id", "INTEGER"),
+]
+
+# ################################################################################
+# #                           Validations
+# ################################################################################
+# Same rules, order and severities as the run_validations procedure:
+# 1: marked as Error and wont get loaded
+# 2: marked as Warning and will get loaded
+
+VALIDATIONS = [
+    # Remove Duplicates based on created date
+    """
+    UPDATE stg_contacts
+    SET is_error = 1,
+        error_description = 'Duplicate record'
+    WHERE created_date < (
+        SELECT MAX(latest.created_date)
+        FROM stg_contacts latest
+        WHERE latest.id = stg_contacts.id
+    )
+    """,
+    # Capture Invalid Phone Numbers; the loader writes valid numbers in E.164
+    """
+    UPDATE stg_contacts
+    SET is_error = 2,
+        error_description = 'Invalid Phone Number'
+    WHERE phone NOT GLOB '+[1-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]*'
+    OR phone GLOB '+*[^0-9]*'
+    OR LENGTH(phone) > 16
+    """,
+    # Capture Invalid Emails
+    """
+    UPDATE stg_contacts
+    SET is_error = 2,
+        error_description = 'Invalid Email'
+    WHERE INSTR(email, '@') = 0
+    """,
+    # Invalid Date range; dates are staged as 'YYYY-MM-DD HH:MM:SS' and compare as strings
+    """
+    UPDATE stg_contacts
+    SET is_error = 2,
+        error_description = 'Invalid Dates'
+    WHERE created_date > DATETIME('now', 'localtime')
+    OR last_modified > DATETIME('now', 'localtime')
+    """,
+    # Invalid Country Abbr
+    """
+    UPDATE stg_companies
+    SET is_error = 1,
+        error_description = 'Invalid Country'
+    WHERE LENGTH(TRIM(country)) > 2
+    """,
+    # Missing Activity Timestamp
+    """
+    UPDATE stg_activities
+    SET is_error = 1,
+        error_description = 'Invalid Timestamp'
+    WHERE timestamp IS NULL
+    """,
+    # Duplicate Activities: keep the latest timestamp of an id
+    """
+    UPDATE stg_activities
+    SET is_error = 1,
+        error_description = 'Duplicate record'
+    WHERE timestamp < (
+        SELECT MAX(latest.timestamp)
+        FROM stg_activities latest
+        WHERE latest.id = stg_activities.id
+    )
+    """,
+]
+
+# ################################################################################
+# #                           Upserts
+# ################################################################################
+# INSERT ... ON CONFLICT against the unique source_id. The DO UPDATE only
+# fires for rows whose values changed, so batch_id keeps marking changed rows
+# exactly like the MySQL procedures.
+
+UPSERTS = {
+    "companies": """
+    INSERT INTO companies (source_id, name, domain, industry, size, country, created_date, is_customer, annual_revenue, batch_id)
+    SELECT
+        id,
+        name,
+        domain,
+        industry,
+        size,
+        country,
+        created_date,
+        LOWER(is_customer) IN ('1', 'true'),
+        CAST(annual_revenue AS INTEGER),
+        :batch_id
+    FROM stg_companies
+    WHERE is_error != 1
+    ON CONFLICT (source_id) DO UPDATE SET
+        name = excluded.name,
+        domain = excluded.domain,
+        industry = excluded.industry,
+        size = excluded.size,
+        country = excluded.country,
+        created_date = excluded.created_date,
+        is_customer = excluded.is_customer,
+        annual_revenue = excluded.annual_revenue,
+        batch_id = excluded.batch_id,
+        is_deleted = 0,
+        deleted_batch_id = NULL
+    WHERE is_deleted
+    OR name IS NOT excluded.name
+    OR domain IS NOT excluded.domain
+    OR industry IS NOT excluded.industry
+    OR size IS NOT excluded.size
+    OR country IS NOT excluded.country
+    OR created_date IS NOT excluded.created_date
+    OR is_customer IS NOT excluded.is_customer
+    OR annual_revenue IS NOT excluded.annual_revenue
+    """,
+    "contacts": """
+    INSERT INTO contacts (source_id, email, first_name, last_name, title, company_id, phone, status, created_date, last_modified, batch_id)
+    SELECT
+        CO.id,
+        CO.email,
+        CO.first_name,
+        CO.last_name,
+        CO.title,
+        C.company_id,
+        CO.phone,
+        CO.status,
+        CO.created_date,
+        CO.last_modified,
+        :batch_id
+    FROM stg_contacts CO
+    JOIN companies C ON C.source_id = CO.company_id
+    WHERE CO.is_error != 1
+    ON CONFLICT (source_id) DO UPDATE SET
+        email = excluded.email,
+        first_name = excluded.first_name,
+        last_name = excluded.last_name,
+        title = excluded.title,
+        company_id = excluded.company_id,
+        phone = excluded.phone,
+        status = excluded.status,
+        created_date = excluded.created_date,
+        last_modified = excluded.last_modified,
+        batch_id = excluded.batch_id,
+        is_deleted = 0,
+        deleted_batch_id = NULL
+    WHERE is_deleted
+    OR email IS NOT excluded.email
+    OR first_name IS NOT excluded.first_name
+    OR last_name IS NOT excluded.last_name
+    OR title IS NOT excluded.title
+    OR company_id IS NOT excluded.company_id
+    OR phone IS NOT excluded.phone
+    OR status IS NOT excluded.status
+    OR created_date IS NOT excluded.created_date
+    OR last_modified IS NOT excluded.last_modified
+    """,
+    "opportunities": """
+    INSERT INTO opportunities (source_id, name, contact_id, company_id, amount, stage, product, probability,
+                               created_date, close_date, is_closed, forecast_category, batch_id)
+    SELECT
+        O.id,
+        O.name,
+        DC.contact_id,
+        C.company_id,
+        CAST(O.amount AS NUMERIC),
+        O.stage,
+        O.product,
+        CAST(O.probability AS INTEGER),
+        O.created_date,
+        O.close_date,
+        LOWER(O.is_closed) IN ('1', 'true'),
+        O.forecast_category,
+        :batch_id
+    FROM stg_opportunities O
+    JOIN companies C ON C.source_id = O.company_id
+    JOIN contacts DC ON DC.source_id = O.contact_id
+    WHERE O.is_error != 1
+    ON CONFLICT (source_id) DO UPDATE SET
+        name = excluded.name,
+        contact_id = excluded.contact_id,
+        company_id = excluded.company_id,
+        amount = excluded.amount,
+        stage = excluded.stage,
+        product = excluded.product,
+        probability = excluded.probability,
+        created_date = excluded.created_date,
+        close_date = excluded.close_date,
+        is_closed = excluded.is_closed,
+        forecast_category = excluded.forecast_category,
+        batch_id = excluded.batch_id,
+        is_deleted = 0,
+        deleted_batch_id = NULL
+    WHERE is_deleted
+    OR name IS NOT excluded.name
+    OR contact_id IS NOT excluded.contact_id
+    OR company_id IS NOT excluded.company_id
+    OR amount IS NOT excluded.amount
+    OR stage IS NOT excluded.stage
+    OR product IS NOT excluded.product
+    OR probability IS NOT excluded.probability
+    OR created_date IS NOT excluded.created_date
+    OR close_date IS NOT excluded.close_date
+    OR is_closed IS NOT excluded.is_closed
+    OR forecast_category IS NOT excluded.forecast_category
+    """,
+    "activities": """
+    INSERT INTO activities (source_id, contact_id, opportunity_id, type, subject, timestamp, duration_minutes, outcome, notes, batch_id)
+    SELECT
+        A.id,
+        DC.contact_id,
+        O.opportunity_id,
+        A.type,
+        A.subject,
+        A.timestamp,
+        CAST(A.duration_minutes AS INTEGER),
+        A.outcome,
+        A.notes,
+        :batch_id
+    FROM stg_activities A
+    LEFT JOIN opportunities O ON O.source_id = A.opportunity_id
+    LEFT JOIN contacts DC ON DC.source_id = A.contact_id
+    WHERE A.is_error != 1
+    ON CONFLICT (source_id) DO UPDATE SET
+        contact_id = excluded.contact_id,
+        opportunity_id = excluded.opportunity_id,
+        type = excluded.type,
+        subject = excluded.subject,
+        timestamp = excluded.timestamp,
+        duration_minutes = excluded.duration_minutes,
+        outcome = excluded.outcome,
+        notes = excluded.notes,
+        batch_id = excluded.batch_id,
+        is_deleted = 0,
+        deleted_batch_id = NULL
+    WHERE is_deleted
+    OR contact_id IS NOT excluded.contact_id
+    OR opportunity_id IS NOT excluded.opportunity_id
+    OR type IS NOT excluded.type
+    OR subject IS NOT excluded.subject
+    OR timestamp IS NOT excluded.timestamp
+    OR duration_minutes IS NOT excluded.duration_minutes
+    OR outcome IS NOT excluded.outcome
+    """,
+}
+
+# ################################################################################
+# #                           Soft Deletes
+# ################################################################################
+# Port of the SoftDeleteMissing procedure: the partial idx_<entity>_live index
+# only holds live rows, and staging is probed by id.
+
+SOFT_DELETE_MISSING = """
+UPDATE {table}
+SET is_deleted = 1,
+    deleted_batch_id = :batch_id,
+    batch_id = :batch_id
+WHERE is_deleted = 0
+AND NOT EXISTS (SELECT 1 FROM stg_{table} S WHERE S.id = {table}.source_id)
+"""
+
+# ################################################################################
+# #                           Summaries
+# ################################################################################
+# Port of the RefreshSummaries procedure; see schema/procedures.sql for the approach.
+
+REFRESH_SUMMARIES = [
+    # Companies whose rollup changes, by old (ledger) and new membership
+    "CREATE TEMP TABLE IF NOT EXISTS tmp_summary_companies (company_id INTEGER PRIMARY KEY)",
+    "DELETE FROM tmp_summary_companies",
+    """
+    INSERT OR IGNORE INTO tmp_summary_companies
+    SELECT company_id FROM companies WHERE batch_id = :batch_id
+    UNION
+    SELECT company_id FROM contacts WHERE batch_id = :batch_id AND company_id IS NOT NULL
+    UNION
+    SELECT L.company_id
+    FROM summary_contact_ledger L
+    JOIN contacts DC ON DC.contact_id = L.contact_id
+    WHERE DC.batch_id = :batch_id AND L.company_id IS NOT NULL
+    UNION
+    SELECT company_id FROM opportunities WHERE batch_id = :batch_id AND company_id IS NOT NULL
+    UNION
+    SELECT L.company_id
+    FROM summary_opportunity_ledger L
+    JOIN opportunities DO ON DO.opportunity_id = L.opportunity_id
+    WHERE DO.batch_id = :batch_id AND L.company_id IS NOT NULL
+    """,
+    # Pipeline by stage / forecast category / product
+    """
+    UPDATE summary_pipeline
+    SET opportunity_count = summary_pipeline.opportunity_count - D.opportunity_count,
+        open_count = summary_pipeline.open_count - D.open_count,
+        total_amount = summary_pipeline.total_amount - D.total_amount,
+        weighted_amount = summary_pipeline.weighted_amount - D.weighted_amount,
+        batch_id = :batch_id
+    FROM (
+        SELECT L.stage, L.forecast_category, L.product,
+            COUNT(*) AS opportunity_count,
+            SUM(NOT L.is_closed) AS open_count,
+            SUM(L.amount) AS total_amount,
+            SUM(L.amount * L.probability / 100.0) AS weighted_amount
+        FROM summary_opportunity_ledger L
+        JOIN opportunities DO ON DO.opportunity_id = L.opportunity_id
+        WHERE DO.batch_id = :batch_id
+        GROUP BY L.stage, L.forecast_category, L.product
+    ) D
+    WHERE D.stage = summary_pipeline.stage
+    AND D.forecast_category = summary_pipeline.forecast_category
+    AND D.product = summary_pipeline.product
+    """,
+    """
+    INSERT INTO summary_pipeline
+        (stage, forecast_category, product, opportunity_count, open_count, total_amount, weighted_amount, batch_id)
+    SELECT COALESCE(stage, ''),
+        COALESCE(forecast_category, ''),
+        COALESCE(product, ''),
+        COUNT(*),
+        SUM(NOT COALESCE(is_closed, 0)),
+        SUM(COALESCE(amount, 0)),
+        SUM(COALESCE(amount, 0) * COALESCE(probability, 0) / 100.0),
+        :batch_id
+    FROM opportunities
+    WHERE batch_id = :batch_id AND NOT is_deleted
+    GROUP BY COALESCE(stage, ''), COALESCE(forecast_category, ''), COALESCE(product, '')
+    ON CONFLICT (stage, forecast_category, product) DO UPDATE SET
+        opportunity_count = opportunity_count + excluded.opportunity_count,
+        open_count = open_count + excluded.open_count,
+        total_amount = total_amount + excluded.total_amount,
+        weighted_amount = weighted_amount + excluded.weighted_amount,
+        batch_id = excluded.batch_id
+    """,
+    "DELETE FROM summary_pipeline WHERE opportunity_count = 0",
+    """
+    INSERT OR REPLACE INTO summary_opportunity_ledger
+        (opportunity_id, company_id, stage, forecast_category, product, amount, probability, is_closed)
+    SELECT opportunity_id,
+        company_id,
+        COALESCE(stage, ''),
+        COALESCE(forecast_category, ''),
+        COALESCE(product, ''),
+        COALESCE(amount, 0),
+        COALESCE(probability, 0),
+        COALESCE(is_closed, 0)
+    FROM opportunities
+    WHERE batch_id = :batch_id AND NOT is_deleted
+    """,
+    """
+    DELETE FROM summary_opportunity_ledger
+    WHERE opportunity_id IN (SELECT opportunity_id FROM opportunities WHERE batch_id = :batch_id AND is_deleted)
+    """,
+    # Activities per contact / opportunity / day
+    """
+    UPDATE summary_activity_daily
+    SET activity_count = summary_activity_daily.activity_count - D.activity_count,
+        completed_count = summary_activity_daily.completed_count - D.completed_count,
+        total_duration_minutes = summary_activity_daily.total_duration_minutes - D.total_duration_minutes,
+        batch_id = :batch_id
+    FROM (
+        SELECT L.activity_date, L.contact_id, L.opportunity_id,
+            COUNT(*) AS activity_count,
+            SUM(L.is_completed) AS completed_count,
+            SUM(L.duration_minutes) AS total_duration_minutes
+        FROM summary_activity_ledger L
+        JOIN activities DA ON DA.source_id = L.source_id
+        WHERE DA.batch_id = :batch_id
+        GROUP BY L.activity_date, L.contact_id, L.opportunity_id
+    ) D
+    WHERE D.activity_date = summary_activity_daily.activity_date
+    AND D.contact_id = summary_activity_daily.contact_id
+    AND D.opportunity_id = summary_activity_daily.opportunity_id
+    """,
+    """
+    INSERT INTO summary_activity_daily
+        (activity_date, contact_id, opportunity_id, activity_count, completed_count, total_duration_minutes, batch_id)
+    SELECT DATE(timestamp),
+        COALESCE(contact_id, 0),
+        COALESCE(opportunity_id, 0),
+        COUNT(*),
+        SUM(outcome = 'Completed'),
+        SUM(COALESCE(duration_minutes, 0)),
+        :batch_id
+    FROM activities
+    WHERE batch_id = :batch_id AND NOT is_deleted
+    GROUP BY DATE(timestamp), COALESCE(contact_id, 0), COALESCE(opportunity_id, 0)
+    ON CONFLICT (activity_date, contact_id, opportunity_id) DO UPDATE SET
+        activity_count = activity_count + excluded.activity_count,
+        completed_count = completed_count + excluded.completed_count,
+        total_duration_minutes = total_duration_minutes + excluded.total_duration_minutes,
+        batch_id = excluded.batch_id
+    """,
+    "DELETE FROM summary_activity_daily WHERE activity_count = 0",
+    """
+    INSERT OR REPLACE INTO summary_activity_ledger
+        (source_id, activity_date, contact_id, opportunity_id, duration_minutes, is_completed)
+    SELECT source_id,
+        DATE(timestamp),
+        COALESCE(contact_id, 0),
+        COALESCE(opportunity_id, 0),
+        COALESCE(duration_minutes, 0),
+        COALESCE(outcome = 'Completed', 0)
+    FROM activities
+    WHERE batch_id = :batch_id AND NOT is_deleted
+    """,
+    """
+    DELETE FROM summary_activity_ledger
+    WHERE source_id IN (SELECT source_id FROM activities WHERE batch_id = :batch_id AND is_deleted)
+    """,
+    # Company customer rollups, recomputed for the affected companies only
+    """
+    INSERT OR REPLACE INTO summary_company_customers
+        (company_id, is_customer, contact_count, customer_contact_count, opportunity_count,
+         open_opportunity_count, open_pipeline_amount, won_amount, batch_id)
+    SELECT C.company_id,
+        C.is_customer,
+        (SELECT COUNT(*) FROM contacts DC WHERE DC.company_id = C.company_id AND NOT DC.is_deleted),
+        (SELECT COUNT(*) FROM contacts DC
+         WHERE DC.company_id = C.company_id AND NOT DC.is_deleted AND DC.status = 'Customer'),
+        (SELECT COUNT(*) FROM opportunities DO WHERE DO.company_id = C.company_id AND NOT DO.is_deleted),
+        (SELECT COUNT(*) FROM opportunities DO
+         WHERE DO.company_id = C.company_id AND NOT DO.is_deleted AND NOT COALESCE(DO.is_closed, 0)),
+        (SELECT COALESCE(SUM(DO.amount), 0) FROM opportunities DO
+         WHERE DO.company_id = C.company_id AND NOT DO.is_deleted AND NOT COALESCE(DO.is_closed, 0)),
+        (SELECT COALESCE(SUM(DO.amount), 0) FROM opportunities DO
+         WHERE DO.company_id = C.company_id AND NOT DO.is_deleted AND DO.stage = 'Closed Won'),
+        :batch_id
+    FROM tmp_summary_companies T
+    JOIN companies C ON C.company_id = T.company_id AND NOT C.is_deleted
+    """,
+    """
+    DELETE FROM summary_company_customers
+    WHERE company_id IN (SELECT company_id FROM companies WHERE batch_id = :batch_id AND is_deleted)
+    """,
+    """
+    INSERT OR REPLACE INTO summary_contact_ledger (contact_id, company_id)
+    SELECT contact_id, company_id
+    FROM contacts
+    WHERE batch_id = :batch_id AND NOT is_deleted
+    """,
+    """
+    DELETE FROM summary_contact_ledger
+    WHERE contact_id IN (SELECT contact_id FROM contacts WHERE batch_id = :batch_id AND is_deleted)
+    """,
+]
+
+SUMMARY_TABLES = [
+    "summary_pipeline",
+    "summary_activity_daily",
+    "summary_company_customers",
+    "summary_opportunity_ledger",
+    "summary_activity_ledger",
+    "summary_contact_ledger",
+]
+
+BATCH_IDS = """
+SELECT batch_id FROM companies WHERE batch_id IS NOT NULL
+UNION
+SELECT batch_id FROM contacts WHERE batch_id IS NOT NULL
+UNION
+SELECT batch_id FROM opportunities WHERE batch_id IS NOT NULL
+UNION
+SELECT batch_id FROM activities WHERE batch_id IS NOT NULL
+ORDER BY batch_id
+"""
+
+# ################################################################################
+# #                           SQLite Backend
+# ################################################################################
+
+class SQLiteBackend(Backend):
+    """Embedded SQLite database file for local, CI and single-node runs.
+
+    The connection runs in WAL mode with synchronous=NORMAL, so readers are
+    never blocked by a load and a commit only syncs the write-ahead log.
+    sqlite3 opens a transaction on the first write and keeps it until the
+    loader commits, so all executemany chunks of a batch share a single
+    transaction, as they do on MySQL.
+    """
+
+    name = "sqlite"
+    placeholder = "?"
+    Error = sqlite3.Error
+
+    def __init__(self, path=None):
+        self.path = path or sqlite_path()
+
+    def _connect(self):
+        # A ConnectionPool lends connections to one thread at a time
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute("PRAGMA temp_store = MEMORY")
+        connection.execute("PRAGMA cache_size = -65536")  # 64 MiB page cache
+        self._init_schema(connection)
+        return connection
+
+    def _init_schema(self, connection):
+        """Create or upgrade the schema when the database file is older than SCHEMA_VERSION."""
+        (version,) = connection.execute("PRAGMA user_version").fetchone()
+        if version >= SCHEMA_VERSION:
+            return
+        logging.info("Initializing SQLite schema in %s", self.path)
+        for table, column, definition in ADDED_COLUMNS:
+            columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+            if columns and column not in columns:
+                connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        with open(SCHEMA_PATH) as schema_file:
+            connection.executescript(schema_file.read())
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def truncate_staging_tables(self, cursor, tables):
+        """Empty the given staging tables"""
+        for table in tables:
+            cursor.execute(f"DELETE FROM {table}")
+
+    def run_validations(self, cursor):
+        """Run Validations"""
+        for statement in VALIDATIONS:
+            cursor.execute(statement)
+
+    def upsert(self, cursor, entity, batch_id):
+        """Upsert staged rows of the entity into its target table"""
+        cursor.execute(UPSERTS[entity], {"batch_id": batch_id})
+
+    def soft_delete_missing(self, cursor, entity, batch_id):
+        """Tombstone the rows of the entity missing from its staging table; return how many"""
+        cursor.execute(SOFT_DELETE_MISSING.format(table=entity), {"batch_id": batch_id})
+        return cursor.rowcount
+
+    def refresh_summaries(self, cursor, batch_id):
+        """Fold the rows changed by the batch into the summary tables"""
+        for statement in REFRESH_SUMMARIES:
+            cursor.execute(statement, {"batch_id": batch_id} if ":batch_id" in statement else ())
+
+    def rebuild_summaries(self, cursor):
+        """Recompute the summary tables from scratch"""
+        for table in SUMMARY_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        for (batch_id,) in cursor.execute(BATCH_IDS).fetchall():
+            self.refresh_summaries(cursor, batch_id)
+
+    def maintain_activity_partitions(self, cursor, months_ahead, retain_months):
+        """SQLite tables are not partitioned; nothing to maintain"""
+        logging.debug("Activity partition maintenance skipped on SQLite.")
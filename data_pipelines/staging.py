@@ -0,0 +1,436 @@
+import pandas as pd
+from pandera import Check
+from pandera.errors import SchemaErrors
+import os
+import queue
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from chunking import AdaptiveChunker
+from profiling import stage
+from decompression import compression_format, open_source
+from source_files import columnar_format
+
+# Dedicated logger for failed rows; cli.configure_logging sends it to failed_rows.log
+fail_logger = logging.getLogger('fail_logger')
+fail_logger.setLevel(logging.ERROR)
+
+# ################################################################################
+# #                           Chunk Preparation
+# ################################################################################
+
+def align_columns(chunk_df, headers):
+    """Log header mismatches and align the chunk to the expected headers."""
+    # Ensure the DataFrame columns match the provided headers
+    if list(chunk_df.columns) != headers:
+        logging.warning("The columns in the chunk don't match the expected headers.")
+        logging.warning("Expected headers: %s", headers)
+        logging.warning("Found headers: %s", list(chunk_df.columns))
+
+    # If extra columns exist, log them
+    extra_columns = set(chunk_df.columns) - set(headers)
+    if extra_columns:
+        logging.warning("Extra columns found in the chunk: %s", extra_columns)
+
+    # Align the DataFrame to the expected headers (if any columns are missing, they will be NaN)
+    chunk_df = chunk_df.reindex(columns=headers)
+    logging.info("Aligned chunk DataFrame columns to the expected headers.")
+    return chunk_df
+
+def validate_chunk(chunk_df, schema):
+    """Validate the chunk with pandera; return False and log if it fails."""
+    try:
+        # lazy=True collects every failure into a single SchemaErrors
+        schema.validate(chunk_df, lazy=True)
+        logging.info("Chunk data is valid according to pandera schema.")
+        return True
+    except SchemaErrors as e:
+        logging.error("Validation failed for chunk: %s", e)
+        return False
+
+def categorize_columns(chunk_df, domains):
+    """Convert the columns in domains to categoricals whose leading categories are the domain.
+
+    Every chunk gets the same codes for known values, so a membership check
+    is an integer comparison (see domain_check). Values outside the domain
+    are kept as extra categories after it.
+    """
+    for col, domain in domains.items():
+        values = chunk_df[col]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype('category')
+        known = set(domain)
+        unseen = [value for value in values.cat.categories if value not in known]
+        chunk_df[col] = values.cat.set_categories(list(domain) + unseen)
+    return chunk_df
+
+def normalize_columns(chunk_df, normalizers):
+    """Replace each column in normalizers with its normalized values, e.g. normalize_phones for phone.
+
+    Normalizers take and return a whole column, so they run vectorized or
+    once per distinct value on the chunk before it is validated and staged.
+    """
+    for col, normalize in normalizers.items():
+        chunk_df[col] = normalize(chunk_df[col])
+    return chunk_df
+
+def domain_check(domain, error):
+    """Return a pandera check that a column from categorize_columns only holds values of the domain."""
+    size = len(domain)
+    return Check(lambda s: s.cat.codes < size, error=error)
+
+def to_naive_utc(values):
+    """Return datetime64[us] values without a time zone; tz-aware values are converted to UTC first."""
+    if getattr(values.dt, 'tz', None) is not None:
+        values = values.dt.tz_convert('UTC').dt.tz_localize(None)
+    return values.dt.as_unit('us')
+
+def parse_datetime(values):
+    """Parse a column of ISO-8601 strings into datetime64 values.
+
+    The ISO-8601 parser handles the exports without inferring a format per
+    chunk. Only the values it rejects are retried with per-value parsing.
+    Values with an offset (e.g. 'Z' or '+0000') are converted to UTC;
+    values without one are kept as they are. Unparseable values become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        # Columnar sources are already typed
+        return to_naive_utc(values)
+
+    # utc=True also accepts offsets that differ between values; a single
+    # resolution keeps the fallback values assignable into the column
+    parsed = to_naive_utc(pd.to_datetime(values, format='ISO8601', errors='coerce', utc=True))
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        fallback = pd.to_datetime(values[retry], format='mixed', errors='coerce', utc=True)
+        parsed[retry] = to_naive_utc(fallback.dt.floor('us'))
+    return parsed
+
+def parse_datetime_columns(chunk_df, datetime_columns):
+    """Parse datetime columns once; validation and format_datetime_columns reuse the result."""
+    for col in datetime_columns:
+        chunk_df[col] = parse_datetime(chunk_df[col])
+    return chunk_df
+
+def format_datetime_columns(chunk_df, datetime_columns):
+    """Format parsed datetime columns as the strings expected by the staging tables."""
+    for col in datetime_columns:
+        chunk_df[col] = chunk_df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+        logging.info("Formatted datetime column: %s", col)
+    return chunk_df
+
+def encode_rows(chunk_df):
+    """Return the chunk as a list of tuples of native Python values.
+
+    DB-API drivers reject numpy scalars and NaN, so values are converted to
+    Python objects and missing values to None.
+    """
+    values = chunk_df.astype(object).where(chunk_df.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+# ################################################################################
+# #                           Staging Inserts
+# ################################################################################
+
+def estimate_row_bytes(chunk_df, sample_rows=100):
+    """Estimate the bytes one row of the chunk adds to a multi-row INSERT, from its first rows."""
+    sample = encode_rows(chunk_df.head(sample_rows))
+    if not sample:
+        return None
+    # Quotes and separators add a few bytes to every value
+    return sum(len(str(value)) + 3 for row in sample for value in row) / len(sample)
+
+def insert_rows(backend, cursor, chunk_df, headers, table_name):
+    """Insert the chunk into the staging table and return the number of rows inserted."""
+    # Create placeholders for the insert query
+    placeholders = ', '.join([backend.placeholder] * len(headers))
+    insert_query = f"INSERT INTO {table_name} ({', '.join(headers)}) VALUES ({placeholders})"
+
+    entity = table_name.replace('stg_', '', 1)
+
+    # Collect all rows for batch insert
+    with stage('encode', entity):
+        rows_to_insert = encode_rows(chunk_df)
+
+    try:
+        # Use executemany for batch insert
+        with stage('executemany', entity):
+            cursor.executemany(insert_query, rows_to_insert)
+        logging.info("Batch insert successful: %d rows inserted into %s.", len(rows_to_insert), table_name)
+        return len(rows_to_insert)
+    except backend.Error as e:
+        logging.error("Error during batch insert for chunk: %s", e)
+
+    # Retry row by row so that only the failing rows are lost, and log them
+    inserted = 0
+    for idx, row in zip(chunk_df.index, rows_to_insert):
+        try:
+            cursor.execute(insert_query, row)
+            inserted += 1
+        except backend.Error as e:
+            fail_logger.error("Failed to insert row %d: %s. Error: %s", idx, dict(zip(headers, row)), e)
+    return inserted
+
+# ################################################################################
+# #                           Text Sources
+# ################################################################################
+
+def slice_frame(df, chunker):
+    """Yield consecutive slices of df sized by the chunker."""
+    offset = 0
+    while offset < len(df):
+        size = chunker.size
+        yield df.iloc[offset:offset + size]
+        offset += size
+
+def read_csv_chunks(file_path, chunker, dtype=None):
+    """Yield DataFrames sized by the chunker from a CSV file, decompressing it in a background thread if needed."""
+    with open_source(file_path) as source:
+        with pd.read_csv(source, iterator=True, dtype=dtype) as reader:
+            while True:
+                try:
+                    yield reader.get_chunk(chunker.size)
+                except StopIteration:
+                    return
+
+def read_json_chunks(file_path, chunker, dtype=None):
+    """Yield DataFrames sized by the chunker from a JSON file, decompressing it in a background thread if needed.
+
+    The JSON array is parsed as a whole, but validation, encoding and
+    inserts still run one chunk at a time.
+    """
+    with open_source(file_path) as source:
+        # Dates are left as strings for parse_datetime_columns
+        df = pd.read_json(source, convert_dates=False, dtype=dtype or True)
+    yield from slice_frame(df, chunker)
+
+# ################################################################################
+# #                           Columnar Sources
+# ################################################################################
+
+def iter_record_batches(file_path, headers, batch_size, dictionary_columns=()):
+    """Yield the record batches of a columnar file, reading only the expected columns.
+
+    Parquet columns in dictionary_columns are decoded as dictionary arrays,
+    which convert to pandas categoricals without materializing strings.
+    """
+    if compression_format(file_path):
+        # Both formats need random access and compress their columns internally
+        raise ValueError(f"Compressed columnar file {file_path} is not supported, use Parquet or Arrow IPC compression instead.")
+
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    if columnar_format(file_path) == 'parquet':
+        names = pyarrow.parquet.read_schema(file_path).names
+        parquet_file = pyarrow.parquet.ParquetFile(
+            file_path, read_dictionary=[col for col in dictionary_columns if col in names]
+        )
+        columns = [col for col in headers if col in names]
+        if set(names) - set(columns):
+            logging.warning("Columns not read from %s: %s", file_path, set(names) - set(columns))
+        # Row groups are decoded one batch at a time and only for the projected columns
+        yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+        return
+
+    with pyarrow.memory_map(file_path) as source:
+        try:
+            reader = pyarrow.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pyarrow.ArrowInvalid:
+            # Not the random access format, read it as an IPC stream
+            source.seek(0)
+            reader = pyarrow.ipc.open_stream(source)
+            batches = iter(reader)
+
+        names = reader.schema.names
+        columns = [col for col in headers if col in names]
+        if set(names) - set(columns):
+            logging.warning("Columns not read from %s: %s", file_path, set(names) - set(columns))
+        for batch in batches:
+            yield batch.select(columns)
+
+def read_columnar_chunks(file_path, headers, chunker, dictionary_columns=()):
+    """Yield DataFrames sized by the chunker from a Parquet or Arrow IPC file.
+
+    Columns keep their Arrow types, so numbers, booleans and timestamps reach
+    validation already typed instead of being parsed from text.
+    """
+    for batch in iter_record_batches(file_path, headers, chunker.max_rows, dictionary_columns):
+        offset = 0
+        while offset < batch.num_rows:
+            size = chunker.size
+            yield batch.slice(offset, size).to_pandas()
+            offset += size
+
+# ################################################################################
+# #                           Loading Functions
+# ################################################################################
+
+class SkippedRowsError(Exception):
+    """Rows of a shard left out of staging because their chunks failed validation."""
+
+# Shards read in parallel, and how many prepared chunks may wait for insertion
+SHARD_WORKERS = int(os.getenv("LOAD_SHARD_WORKERS", min(4, os.cpu_count() or 1)))
+SHARD_QUEUE_CHUNKS = 2 * SHARD_WORKERS
+
+def prepare_chunks(file_path, chunker, headers, datetime_columns, schema, read_text, skip_invalid, domains=None,
+                   entity=None, normalizers=None, skipped=None):
+    """Yield the chunks of one file aligned, normalized, validated and formatted for staging.
+
+    Each step runs in its own profiling stage (read, normalize, dates, validate).
+    The row count of every chunk skipped as invalid is appended to skipped,
+    if given.
+    """
+    domains = domains or {}
+    normalizers = normalizers or {}
+
+    if not os.path.exists(file_path):
+        logging.error("The file %s does not exist.", file_path)
+        raise FileNotFoundError(f"The file {file_path} does not exist.")
+
+    if columnar_format(file_path):
+        chunk_iter = read_columnar_chunks(file_path, headers, chunker, list(domains))
+    else:
+        chunk_iter = read_text(file_path, chunker, dtype={col: 'category' for col in domains} or None)
+
+    while True:
+        with stage('read', entity):
+            chunk_df = next(chunk_iter, None)
+            if chunk_df is not None:
+                chunk_df = align_columns(chunk_df, headers)
+        if chunk_df is None:
+            return
+
+        logging.info("Processing chunk with %d rows...", len(chunk_df))
+        with stage('normalize', entity):
+            # Before categorize_columns, so e.g. 'tech' gets the code of 'Technology'
+            if normalizers:
+                chunk_df = normalize_columns(chunk_df, normalizers)
+            chunk_df = categorize_columns(chunk_df, domains)
+
+        with stage('dates', entity):
+            chunk_df = parse_datetime_columns(chunk_df, datetime_columns)
+
+        with stage('validate', entity):
+            valid = validate_chunk(chunk_df, schema)
+        if not valid and skip_invalid:
+            if skipped is not None and len(chunk_df):
+                skipped.append(len(chunk_df))
+            continue  # Skip this chunk if validation fails
+
+        with stage('dates', entity):
+            chunk_df = format_datetime_columns(chunk_df, datetime_columns)
+        yield chunk_df
+
+def load_shards_to_db(backend, cursor, file_paths, headers, datetime_columns, table_name, schema, read_text, skip_invalid,
+                      domains=None, normalizers=None):
+    """Stage the shards of one entity, reading them in parallel.
+
+    Worker threads read, validate and format the shards and hand the chunks
+    to this thread, which inserts them through the cursor. Returns
+    (staged, failed): rows staged per shard, and the error of every shard
+    that could not be read. Chunks staged before a shard failed are kept.
+    A shard that lost chunks to validation stays in staged and is also in
+    failed with a SkippedRowsError, so it is loaded but not complete.
+    Raises the first error if every shard failed. Chunk sizes are tuned by
+    an AdaptiveChunker from the insert timings.
+    """
+    chunker = AdaptiveChunker.for_backend(backend, cursor, table_name)
+    staged = {file_path: 0 for file_path in file_paths}
+    failed = {}
+    chunks = queue.Queue(maxsize=SHARD_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    shard_done = object()
+
+    def put(item):
+        # Wait for room in the queue, but give up once the loader has stopped
+        while not cancelled.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def read_shard(file_path):
+        skipped = []
+        try:
+            for chunk_df in prepare_chunks(file_path, chunker, headers, datetime_columns, schema, read_text,
+                                           skip_invalid, domains, table_name.replace('stg_', '', 1), normalizers,
+                                           skipped):
+                if cancelled.is_set():
+                    return
+                put((file_path, chunk_df))
+        except Exception as e:
+            logging.critical("Error loading file %s: %s", file_path, e)
+            put((file_path, e))
+        else:
+            if skipped:
+                put((file_path, SkippedRowsError(
+                    f"{sum(skipped)} rows in {len(skipped)} chunks failed validation and were not staged")))
+            put((file_path, shard_done))
+
+    workers = max(1, min(SHARD_WORKERS, len(file_paths)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"shard-{table_name}") as executor:
+        for file_path in file_paths:
+            executor.submit(read_shard, file_path)
+
+        try:
+            finished = 0
+            while finished < len(file_paths):
+                file_path, item = chunks.get()
+                if isinstance(item, pd.DataFrame):
+                    started = time.perf_counter()
+                    inserted = insert_rows(backend, cursor, item, headers, table_name)
+                    chunker.record(inserted, time.perf_counter() - started, estimate_row_bytes(item))
+                    staged[file_path] += inserted
+                    continue
+                if isinstance(item, SkippedRowsError):
+                    failed[file_path] = item
+                    logging.warning("Shard %s: %s.", file_path, item)
+                    continue
+
+                finished += 1
+                if item is shard_done:
+                    logging.info("Shard %s: %d rows staged into %s (%d of %d shards finished).",
+                                 file_path, staged[file_path], table_name, finished, len(file_paths))
+                else:
+                    failed[file_path] = item
+                    logging.error("Shard %s failed after %d rows (%d of %d shards finished): %s",
+                                  file_path, staged.pop(file_path), finished, len(file_paths), item)
+        finally:
+            cancelled.set()
+
+    if not staged:
+        raise next(iter(failed.values()))
+    return staged, failed
+
+def load_csv_to_db(backend, cursor, file_paths, headers, datetime_columns, table_name, schema, domains=None,
+                   normalizers=None):
+    """Load CSV shards into the specified database table in chunks and validate using pandera.
+
+    Chunks that fail validation are skipped. Columns in domains are read as
+    categoricals (see categorize_columns), and columns in normalizers are
+    normalized (see normalize_columns). .gz and .zst files are
+    decompressed while they are read. Parquet and Arrow IPC files are read
+    in column-projected batches instead. Returns (staged, failed) as
+    load_shards_to_db does.
+    """
+    return load_shards_to_db(backend, cursor, file_paths, headers, datetime_columns, table_name, schema,
+                             read_csv_chunks, skip_invalid=True, domains=domains, normalizers=normalizers)
+
+def load_json_to_db(backend, cursor, file_paths, headers, datetime_columns, table_name, schema, domains=None,
+                    normalizers=None):
+    """Load JSON shards into the specified database table and validate using pandera.
+
+    Invalid rows are still staged; run_validations flags them in the database.
+    Columns in domains are read as categoricals (see categorize_columns),
+    and columns in normalizers are normalized (see normalize_columns).
+    .gz and .zst files are decompressed while they are read. Parquet and
+    Arrow IPC files are read in column-projected batches instead. Returns
+    (staged, failed) as load_shards_to_db does.
+    """
+    return load_shards_to_db(backend, cursor, file_paths, headers, datetime_columns, table_name, schema,
+                             read_json_chunks, skip_invalid=False, domains=domains, normalizers=normalizers)
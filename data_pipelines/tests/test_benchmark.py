@@ -0,0 +1,24 @@
+from benchmark import find_regressions
+
+
+BASELINE = {
+    "contacts": {"rows_per_sec": {"read": 1000.0, "load": 500.0}},
+    "companies": {"rows_per_sec": {"read": 2000.0}},
+}
+
+
+def test_find_regressions_reports_stages_below_threshold():
+    results = {
+        "contacts": {"rows_per_sec": {"read": 700.0, "load": 450.0}},
+        "companies": {"rows_per_sec": {"read": 2500.0}},
+    }
+
+    regressions = find_regressions(results, BASELINE, threshold=0.2)
+
+    assert regressions == ["contacts.read: 700.0 rows/s, baseline 1000.0 rows/s (-30%)"]
+
+
+def test_find_regressions_ignores_stages_missing_from_results():
+    results = {"contacts": {"rows_per_sec": {"load": 500.0}}}
+
+    assert find_regressions(results, BASELINE, threshold=0.2) == []
@@ -0,0 +1,51 @@
+from chunking import AdaptiveChunker
+
+
+def make_chunker(**kwargs):
+    return AdaptiveChunker('test', initial_rows=1000, min_rows=100, max_rows=10000, **kwargs)
+
+
+def test_record_grows_while_throughput_improves():
+    chunker = make_chunker()
+
+    chunker.record(1000, 1.0)
+    assert chunker.size == 1500
+
+    chunker.record(1500, 0.5)
+    assert chunker.size == 2250
+
+
+def test_record_turns_around_when_throughput_drops():
+    chunker = make_chunker()
+    chunker.record(1000, 1.0)
+
+    chunker.record(1500, 3.0)
+
+    assert chunker.size == 1125
+
+
+def test_record_ignores_empty_rounds():
+    chunker = make_chunker()
+
+    chunker.record(0, 1.0)
+    chunker.record(1000, 0)
+
+    assert chunker.size == 1000
+
+
+def test_record_caps_size_at_packet_limit_and_bounds():
+    chunker = make_chunker(max_packet_bytes=1_000_000)
+
+    chunker.record(1000, 1.0, row_bytes=1000)
+    assert chunker.size == 800
+
+    chunker.record(1000, 1.0, row_bytes=100_000)
+    assert chunker.size == 100
+
+
+def test_record_halves_size_above_memory_ceiling():
+    chunker = make_chunker(memory_ceiling_bytes=1)
+
+    chunker.record(1000, 1.0)
+
+    assert chunker.size == 500
@@ -0,0 +1,84 @@
+import json
+import pytest
+import pandas as pd
+import normalization
+from normalization import (
+    load_dictionary,
+    normalize_phones,
+    standardize_industry,
+    standardize_company_name,
+    standardize_opportunity_name,
+    standardize_industries,
+    standardize_company_names,
+    standardize_opportunity_names,
+)
+
+
+def test_normalize_phones_writes_e164():
+    phones = pd.Series(['+1-555-109-6556', '(555) 109-6556', '1 555 109 6556', '0044 20 7946 0958',
+                        '555.109.6556 ext. 12'])
+
+    assert normalize_phones(phones).tolist() == [
+        '+15551096556', '+15551096556', '+15551096556', '+442079460958', '+15551096556']
+
+
+def test_normalize_phones_only_trims_invalid_numbers_and_keeps_nulls():
+    normalized = normalize_phones(pd.Series([' 12345 ', '+0123456789', None]))
+
+    assert normalized[:2].tolist() == ['12345', '+0123456789']
+    assert pd.isna(normalized[2])
+
+
+def test_standardize_industries_maps_aliases_and_keeps_unknown_values():
+    industries = pd.Series([' tech ', 'Health  Care', 'Aerospace', None])
+
+    standardized = standardize_industries(industries)
+
+    assert standardized[:3].tolist() == ['Technology', 'Healthcare', 'Aerospace']
+    assert pd.isna(standardized[3])
+
+
+def test_standardize_company_names_strips_legal_suffixes():
+    names = pd.Series(['Acme, Inc.', 'Globex Pty Ltd', '  Initech   LLC', 'Inc'])
+
+    assert standardize_company_names(names).tolist() == ['Acme', 'Globex', 'Initech', 'Inc']
+
+
+@pytest.fixture
+def dictionary(tmp_path, monkeypatch):
+    """Point the resolvers at a dictionary written by the test, with their caches cleared."""
+    path = tmp_path / 'company_standardization.json'
+    resolvers = (standardize_industry, standardize_company_name, standardize_opportunity_name)
+
+    def use(content):
+        path.write_text(json.dumps(content))
+        monkeypatch.setattr(normalization, 'load_dictionary', lambda: load_dictionary(str(path)))
+        for resolver in resolvers:
+            resolver.cache_clear()
+
+    yield use
+    for resolver in resolvers:
+        resolver.cache_clear()
+
+
+def test_standardize_company_names_keeps_name_tokens_that_look_like_suffixes():
+    names = pd.Series(['Vi SA', 'Saga AG', 'Visa', 'Acme S.A.', 'Globex, Ltd.'])
+
+    assert standardize_company_names(names).tolist() == ['Vi SA', 'Saga AG', 'Visa', 'Acme', 'Globex']
+
+
+def test_standardize_company_names_applies_aliases_after_stripping_suffixes(dictionary):
+    dictionary({"legal_suffixes": ["inc", "ltd"], "company_names": {"acme": "ACME Group"}})
+
+    names = pd.Series(['acme, Inc.', 'ACME  Ltd', 'Initech Inc'])
+
+    assert standardize_company_names(names).tolist() == ['ACME Group', 'ACME Group', 'Initech']
+
+
+def test_standardize_opportunity_names_standardizes_the_company_part(dictionary):
+    dictionary({"legal_suffixes": ["inc"], "company_names": {"acme": "ACME Group"}})
+
+    names = pd.Series(['Acme, Inc.  -  Pro   Deal', 'Initech Inc - Basic Deal', 'COMP005 - Pro Deal', 'Renewal'])
+
+    assert standardize_opportunity_names(names).tolist() == [
+        'ACME Group - Pro Deal', 'Initech - Basic Deal', 'COMP005 - Pro Deal', 'Renewal']
@@ -0,0 +1,42 @@
+import queries
+from queries import ResultCache, MISSING
+
+
+def test_result_cache_expires_entries_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(queries.time, 'monotonic', lambda: now[0])
+    cache = ResultCache(size=10, ttl=5)
+
+    cache.put('key', 'value', cache.generation)
+    now[0] = 104.0
+    assert cache.get('key') == 'value'
+
+    now[0] = 105.0
+    assert cache.get('key') is MISSING
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_result_cache_drops_results_of_an_older_generation():
+    cache = ResultCache(size=10, ttl=60)
+    cache.put('key', 'old', cache.generation)
+    generation = cache.generation
+
+    cache.clear()
+    cache.put('raced', 'stale', generation)
+
+    assert cache.get('key') is MISSING
+    assert cache.get('raced') is MISSING
+    cache.put('key', 'new', cache.generation)
+    assert cache.get('key') == 'new'
+
+
+def test_result_cache_evicts_least_recently_used_entry():
+    cache = ResultCache(size=2, ttl=60)
+    cache.put('a', 1, cache.generation)
+    cache.put('b', 2, cache.generation)
+    cache.get('a')
+
+    cache.put('c', 3, cache.generation)
+
+    assert cache.get('b') is MISSING
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
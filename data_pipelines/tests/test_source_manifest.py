@@ -0,0 +1,68 @@
+import os
+from source_manifest import check_sources, complete_sources, file_sha256
+from staging import SkippedRowsError
+
+
+class ManifestBackend:
+    """Backend stand-in that only serves a fixed source manifest."""
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+
+    def get_source_manifest(self, cursor, entity):
+        return self.manifest
+
+
+def write_source(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def manifest_entry(file_path):
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(file_path)}
+
+
+def test_check_sources_trusts_matching_size_and_mtime(tmp_path):
+    file_path = write_source(tmp_path, 'part-0.json', '[]')
+    backend = ManifestBackend({file_path: dict(manifest_entry(file_path), sha256='recorded')})
+
+    unchanged, fingerprints = check_sources(backend, None, 'contacts', [file_path])
+
+    assert unchanged
+    assert fingerprints[0]["sha256"] == 'recorded'
+
+
+def test_check_sources_hashes_touched_files(tmp_path):
+    file_path = write_source(tmp_path, 'part-0.json', '[]')
+    entry = manifest_entry(file_path)
+    os.utime(file_path, ns=(entry["mtime_ns"] + 10**9, entry["mtime_ns"] + 10**9))
+
+    unchanged, _ = check_sources(ManifestBackend({file_path: entry}), None, 'contacts', [file_path])
+    assert unchanged
+
+    entry["sha256"] = 'different'
+    unchanged, fingerprints = check_sources(ManifestBackend({file_path: entry}), None, 'contacts', [file_path])
+    assert not unchanged
+    assert fingerprints[0]["sha256"] == file_sha256(file_path)
+
+
+def test_check_sources_reports_changed_shard_sets(tmp_path):
+    first = write_source(tmp_path, 'part-0.json', '[]')
+    second = write_source(tmp_path, 'part-1.json', '[{}]')
+    backend = ManifestBackend({first: manifest_entry(first)})
+
+    unchanged, fingerprints = check_sources(backend, None, 'contacts', [first, second])
+
+    assert not unchanged
+    assert [fingerprint["sha256"] for fingerprint in fingerprints] == [file_sha256(first), file_sha256(second)]
+    assert not check_sources(ManifestBackend({}), None, 'contacts', [first])[0]
+
+
+def test_complete_sources_leaves_out_failed_and_partly_rejected_shards():
+    fingerprints = [{"file_path": path} for path in ('full', 'partial', 'failed')]
+    staged = {'full': 10, 'partial': 5}
+    failed = {'partial': SkippedRowsError('5 rows failed validation'), 'failed': OSError('unreadable')}
+
+    assert complete_sources(fingerprints, staged, failed) == [{"file_path": 'full'}]
@@ -0,0 +1,48 @@
+import pandas as pd
+from staging import parse_datetime, categorize_columns, domain_check
+
+
+def test_parse_datetime_converts_utc_designator():
+    parsed = parse_datetime(pd.Series(['2024-01-01T00:00:00Z']))
+
+    assert parsed.dtype == 'datetime64[us]'
+    assert parsed.tolist() == [pd.Timestamp('2024-01-01 00:00:00')]
+
+
+def test_parse_datetime_converts_offsets_and_keeps_nulls():
+    parsed = parse_datetime(pd.Series(['2024-01-01T00:00:00.000+0000', None, '2024-01-01T05:00:00+0200']))
+
+    assert parsed.dtype == 'datetime64[us]'
+    assert parsed[0] == pd.Timestamp('2024-01-01 00:00:00')
+    assert pd.isna(parsed[1])
+    assert parsed[2] == pd.Timestamp('2024-01-01 03:00:00')
+
+
+def test_parse_datetime_mixes_offsets_with_naive_values():
+    parsed = parse_datetime(pd.Series(['2024-01-01T00:00:00Z', '2024-01-01 12:30:00', None, 'not a date']))
+
+    assert parsed.dtype == 'datetime64[us]'
+    assert parsed[:2].tolist() == [pd.Timestamp('2024-01-01 00:00:00'), pd.Timestamp('2024-01-01 12:30:00')]
+    assert parsed[2:].isna().all()
+
+
+def test_parse_datetime_converts_tz_aware_columnar_values():
+    values = pd.Series(pd.to_datetime(['2024-01-01T01:00:00+0100', None], utc=True))
+
+    parsed = parse_datetime(values)
+
+    assert parsed.dtype == 'datetime64[us]'
+    assert parsed[0] == pd.Timestamp('2024-01-01 00:00:00')
+    assert pd.isna(parsed[1])
+
+
+def test_domain_check_accepts_domain_values_across_chunks():
+    domains = {"stage": ["Proposal", "Closed Won"]}
+    check = domain_check(domains["stage"], error="Invalid stage value")
+
+    valid = categorize_columns(pd.DataFrame({"stage": ["Closed Won", None]}), domains)
+    invalid = categorize_columns(pd.DataFrame({"stage": ["Proposal", "Bogus"]}), domains)
+
+    assert check(valid["stage"]).check_passed
+    assert list(valid["stage"].cat.categories[:2]) == domains["stage"]
+    assert check(invalid["stage"]).check_output.tolist() == [True, False]
@@ -10,7 +10,21 @@ CREATE TABLE batch (
     start_time DATETIME,
     end_time DATETIME,
     status VARCHAR(20),
-    exceptions VARCHAR(500)
+    exceptions VARCHAR(500),
+    INDEX idx_batch_status_id (status, id)  -- Latest COMPLETED batch for cache invalidation
+);
+
+-- Fingerprint of every source file as of the batch that last loaded it
+DROP TABLE IF EXISTS source_manifest;
+CREATE TABLE source_manifest (
+    entity VARCHAR(50) NOT NULL,
+    file_path VARCHAR(500) NOT NULL,
+    size BIGINT NOT NULL,
+    mtime_ns BIGINT NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    batch_id INT NOT NULL,
+    loaded_at DATETIME NOT NULL,
+    PRIMARY KEY (entity, file_path)
 );
 
 DROP TABLE IF EXISTS stg_activities;
@@ -25,7 +39,8 @@ CREATE TABLE `stg_activities` (
   `outcome` varchar(255) DEFAULT NULL,
   `notes` varchar(255) DEFAULT NULL,
   `is_error` INT DEFAULT 0,
-  `error_description`varchar(255) DEFAULT NULL 
+  `error_description`varchar(255) DEFAULT NULL,
+  INDEX `idx_stg_activities_id` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 DROP TABLE IF EXISTS stg_contacts;
@@ -41,7 +56,8 @@ CREATE TABLE `stg_contacts` (
   `created_date` varchar(255) DEFAULT NULL,
   `last_modified` varchar(255) DEFAULT NULL,
   `is_error` INT DEFAULT 0,
-  `error_description`varchar(255) DEFAULT NULL
+  `error_description`varchar(255) DEFAULT NULL,
+  INDEX `idx_stg_contacts_id` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 DROP TABLE IF EXISTS stg_companies;
@@ -56,7 +72,8 @@ CREATE TABLE `stg_companies` (
   `is_customer` varchar(255) DEFAULT NULL,
   `annual_revenue` varchar(255) DEFAULT NULL,
   `is_error` INT DEFAULT 0,
-  `error_description`varchar(255) DEFAULT NULL
+  `error_description`varchar(255) DEFAULT NULL,
+  INDEX `idx_stg_companies_id` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 DROP TABLE IF EXISTS stg_opportunities;
@@ -74,11 +91,15 @@ CREATE TABLE `stg_opportunities` (
   `is_closed` varchar(255) DEFAULT NULL,
   `forecast_category` varchar(255) DEFAULT NULL,
   `is_error` INT DEFAULT 0,
-  `error_description`varchar(255) DEFAULT NULL
+  `error_description`varchar(255) DEFAULT NULL,
+  INDEX `idx_stg_opportunities_id` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 use alysio;
 
+DROP TABLE IF EXISTS activities;
+DROP TABLE IF EXISTS opportunities;
+DROP TABLE IF EXISTS contacts;
 DROP TABLE IF EXISTS companies;
 CREATE TABLE `companies` (
   `company_id` INT AUTO_INCREMENT PRIMARY KEY,
@@ -90,14 +111,17 @@ CREATE TABLE `companies` (
   `country` VARCHAR(2) DEFAULT NULL,
   `created_date` DATETIME DEFAULT NULL,
   `is_customer` BOOL DEFAULT NULL,
-  `annual_revenue` VARCHAR(255) DEFAULT NULL,
+  `annual_revenue` BIGINT DEFAULT NULL,
   `batch_id` INT DEFAULT NULL, -- Batch date to store the current timestamp
-  INDEX (`source_id`)
+  `is_deleted` BOOL NOT NULL DEFAULT 0, -- Tombstone set by SoftDeleteMissing in snapshot loads
+  `deleted_batch_id` INT DEFAULT NULL, -- Batch whose snapshot no longer had the row
+  UNIQUE INDEX `idx_source_id` (`source_id`),
+  INDEX `idx_companies_industry` (`industry`),
+  INDEX `idx_companies_is_customer` (`is_customer`),
+  INDEX `idx_companies_batch_id` (`batch_id`),
+  INDEX `idx_companies_live` (`is_deleted`, `source_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
-CREATE UNIQUE INDEX idx_source_id ON alysio.companies (source_id);
-
-DROP TABLE IF EXISTS contacts;
 CREATE TABLE `contacts` (
   `contact_id` INT AUTO_INCREMENT PRIMARY KEY,
   `source_id` varchar(255) DEFAULT NULL,
@@ -111,31 +135,43 @@ CREATE TABLE `contacts` (
   `created_date` DATETIME DEFAULT NULL,
   `last_modified` DATETIME DEFAULT NULL,
   `batch_id` INT DEFAULT NULL,
-  INDEX (`company_id`),
+  `is_deleted` BOOL NOT NULL DEFAULT 0,
+  `deleted_batch_id` INT DEFAULT NULL,
+  UNIQUE INDEX `idx_source_id` (`source_id`),
+  INDEX `idx_contacts_company_id` (`company_id`),
+  INDEX `idx_contacts_email` (`email`),
+  INDEX `idx_contacts_status` (`status`),
+  INDEX `idx_contacts_batch_id` (`batch_id`),
+  INDEX `idx_contacts_live` (`is_deleted`, `source_id`),
 	CONSTRAINT `fk_company_id_contacts` FOREIGN KEY (`company_id`) REFERENCES `companies` (`company_id`)
     ON DELETE CASCADE
     ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
-CREATE UNIQUE INDEX idx_source_id ON alysio.contacts (source_id);
-
-DROP TABLE IF EXISTS opportunities;
 CREATE TABLE `opportunities` (
   `opportunity_id` INT AUTO_INCREMENT PRIMARY KEY,
   `source_id` varchar(255) DEFAULT NULL,
   `name` varchar(255) DEFAULT NULL,
   `contact_id` INT DEFAULT NULL,
   `company_id` INT DEFAULT NULL,
-  `amount` varchar(255) DEFAULT NULL,
-  `stage` varchar(255) DEFAULT NULL,
-  `product` varchar(255) DEFAULT NULL,
-  `probability` varchar(255) DEFAULT NULL,
+  `amount` DECIMAL(15,2) DEFAULT NULL,
+  `stage` varchar(50) DEFAULT NULL,
+  `product` varchar(50) DEFAULT NULL,
+  `probability` TINYINT UNSIGNED DEFAULT NULL,
   `created_date` DATETIME DEFAULT NULL,
-  `close_date` varchar(255) DEFAULT NULL,
-  `is_closed` varchar(255) DEFAULT NULL,
-  `forecast_category` varchar(255) DEFAULT NULL,
+  `close_date` DATETIME DEFAULT NULL,
+  `is_closed` BOOL DEFAULT NULL,
+  `forecast_category` varchar(50) DEFAULT NULL,
   `batch_id` INT DEFAULT NULL,
-  INDEX (`opportunity_id`),
+  `is_deleted` BOOL NOT NULL DEFAULT 0,
+  `deleted_batch_id` INT DEFAULT NULL,
+  UNIQUE INDEX `idx_source_id` (`source_id`),
+  INDEX `idx_opportunities_company_id` (`company_id`),
+  INDEX `idx_opportunities_contact_id` (`contact_id`),
+  INDEX `idx_opportunities_stage_close_date` (`stage`, `close_date`),
+  INDEX `idx_opportunities_close_date` (`close_date`),
+  INDEX `idx_opportunities_batch_id` (`batch_id`),
+  INDEX `idx_opportunities_live` (`is_deleted`, `source_id`),
 	CONSTRAINT `fk_company_id_opp` FOREIGN KEY (`company_id`) REFERENCES `companies` (`company_id`)
     ON DELETE CASCADE
     ON UPDATE CASCADE,
@@ -144,301 +180,157 @@ CREATE TABLE `opportunities` (
     ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
-DROP TABLE IF EXISTS activities;
+-- Partitioned by month on `timestamp`. MySQL requires every unique key of a
+-- partitioned table to include the partitioning column, so uniqueness of the
+-- Salesforce id is enforced on (source_id, timestamp) and UpsertActivities
+-- moves rows whose timestamp changed before inserting.
 CREATE TABLE `activities` (
-  `source_id` varchar(255) DEFAULT NULL,
+  `activity_id` INT AUTO_INCREMENT,
+  `source_id` varchar(255) NOT NULL,
   `contact_id` INT DEFAULT NULL,
   `opportunity_id` INT DEFAULT NULL,
-  `type` varchar(255) DEFAULT NULL,
+  `type` varchar(50) DEFAULT NULL,
   `subject` varchar(255) DEFAULT NULL,
-  `timestamp` varchar(255) DEFAULT NULL,
-  `duration_minutes` varchar(255) DEFAULT NULL,
-  `outcome` varchar(255) DEFAULT NULL,
+  `timestamp` DATETIME NOT NULL,
+  `duration_minutes` SMALLINT UNSIGNED DEFAULT NULL,
+  `outcome` varchar(50) DEFAULT NULL,
   `notes` varchar(255) DEFAULT NULL,
   `batch_id` INT DEFAULT NULL,
-  INDEX (`opportunity_id`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
-
-use alysio_stg;
-
-DELIMITER $$
-DROP PROCEDURE IF EXISTS TruncateStagingTables$$
-CREATE PROCEDURE TruncateStagingTables()
-BEGIN
-    -- Truncate the tables
-    TRUNCATE TABLE stg_activities;
-    TRUNCATE TABLE stg_contacts;
-    TRUNCATE TABLE stg_companies;
-    TRUNCATE TABLE stg_opportunities;
-END $$
-
-DELIMITER ;
-
-
-DELIMITER $$
-DROP PROCEDURE IF EXISTS UpsertCompanies$$
-
-CREATE PROCEDURE UpsertCompanies(IN batch_id INT)
-BEGIN
-
-    INSERT INTO alysio.companies (source_id, name, domain, industry, size, country, created_date, is_customer, annual_revenue, batch_id)
-    SELECT 
-        id, 
-        name, 
-        domain, 
-        industry, 
-        size, 
-        country, 
-        created_date, 
-        is_customer, 
-        annual_revenue, 
-        batch_id AS batch_id
-    FROM alysio_stg.stg_companies
-    where is_error != 1
-    ON DUPLICATE KEY UPDATE
-        name = VALUES(name),
-        domain = VALUES(domain),
-        industry = VALUES(industry),
-        size = VALUES(size),
-        country = VALUES(country),
-        created_date = VALUES(created_date),
-        is_customer = VALUES(is_customer),
-        annual_revenue = VALUES(annual_revenue),
-        batch_id = VALUES(batch_id);
-
-END $$
-
-DELIMITER ;
-
-DELIMITER $$
-
-DROP PROCEDURE IF EXISTS UpsertContacts$$
-
-CREATE PROCEDURE UpsertContacts(IN batch_id INT)
-BEGIN
-    -- Insert new records
-    INSERT INTO alysio.contacts(
-        source_id, email, first_name, last_name, title, company_id, 
-        phone, status, created_date, last_modified, batch_id
-    )
-    SELECT 
-        CO.id,
-        CO.email,
-        CO.first_name,
-        CO.last_name,
-        CO.title,
-        C.company_id,
-        CO.phone,
-        CO.status,
-        CO.created_date,
-        CO.last_modified,
-        batch_id -- Use the parameter batch_id
-    FROM alysio_stg.stg_contacts CO
-	JOIN alysio.companies C ON C.source_id = CO.company_id
-    LEFT JOIN alysio.contacts DC ON DC.source_id = CO.id
-    WHERE DC.source_id IS NULL
-    AND   CO.is_error != 1;
-
-    -- Update existing records
-    UPDATE alysio.contacts DC
-    JOIN alysio_stg.stg_contacts CO ON CO.id = DC.source_id
-	JOIN alysio.companies C ON C.source_id = CO.company_id
-    SET 
-        DC.email = CO.email,
-        DC.first_name = CO.first_name,
-        DC.last_name = CO.last_name,
-        DC.title = CO.title,
-        DC.company_id = C.company_id,
-        DC.phone = CO.phone,
-        DC.status = CO.status,
-        DC.created_date = CO.created_date,
-        DC.last_modified = CO.last_modified,
-        DC.batch_id = batch_id  -- Use the parameter batch_id
-    WHERE 
-		CO.is_error != 1 AND(
-        COALESCE(DC.email, '') != COALESCE(CO.email, '') OR
-        COALESCE(DC.first_name, '') != COALESCE(CO.first_name, '') OR
-        COALESCE(DC.last_name, '') != COALESCE(CO.last_name, '') OR
-        COALESCE(DC.title, '') != COALESCE(CO.title, '') OR
-        COALESCE(DC.company_id, 0) != COALESCE(C.company_id, 0) OR
-        COALESCE(DC.phone, '') != COALESCE(CO.phone, '') OR
-        COALESCE(DC.status, '') != COALESCE(CO.status, '') OR
-        COALESCE(DC.created_date, '1970-01-01 00:00:00') != COALESCE(CO.created_date, '1970-01-01 00:00:00') OR
-        COALESCE(DC.last_modified, '1970-01-01 00:00:00') != COALESCE(CO.last_modified, '1970-01-01 00:00:00'));
-END $$
-
-DELIMITER ;
-
-DELIMITER $$
-
-DROP PROCEDURE IF EXISTS UpsertOpportunities$$
-
-CREATE PROCEDURE UpsertOpportunities(IN batch_id INT)
-BEGIN
-    -- Insert new records
-    INSERT INTO alysio.opportunities(
-			source_id,name,contact_id,company_id,amount,stage,product,probability,
-			created_date,close_date,is_closed,forecast_category,batch_id
-    )
-    SELECT id,
-		O.name,
-		DC.contact_id,
-		C.company_id,
-		O.amount,
-		O.stage,
-		O.product,
-		O.probability,
-		O.created_date,
-		O.close_date,
-		O.is_closed,
-		O.forecast_category,
-        batch_id  -- Use the parameter batch_id
-    FROM alysio_stg.stg_opportunities O
-	JOIN alysio.companies C ON C.source_id = O.company_id
-    JOIN alysio.contacts DC ON DC.source_id = O.contact_id
-    LEFT JOIN alysio.opportunities DO ON DO.source_id = O.id
-    WHERE DO.source_id IS NULL
-    AND O.is_error != 1;
-
-    -- Update existing records
-    UPDATE alysio.opportunities DO
-    JOIN alysio_stg.stg_opportunities O ON O.id = DO.source_id
-	JOIN alysio.companies C ON C.source_id = O.company_id
-    JOIN alysio.contacts DC ON DC.source_id = O.contact_id
-    SET DO.name = O.name
-		,DO.contact_id = DC.contact_id
-		,DO.company_id = C.company_id
-		,DO.amount = O.amount
-		,DO.stage = O.stage
-		,DO.product = O.product
-		,DO.probability = O.probability
-		,DO.created_date = O.created_date
-		,DO.close_date = O.close_date
-		,DO.is_closed = O.is_closed
-		,DO.forecast_category = O.forecast_category
-        ,DO.batch_id = batch_id  -- Use the parameter batch_id
-    WHERE 
-		O.is_error != 1 AND(
-    COALESCE(DO.name, '') != COALESCE(O.name, '') OR
-    COALESCE(DO.contact_id, 0) != COALESCE(DC.contact_id, 0) OR
-    COALESCE(DO.company_id, 0) != COALESCE(C.company_id, 0) OR
-    COALESCE(DO.amount, '') != COALESCE(O.amount, '') OR
-    COALESCE(DO.stage, '') != COALESCE(O.stage, '') OR
-    COALESCE(DO.product, '') != COALESCE(O.product, '') OR
-    COALESCE(DO.probability, '') != COALESCE(O.probability, '') OR
-    COALESCE(DO.created_date, '1970-01-01 00:00:00') != COALESCE(O.created_date, '1970-01-01 00:00:00') OR
-    COALESCE(DO.close_date, '') != COALESCE(O.close_date, '') OR
-    COALESCE(DO.is_closed, '') != COALESCE(O.is_closed, '') OR
-    COALESCE(DO.forecast_category, '') != COALESCE(O.forecast_category, ''));
-END $$
-
-DELIMITER ;
-
-DELIMITER $$
-
-DROP PROCEDURE IF EXISTS UpsertActivities $$
-
-CREATE PROCEDURE UpsertActivities(IN batch_id INT)
-BEGIN
-    -- Insert new records
-    INSERT INTO alysio.activities(source_id,contact_id,opportunity_id,type,subject,timestamp,duration_minutes,outcome,notes,batch_id)
-    SELECT A.id,
-		DC.contact_id,
-		O.opportunity_id,
-		A.type,
-		A.subject,
-		A.timestamp,
-		A.duration_minutes,
-		A.outcome,
-        A.notes,
-        batch_id  -- Use the parameter batch_id
-    FROM alysio_stg.stg_activities A
-	LEFT JOIN alysio.opportunities O ON O.source_id = A.opportunity_id
-    LEFT JOIN alysio.contacts DC ON DC.source_id = A.contact_id
-    LEFT JOIN alysio.activities DA ON DA.source_id = A.id
-    WHERE DA.source_id IS NULL
-    AND A.is_error != 1;
-
-    -- Update existing records
-    UPDATE alysio.activities DA
-    JOIN alysio_stg.stg_activities A ON A.id = DA.source_id
-	JOIN alysio.opportunities O ON O.source_id = A.opportunity_id
-    JOIN alysio.contacts DC ON DC.source_id = A.contact_id
-    SET DA.contact_id		= DC.contact_id
-		,DA.opportunity_id   = O.opportunity_id
-		,DA.type             = A.type
-		,DA.subject          = A.subject
-		,DA.timestamp        = A.timestamp
-		,DA.duration_minutes = A.duration_minutes
-		,DA.outcome          = A.outcome
-        ,DA.notes			 = A.notes
-        ,DA.batch_id = batch_id  -- Use the parameter batch_id
-    WHERE 
-		A.is_error != 1 AND(
-    COALESCE(DA.contact_id, 0) != COALESCE(DC.contact_id, 0) OR
-    COALESCE(DA.opportunity_id, 0) != COALESCE(O.opportunity_id, 0) OR
-    COALESCE(DA.type, '') != COALESCE(A.type, '') OR
-    COALESCE(DA.subject, '') != COALESCE(A.subject, '') OR
-    COALESCE(DA.timestamp, '1970-01-01 00:00:00') != COALESCE(A.timestamp, '1970-01-01 00:00:00') OR
-    COALESCE(DA.duration_minutes, 0) != COALESCE(A.duration_minutes, 0) OR
-    COALESCE(DA.outcome, '') != COALESCE(A.outcome, ''));
-
-END $$
-
-DELIMITER ;
+  `is_deleted` BOOL NOT NULL DEFAULT 0,
+  `deleted_batch_id` INT DEFAULT NULL,
+  PRIMARY KEY (`activity_id`, `timestamp`),
+  UNIQUE INDEX `idx_source_id_timestamp` (`source_id`, `timestamp`),
+  INDEX `idx_source_id` (`source_id`),
+  INDEX `idx_activities_contact_timestamp` (`contact_id`, `timestamp`),
+  INDEX `idx_activities_opportunity_timestamp` (`opportunity_id`, `timestamp`),
+  INDEX `idx_activities_timestamp` (`timestamp`),
+  INDEX `idx_activities_batch_id` (`batch_id`),
+  INDEX `idx_activities_live` (`is_deleted`, `source_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+PARTITION BY RANGE COLUMNS(`timestamp`) (
+  PARTITION p_history VALUES LESS THAN ('2024-01-01'),
+  PARTITION p202401 VALUES LESS THAN ('2024-02-01'),
+  PARTITION p202402 VALUES LESS THAN ('2024-03-01'),
+  PARTITION p202403 VALUES LESS THAN ('2024-04-01'),
+  PARTITION p202404 VALUES LESS THAN ('2024-05-01'),
+  PARTITION p202405 VALUES LESS THAN ('2024-06-01'),
+  PARTITION p202406 VALUES LESS THAN ('2024-07-01'),
+  PARTITION p202407 VALUES LESS THAN ('2024-08-01'),
+  PARTITION p202408 VALUES LESS THAN ('2024-09-01'),
+  PARTITION p202409 VALUES LESS THAN ('2024-10-01'),
+  PARTITION p202410 VALUES LESS THAN ('2024-11-01'),
+  PARTITION p202411 VALUES LESS THAN ('2024-12-01'),
+  PARTITION p202412 VALUES LESS THAN ('2025-01-01'),
+  PARTITION p202501 VALUES LESS THAN ('2025-02-01'),
+  PARTITION p202502 VALUES LESS THAN ('2025-03-01'),
+  PARTITION p202503 VALUES LESS THAN ('2025-04-01'),
+  PARTITION p202504 VALUES LESS THAN ('2025-05-01'),
+  PARTITION p202505 VALUES LESS THAN ('2025-06-01'),
+  PARTITION p202506 VALUES LESS THAN ('2025-07-01'),
+  PARTITION p202507 VALUES LESS THAN ('2025-08-01'),
+  PARTITION p202508 VALUES LESS THAN ('2025-09-01'),
+  PARTITION p202509 VALUES LESS THAN ('2025-10-01'),
+  PARTITION p202510 VALUES LESS THAN ('2025-11-01'),
+  PARTITION p202511 VALUES LESS THAN ('2025-12-01'),
+  PARTITION p202512 VALUES LESS THAN ('2026-01-01'),
+  PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
 
+-- Same layout as activities without partitioning; receives partitions that
+-- MaintainActivityPartitions retires. One row per source_id, so a retired
+-- activity that a later load brings back is archived over its earlier copy.
+DROP TABLE IF EXISTS activities_archive;
+CREATE TABLE `activities_archive` (
+  `activity_id` INT NOT NULL,
+  `source_id` varchar(255) NOT NULL,
+  `contact_id` INT DEFAULT NULL,
+  `opportunity_id` INT DEFAULT NULL,
+  `type` varchar(50) DEFAULT NULL,
+  `subject` varchar(255) DEFAULT NULL,
+  `timestamp` DATETIME NOT NULL,
+  `duration_minutes` SMALLINT UNSIGNED DEFAULT NULL,
+  `outcome` varchar(50) DEFAULT NULL,
+  `notes` varchar(255) DEFAULT NULL,
+  `batch_id` INT DEFAULT NULL,
+  `archived_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`activity_id`, `timestamp`),
+  UNIQUE INDEX `idx_source_id` (`source_id`),
+  INDEX `idx_activities_archive_timestamp` (`timestamp`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
-DELIMITER $$
+-- ---------------------------------------------------------------------------
+-- Reporting summaries, maintained incrementally by RefreshSummaries
+-- ---------------------------------------------------------------------------
+DROP TABLE IF EXISTS summary_pipeline;
+CREATE TABLE `summary_pipeline` (
+  `stage` varchar(50) NOT NULL,
+  `forecast_category` varchar(50) NOT NULL,
+  `product` varchar(50) NOT NULL,
+  `opportunity_count` INT NOT NULL DEFAULT 0,
+  `open_count` INT NOT NULL DEFAULT 0,
+  `total_amount` DECIMAL(18,2) NOT NULL DEFAULT 0,
+  `weighted_amount` DECIMAL(18,2) NOT NULL DEFAULT 0,
+  `batch_id` INT DEFAULT NULL, -- Last batch that changed the group
+  PRIMARY KEY (`stage`, `forecast_category`, `product`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
-DROP PROCEDURE IF EXISTS run_validations$$
+-- contact_id / opportunity_id are 0 when the activity has no match
+DROP TABLE IF EXISTS summary_activity_daily;
+CREATE TABLE `summary_activity_daily` (
+  `activity_date` DATE NOT NULL,
+  `contact_id` INT NOT NULL,
+  `opportunity_id` INT NOT NULL,
+  `activity_count` INT NOT NULL DEFAULT 0,
+  `completed_count` INT NOT NULL DEFAULT 0,
+  `total_duration_minutes` INT NOT NULL DEFAULT 0,
+  `batch_id` INT DEFAULT NULL,
+  PRIMARY KEY (`activity_date`, `contact_id`, `opportunity_id`),
+  INDEX `idx_summary_activity_contact` (`contact_id`, `activity_date`),
+  INDEX `idx_summary_activity_opportunity` (`opportunity_id`, `activity_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
-CREATE PROCEDURE run_validations()
-BEGIN
-/*
-1: marked as Error and wont get loaded
-2: marked as Warning and will get loaded
-*/
+DROP TABLE IF EXISTS summary_company_customers;
+CREATE TABLE `summary_company_customers` (
+  `company_id` INT NOT NULL PRIMARY KEY,
+  `is_customer` BOOL DEFAULT NULL,
+  `contact_count` INT NOT NULL DEFAULT 0,
+  `customer_contact_count` INT NOT NULL DEFAULT 0,
+  `opportunity_count` INT NOT NULL DEFAULT 0,
+  `open_opportunity_count` INT NOT NULL DEFAULT 0,
+  `open_pipeline_amount` DECIMAL(18,2) NOT NULL DEFAULT 0,
+  `won_amount` DECIMAL(18,2) NOT NULL DEFAULT 0,
+  `batch_id` INT DEFAULT NULL,
+  INDEX `idx_summary_company_is_customer` (`is_customer`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
+-- Ledgers hold the values each source row last contributed to the summaries,
+-- so a refresh can subtract the old contribution of a changed row.
+DROP TABLE IF EXISTS summary_opportunity_ledger;
+CREATE TABLE `summary_opportunity_ledger` (
+  `opportunity_id` INT NOT NULL PRIMARY KEY,
+  `company_id` INT DEFAULT NULL,
+  `stage` varchar(50) NOT NULL,
+  `forecast_category` varchar(50) NOT NULL,
+  `product` varchar(50) NOT NULL,
+  `amount` DECIMAL(15,2) NOT NULL,
+  `probability` TINYINT UNSIGNED NOT NULL,
+  `is_closed` BOOL NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
-    -- Remove Duplicates based on created date
-    UPDATE alysio_stg.stg_contacts AS sc
-	JOIN (
-		SELECT id, MAX(created_date) AS latest_created_date
-		FROM alysio_stg.stg_contacts
-		GROUP BY id
-	) AS latest
-	ON sc.id = latest.id
-	SET sc.is_error = 1,
-		sc.error_description = 'Duplicate record'
-	WHERE sc.created_date < latest.latest_created_date;
-    
-    -- Capture Invalid Phone Numbers
-	UPDATE alysio_stg.stg_contacts C
-    SET C.is_error = 2,
-		C.error_description = 'Invalid Phone Number'
-    WHERE LENGTH(TRIM(C.phone)) != 15;
-    
-    -- Capture Invalid Emails
-    UPDATE alysio_stg.stg_contacts C
-    SET C.is_error = 2,
-		C.error_description = 'Invalid Email'
-    WHERE INSTR(email, '@') = 0;
-    
-    -- Invalid Date range
-    UPDATE alysio_stg.stg_contacts C
-    SET C.is_error = 2,
-		C.error_description = 'Invalid Dates'
-    WHERE STR_TO_DATE(created_date, '%Y-%m-%d %H:%i:%s') > NOW()
-    OR STR_TO_DATE(last_modified, '%Y-%m-%d %H:%i:%s') > NOW();
-    
-    -- Invalid Country Abbr
-    UPDATE alysio_stg.stg_companies C
-    SET C.is_error = 1,
-		C.error_description = 'Invalid Country'
-    WHERE LENGTH(TRIM(C.country)) > 2;
-    
-    
+DROP TABLE IF EXISTS summary_activity_ledger;
+CREATE TABLE `summary_activity_ledger` (
+  `source_id` varchar(255) NOT NULL PRIMARY KEY,
+  `activity_date` DATE NOT NULL,
+  `contact_id` INT NOT NULL,
+  `opportunity_id` INT NOT NULL,
+  `duration_minutes` INT NOT NULL,
+  `is_completed` BOOL NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
-END $$
+DROP TABLE IF EXISTS summary_contact_ledger;
+CREATE TABLE `summary_contact_ledger` (
+  `contact_id` INT NOT NULL PRIMARY KEY,
+  `company_id` INT DEFAULT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
-DELIMITER ;
\ No newline at end of file
+-- The stored procedures are created by schema/procedures.sql
@@ -0,0 +1,255 @@
+/*
+SQLite schema for local and single-node runs (DB_BACKEND=sqlite).
+
+Mirrors schema/init.sql in a single database file: staging tables keep the
+stg_ prefix and the target tables keep their names. Stored procedures have no
+SQLite equivalent; their statements live in data_pipelines/sqlite_backend.py.
+Partitioning of activities is MySQL only. The is_deleted / deleted_batch_id
+columns were added to the target tables after their first release;
+sqlite_backend.py adds them to older database files before running this
+script.
+*/
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS batch (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    start_time TEXT,
+    end_time TEXT,
+    status TEXT,
+    exceptions TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_batch_status_id ON batch (status, id);
+
+CREATE TABLE IF NOT EXISTS source_manifest (
+    entity TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    batch_id INTEGER NOT NULL,
+    loaded_at TEXT NOT NULL,
+    PRIMARY KEY (entity, file_path)
+);
+
+-- ---------------------------------------------------------------------------
+-- Staging
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS stg_activities (
+  id TEXT,
+  contact_id TEXT,
+  opportunity_id TEXT,
+  type TEXT,
+  subject TEXT,
+  timestamp TEXT,
+  duration_minutes TEXT,
+  outcome TEXT,
+  notes TEXT,
+  is_error INTEGER DEFAULT 0,
+  error_description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stg_activities_id ON stg_activities (id);
+
+CREATE TABLE IF NOT EXISTS stg_contacts (
+  id TEXT,
+  email TEXT,
+  first_name TEXT,
+  last_name TEXT,
+  title TEXT,
+  company_id TEXT,
+  phone TEXT,
+  status TEXT,
+  created_date TEXT,
+  last_modified TEXT,
+  is_error INTEGER DEFAULT 0,
+  error_description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stg_contacts_id ON stg_contacts (id, created_date);
+
+CREATE TABLE IF NOT EXISTS stg_companies (
+  id TEXT,
+  name TEXT,
+  domain TEXT,
+  industry TEXT,
+  size TEXT,
+  country TEXT,
+  created_date TEXT,
+  is_customer TEXT,
+  annual_revenue TEXT,
+  is_error INTEGER DEFAULT 0,
+  error_description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stg_companies_id ON stg_companies (id);
+
+CREATE TABLE IF NOT EXISTS stg_opportunities (
+  id TEXT,
+  name TEXT,
+  contact_id TEXT,
+  company_id TEXT,
+  amount TEXT,
+  stage TEXT,
+  product TEXT,
+  probability TEXT,
+  created_date TEXT,
+  close_date TEXT,
+  is_closed TEXT,
+  forecast_category TEXT,
+  is_error INTEGER DEFAULT 0,
+  error_description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stg_opportunities_id ON stg_opportunities (id);
+
+-- ---------------------------------------------------------------------------
+-- Targets
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS companies (
+  company_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  source_id TEXT NOT NULL UNIQUE,
+  name TEXT,
+  domain TEXT,
+  industry TEXT,
+  size TEXT,
+  country TEXT,
+  created_date TEXT,
+  is_customer INTEGER,
+  annual_revenue INTEGER,
+  batch_id INTEGER,
+  is_deleted INTEGER NOT NULL DEFAULT 0,
+  deleted_batch_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_companies_industry ON companies (industry);
+CREATE INDEX IF NOT EXISTS idx_companies_is_customer ON companies (is_customer);
+CREATE INDEX IF NOT EXISTS idx_companies_batch_id ON companies (batch_id);
+CREATE INDEX IF NOT EXISTS idx_companies_live ON companies (source_id) WHERE is_deleted = 0;
+
+CREATE TABLE IF NOT EXISTS contacts (
+  contact_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  source_id TEXT UNIQUE,
+  email TEXT,
+  first_name TEXT,
+  last_name TEXT,
+  title TEXT,
+  company_id INTEGER REFERENCES companies (company_id) ON DELETE CASCADE ON UPDATE CASCADE,
+  phone TEXT,
+  status TEXT,
+  created_date TEXT,
+  last_modified TEXT,
+  batch_id INTEGER,
+  is_deleted INTEGER NOT NULL DEFAULT 0,
+  deleted_batch_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_contacts_company_id ON contacts (company_id);
+CREATE INDEX IF NOT EXISTS idx_contacts_email ON contacts (email);
+CREATE INDEX IF NOT EXISTS idx_contacts_status ON contacts (status);
+CREATE INDEX IF NOT EXISTS idx_contacts_batch_id ON contacts (batch_id);
+CREATE INDEX IF NOT EXISTS idx_contacts_live ON contacts (source_id) WHERE is_deleted = 0;
+
+CREATE TABLE IF NOT EXISTS opportunities (
+  opportunity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  source_id TEXT UNIQUE,
+  name TEXT,
+  contact_id INTEGER REFERENCES contacts (contact_id) ON DELETE CASCADE ON UPDATE CASCADE,
+  company_id INTEGER REFERENCES companies (company_id) ON DELETE CASCADE ON UPDATE CASCADE,
+  amount NUMERIC,
+  stage TEXT,
+  product TEXT,
+  probability INTEGER,
+  created_date TEXT,
+  close_date TEXT,
+  is_closed INTEGER,
+  forecast_category TEXT,
+  batch_id INTEGER,
+  is_deleted INTEGER NOT NULL DEFAULT 0,
+  deleted_batch_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_opportunities_company_id ON opportunities (company_id);
+CREATE INDEX IF NOT EXISTS idx_opportunities_contact_id ON opportunities (contact_id);
+CREATE INDEX IF NOT EXISTS idx_opportunities_stage_close_date ON opportunities (stage, close_date);
+CREATE INDEX IF NOT EXISTS idx_opportunities_close_date ON opportunities (close_date);
+CREATE INDEX IF NOT EXISTS idx_opportunities_batch_id ON opportunities (batch_id);
+CREATE INDEX IF NOT EXISTS idx_opportunities_live ON opportunities (source_id) WHERE is_deleted = 0;
+
+CREATE TABLE IF NOT EXISTS activities (
+  activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  source_id TEXT NOT NULL UNIQUE,
+  contact_id INTEGER,
+  opportunity_id INTEGER,
+  type TEXT,
+  subject TEXT,
+  timestamp TEXT NOT NULL,
+  duration_minutes INTEGER,
+  outcome TEXT,
+  notes TEXT,
+  batch_id INTEGER,
+  is_deleted INTEGER NOT NULL DEFAULT 0,
+  deleted_batch_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_activities_contact_timestamp ON activities (contact_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_activities_opportunity_timestamp ON activities (opportunity_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_activities_timestamp ON activities (timestamp);
+CREATE INDEX IF NOT EXISTS idx_activities_batch_id ON activities (batch_id);
+CREATE INDEX IF NOT EXISTS idx_activities_live ON activities (source_id) WHERE is_deleted = 0;
+
+-- ---------------------------------------------------------------------------
+-- Reporting summaries
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS summary_pipeline (
+  stage TEXT NOT NULL,
+  forecast_category TEXT NOT NULL,
+  product TEXT NOT NULL,
+  opportunity_count INTEGER NOT NULL DEFAULT 0,
+  open_count INTEGER NOT NULL DEFAULT 0,
+  total_amount NUMERIC NOT NULL DEFAULT 0,
+  weighted_amount NUMERIC NOT NULL DEFAULT 0,
+  batch_id INTEGER,
+  PRIMARY KEY (stage, forecast_category, product)
+);
+
+CREATE TABLE IF NOT EXISTS summary_activity_daily (
+  activity_date TEXT NOT NULL,
+  contact_id INTEGER NOT NULL,
+  opportunity_id INTEGER NOT NULL,
+  activity_count INTEGER NOT NULL DEFAULT 0,
+  completed_count INTEGER NOT NULL DEFAULT 0,
+  total_duration_minutes INTEGER NOT NULL DEFAULT 0,
+  batch_id INTEGER,
+  PRIMARY KEY (activity_date, contact_id, opportunity_id)
+);
+CREATE INDEX IF NOT EXISTS idx_summary_activity_contact ON summary_activity_daily (contact_id, activity_date);
+CREATE INDEX IF NOT EXISTS idx_summary_activity_opportunity ON summary_activity_daily (opportunity_id, activity_date);
+
+CREATE TABLE IF NOT EXISTS summary_company_customers (
+  company_id INTEGER NOT NULL PRIMARY KEY,
+  is_customer INTEGER,
+  contact_count INTEGER NOT NULL DEFAULT 0,
+  customer_contact_count INTEGER NOT NULL DEFAULT 0,
+  opportunity_count INTEGER NOT NULL DEFAULT 0,
+  open_opportunity_count INTEGER NOT NULL DEFAULT 0,
+  open_pipeline_amount NUMERIC NOT NULL DEFAULT 0,
+  won_amount NUMERIC NOT NULL DEFAULT 0,
+  batch_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS summary_opportunity_ledger (
+  opportunity_id INTEGER NOT NULL PRIMARY KEY,
+  company_id INTEGER,
+  stage TEXT NOT NULL,
+  forecast_category TEXT NOT NULL,
+  product TEXT NOT NULL,
+  amount NUMERIC NOT NULL,
+  probability INTEGER NOT NULL,
+  is_closed INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS summary_activity_ledger (
+  source_id TEXT NOT NULL PRIMARY KEY,
+  activity_date TEXT NOT NULL,
+  contact_id INTEGER NOT NULL,
+  opportunity_id INTEGER NOT NULL,
+  duration_minutes INTEGER NOT NULL,
+  is_completed INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS summary_contact_ledger (
+  contact_id INTEGER NOT NULL PRIMARY KEY,
+  company_id INTEGER
+);
@@ -0,0 +1,123 @@
+/*
+Migration 001: native types and access-path indexes on the alysio target tables.
+
+Converts the varchar(255) measure, date and flag columns loaded by earlier
+versions of init.sql in place, gives activities a surrogate key and a unique
+source_id, and swaps the redundant indexes for the ones the reporting queries
+use. Run once against an existing database; fresh installs get the same
+layout from init.sql.
+*/
+use alysio;
+
+-- ---------------------------------------------------------------------------
+-- companies
+-- ---------------------------------------------------------------------------
+-- companies and contacts already had a unique idx_source_id, so only
+-- opportunities and activities are deduplicated below
+UPDATE companies
+SET annual_revenue = NULL
+WHERE TRIM(annual_revenue) = '' OR annual_revenue NOT REGEXP '^[0-9]+(\\.0+)?$';
+
+ALTER TABLE companies
+    MODIFY `annual_revenue` BIGINT DEFAULT NULL,
+    DROP INDEX `source_id`,
+    ADD INDEX `idx_companies_industry` (`industry`),
+    ADD INDEX `idx_companies_is_customer` (`is_customer`),
+    ADD INDEX `idx_companies_batch_id` (`batch_id`);
+
+-- ---------------------------------------------------------------------------
+-- contacts
+-- ---------------------------------------------------------------------------
+ALTER TABLE contacts
+    RENAME INDEX `company_id` TO `idx_contacts_company_id`,
+    ADD INDEX `idx_contacts_email` (`email`),
+    ADD INDEX `idx_contacts_status` (`status`),
+    ADD INDEX `idx_contacts_batch_id` (`batch_id`);
+
+-- ---------------------------------------------------------------------------
+-- opportunities
+-- ---------------------------------------------------------------------------
+UPDATE opportunities
+SET amount = NULLIF(TRIM(amount), ''),
+    probability = NULLIF(TRIM(probability), ''),
+    close_date = NULLIF(TRIM(close_date), ''),
+    is_closed = CASE
+                    WHEN is_closed IN ('1', 'true') THEN '1'
+                    WHEN is_closed IN ('0', 'false') THEN '0'
+                    ELSE NULL
+                END;
+
+-- Keep the most recently loaded copy of any source_id loaded more than once,
+-- and drop rows without one; activities follow the copy that is kept
+UPDATE activities A
+JOIN opportunities O ON O.opportunity_id = A.opportunity_id
+LEFT JOIN (
+    SELECT source_id, MAX(opportunity_id) AS opportunity_id
+    FROM opportunities
+    WHERE source_id IS NOT NULL
+    GROUP BY source_id
+) latest ON latest.source_id = O.source_id
+SET A.opportunity_id = latest.opportunity_id
+WHERE NOT (A.opportunity_id <=> latest.opportunity_id);
+
+DELETE O
+FROM opportunities O
+JOIN opportunities newer
+  ON newer.source_id = O.source_id
+ AND newer.opportunity_id > O.opportunity_id;
+
+DELETE FROM opportunities WHERE source_id IS NULL;
+
+ALTER TABLE opportunities
+    MODIFY `amount` DECIMAL(15,2) DEFAULT NULL,
+    MODIFY `stage` varchar(50) DEFAULT NULL,
+    MODIFY `product` varchar(50) DEFAULT NULL,
+    MODIFY `probability` TINYINT UNSIGNED DEFAULT NULL,
+    MODIFY `close_date` DATETIME DEFAULT NULL,
+    MODIFY `is_closed` BOOL DEFAULT NULL,
+    MODIFY `forecast_category` varchar(50) DEFAULT NULL,
+    DROP INDEX `opportunity_id`,
+    ADD UNIQUE INDEX `idx_source_id` (`source_id`),
+    ADD INDEX `idx_opportunities_company_id` (`company_id`),
+    ADD INDEX `idx_opportunities_contact_id` (`contact_id`),
+    ADD INDEX `idx_opportunities_stage_close_date` (`stage`, `close_date`),
+    ADD INDEX `idx_opportunities_close_date` (`close_date`),
+    ADD INDEX `idx_opportunities_batch_id` (`batch_id`);
+
+-- The explicit indexes above now serve the foreign keys
+ALTER TABLE opportunities
+    DROP INDEX `fk_company_id_opp`,
+    DROP INDEX `fk_contact_id_opp`;
+
+-- ---------------------------------------------------------------------------
+-- activities
+-- ---------------------------------------------------------------------------
+ALTER TABLE activities
+    ADD COLUMN `activity_id` INT AUTO_INCREMENT PRIMARY KEY FIRST;
+
+-- Keep the most recently loaded copy of any source_id the old two-pass
+-- upsert inserted more than once
+DELETE A
+FROM activities A
+JOIN activities newer
+  ON newer.source_id = A.source_id
+ AND newer.activity_id > A.activity_id;
+
+DELETE FROM activities WHERE source_id IS NULL;
+
+UPDATE activities
+SET timestamp = NULLIF(TRIM(timestamp), ''),
+    duration_minutes = NULLIF(TRIM(duration_minutes), '');
+
+ALTER TABLE activities
+    MODIFY `source_id` varchar(255) NOT NULL,
+    MODIFY `type` varchar(50) DEFAULT NULL,
+    MODIFY `timestamp` DATETIME DEFAULT NULL,
+    MODIFY `duration_minutes` SMALLINT UNSIGNED DEFAULT NULL,
+    MODIFY `outcome` varchar(50) DEFAULT NULL,
+    DROP INDEX `opportunity_id`,
+    ADD UNIQUE INDEX `idx_source_id` (`source_id`),
+    ADD INDEX `idx_activities_contact_timestamp` (`contact_id`, `timestamp`),
+    ADD INDEX `idx_activities_opportunity_timestamp` (`opportunity_id`, `timestamp`),
+    ADD INDEX `idx_activities_timestamp` (`timestamp`),
+    ADD INDEX `idx_activities_batch_id` (`batch_id`);
@@ -0,0 +1,75 @@
+/*
+Migration 002: range-partition alysio.activities by month on timestamp.
+
+MySQL only allows unique keys that contain the partitioning column, so the
+primary key becomes (activity_id, timestamp) and the unique source_id index
+from migration 001 becomes (source_id, timestamp). Rows without a timestamp
+cannot be placed in a partition and are moved to activities_archive first.
+The initial partitions mirror init.sql; migration 008 extends them to the
+current month.
+*/
+use alysio;
+
+CREATE TABLE IF NOT EXISTS `activities_archive` (
+  `activity_id` INT NOT NULL,
+  `source_id` varchar(255) NOT NULL,
+  `contact_id` INT DEFAULT NULL,
+  `opportunity_id` INT DEFAULT NULL,
+  `type` varchar(50) DEFAULT NULL,
+  `subject` varchar(255) DEFAULT NULL,
+  `timestamp` DATETIME NOT NULL,
+  `duration_minutes` SMALLINT UNSIGNED DEFAULT NULL,
+  `outcome` varchar(50) DEFAULT NULL,
+  `notes` varchar(255) DEFAULT NULL,
+  `batch_id` INT DEFAULT NULL,
+  `archived_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`activity_id`, `timestamp`),
+  INDEX `idx_source_id` (`source_id`),
+  INDEX `idx_activities_archive_timestamp` (`timestamp`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+INSERT INTO activities_archive
+    (activity_id, source_id, contact_id, opportunity_id, type, subject, timestamp, duration_minutes, outcome, notes, batch_id)
+SELECT activity_id, source_id, contact_id, opportunity_id, type, subject, '1970-01-01 00:00:00', duration_minutes, outcome, notes, batch_id
+FROM activities
+WHERE timestamp IS NULL;
+
+DELETE FROM activities WHERE timestamp IS NULL;
+
+ALTER TABLE activities
+    MODIFY `timestamp` DATETIME NOT NULL,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (`activity_id`, `timestamp`),
+    DROP INDEX `idx_source_id`,
+    ADD UNIQUE INDEX `idx_source_id_timestamp` (`source_id`, `timestamp`),
+    ADD INDEX `idx_source_id` (`source_id`);
+
+ALTER TABLE activities
+PARTITION BY RANGE COLUMNS(`timestamp`) (
+  PARTITION p_history VALUES LESS THAN ('2024-01-01'),
+  PARTITION p202401 VALUES LESS THAN ('2024-02-01'),
+  PARTITION p202402 VALUES LESS THAN ('2024-03-01'),
+  PARTITION p202403 VALUES LESS THAN ('2024-04-01'),
+  PARTITION p202404 VALUES LESS THAN ('2024-05-01'),
+  PARTITION p202405 VALUES LESS THAN ('2024-06-01'),
+  PARTITION p202406 VALUES LESS THAN ('2024-07-01'),
+  PARTITION p202407 VALUES LESS THAN ('2024-08-01'),
+  PARTITION p202408 VALUES LESS THAN ('2024-09-01'),
+  PARTITION p202409 VALUES LESS THAN ('2024-10-01'),
+  PARTITION p202410 VALUES LESS THAN ('2024-11-01'),
+  PARTITION p202411 VALUES LESS THAN ('2024-12-01'),
+  PARTITION p202412 VALUES LESS THAN ('2025-01-01'),
+  PARTITION p202501 VALUES LESS THAN ('2025-02-01'),
+  PARTITION p202502 VALUES LESS THAN ('2025-03-01'),
+  PARTITION p202503 VALUES LESS THAN ('2025-04-01'),
+  PARTITION p202504 VALUES LESS THAN ('2025-05-01'),
+  PARTITION p202505 VALUES LESS THAN ('2025-06-01'),
+  PARTITION p202506 VALUES LESS THAN ('2025-07-01'),
+  PARTITION p202507 VALUES LESS THAN ('2025-08-01'),
+  PARTITION p202508 VALUES LESS THAN ('2025-09-01'),
+  PARTITION p202509 VALUES LESS THAN ('2025-10-01'),
+  PARTITION p202510 VALUES LESS THAN ('2025-11-01'),
+  PARTITION p202511 VALUES LESS THAN ('2025-12-01'),
+  PARTITION p202512 VALUES LESS THAN ('2026-01-01'),
+  PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
@@ -0,0 +1,77 @@
+/*
+Migration 003: summary tables for reporting queries.
+
+Creates the summary and ledger tables. They are backfilled from the rows
+already loaded by migration 008, which runs after schema/procedures.sql once
+every migration has been applied.
+*/
+use alysio;
+
+-- ---------------------------------------------------------------------------
+-- Reporting summaries, maintained incrementally by RefreshSummaries
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `summary_pipeline` (
+  `stage` varchar(50) NOT NULL,
+  `forecast_category` varchar(50) NOT NULL,
+  `product` varchar(50) NOT NULL,
+  `opportunity_count` INT NOT NULL DEFAULT 0,
+  `open_count` INT NOT NULL DEFAULT 0,
+  `total_amount` DECIMAL(18,2) NOT NULL DEFAULT 0,
+  `weighted_amount` DECIMAL(18,2) NOT NULL DEFAULT 0,
+  `batch_id` INT DEFAULT NULL, -- Last batch that changed the group
+  PRIMARY KEY (`stage`, `forecast_category`, `product`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- contact_id / opportunity_id are 0 when the activity has no match
+CREATE TABLE IF NOT EXISTS `summary_activity_daily` (
+  `activity_date` DATE NOT NULL,
+  `contact_id` INT NOT NULL,
+  `opportunity_id` INT NOT NULL,
+  `activity_count` INT NOT NULL DEFAULT 0,
+  `completed_count` INT NOT NULL DEFAULT 0,
+  `total_duration_minutes` INT NOT NULL DEFAULT 0,
+  `batch_id` INT DEFAULT NULL,
+  PRIMARY KEY (`activity_date`, `contact_id`, `opportunity_id`),
+  INDEX `idx_summary_activity_contact` (`contact_id`, `activity_date`),
+  INDEX `idx_summary_activity_opportunity` (`opportunity_id`, `activity_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `summary_company_customers` (
+  `company_id` INT NOT NULL PRIMARY KEY,
+  `is_customer` BOOL DEFAULT NULL,
+  `contact_count` INT NOT NULL DEFAULT 0,
+  `customer_contact_count` INT NOT NULL DEFAULT 0,
+  `opportunity_count` INT NOT NULL DEFAULT 0,
+  `open_opportunity_count` INT NOT NULL DEFAULT 0,
+  `open_pipeline_amount` DECIMAL(18,2) NOT NULL DEFAULT 0,
+  `won_amount` DECIMAL(18,2) NOT NULL DEFAULT 0,
+  `batch_id` INT DEFAULT NULL,
+  INDEX `idx_summary_company_is_customer` (`is_customer`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Ledgers hold the values each source row last contributed to the summaries,
+-- so a refresh can subtract the old contribution of a changed row.
+CREATE TABLE IF NOT EXISTS `summary_opportunity_ledger` (
+  `opportunity_id` INT NOT NULL PRIMARY KEY,
+  `company_id` INT DEFAULT NULL,
+  `stage` varchar(50) NOT NULL,
+  `forecast_category` varchar(50) NOT NULL,
+  `product` varchar(50) NOT NULL,
+  `amount` DECIMAL(15,2) NOT NULL,
+  `probability` TINYINT UNSIGNED NOT NULL,
+  `is_closed` BOOL NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `summary_activity_ledger` (
+  `source_id` varchar(255) NOT NULL PRIMARY KEY,
+  `activity_date` DATE NOT NULL,
+  `contact_id` INT NOT NULL,
+  `opportunity_id` INT NOT NULL,
+  `duration_minutes` INT NOT NULL,
+  `is_completed` BOOL NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `summary_contact_ledger` (
+  `contact_id` INT NOT NULL PRIMARY KEY,
+  `company_id` INT DEFAULT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,16 @@
+/*
+Migration 004: source manifest used to skip unchanged source files.
+The first run after this migration loads every entity and fills the manifest.
+*/
+use alysio_stg;
+
+CREATE TABLE IF NOT EXISTS source_manifest (
+    entity VARCHAR(50) NOT NULL,
+    file_path VARCHAR(500) NOT NULL,
+    size BIGINT NOT NULL,
+    mtime_ns BIGINT NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    batch_id INT NOT NULL,
+    loaded_at DATETIME NOT NULL,
+    PRIMARY KEY (entity, file_path)
+);
@@ -0,0 +1,36 @@
+/*
+Migration 005: soft deletes for snapshot loads.
+
+Adds the is_deleted / deleted_batch_id tombstone columns to the target tables,
+the (is_deleted, source_id) indexes SoftDeleteMissing walks, and an id index
+on every staging table for its anti-join. The procedures that use the
+columns come from schema/procedures.sql. Existing rows stay live.
+*/
+use alysio;
+
+ALTER TABLE companies
+    ADD COLUMN `is_deleted` BOOL NOT NULL DEFAULT 0,
+    ADD COLUMN `deleted_batch_id` INT DEFAULT NULL,
+    ADD INDEX `idx_companies_live` (`is_deleted`, `source_id`);
+
+ALTER TABLE contacts
+    ADD COLUMN `is_deleted` BOOL NOT NULL DEFAULT 0,
+    ADD COLUMN `deleted_batch_id` INT DEFAULT NULL,
+    ADD INDEX `idx_contacts_live` (`is_deleted`, `source_id`);
+
+ALTER TABLE opportunities
+    ADD COLUMN `is_deleted` BOOL NOT NULL DEFAULT 0,
+    ADD COLUMN `deleted_batch_id` INT DEFAULT NULL,
+    ADD INDEX `idx_opportunities_live` (`is_deleted`, `source_id`);
+
+ALTER TABLE activities
+    ADD COLUMN `is_deleted` BOOL NOT NULL DEFAULT 0,
+    ADD COLUMN `deleted_batch_id` INT DEFAULT NULL,
+    ADD INDEX `idx_activities_live` (`is_deleted`, `source_id`);
+
+use alysio_stg;
+
+ALTER TABLE stg_activities ADD INDEX `idx_stg_activities_id` (`id`);
+ALTER TABLE stg_contacts ADD INDEX `idx_stg_contacts_id` (`id`);
+ALTER TABLE stg_companies ADD INDEX `idx_stg_companies_id` (`id`);
+ALTER TABLE stg_opportunities ADD INDEX `idx_stg_opportunities_id` (`id`);
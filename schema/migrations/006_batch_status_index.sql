@@ -0,0 +1,8 @@
+/*
+Migration 006: index on batch (status, id).
+The read-side query cache polls the count and latest id of COMPLETED batches;
+the index answers that without reading the batch rows.
+*/
+use alysio_stg;
+
+ALTER TABLE batch ADD INDEX idx_batch_status_id (status, id);
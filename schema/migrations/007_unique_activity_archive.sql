@@ -0,0 +1,20 @@
+/*
+Migration 007: one archived copy per activity.
+Full loads bring activities past the retention window back into p_history,
+and MaintainActivityPartitions archived them again on every run. This keeps
+the most recently archived copy of each source_id and makes source_id unique
+so archiving upserts, which MaintainActivityPartitions in
+schema/procedures.sql relies on.
+*/
+use alysio;
+
+DELETE A
+FROM activities_archive A
+JOIN activities_archive newer
+  ON newer.source_id = A.source_id
+ AND (newer.archived_at > A.archived_at
+      OR (newer.archived_at = A.archived_at AND newer.activity_id > A.activity_id));
+
+ALTER TABLE activities_archive
+    DROP INDEX `idx_source_id`,
+    ADD UNIQUE INDEX `idx_source_id` (`source_id`);
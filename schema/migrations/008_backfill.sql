@@ -0,0 +1,14 @@
+/*
+Migration 008: backfill after upgrading.
+
+Run last: apply migrations 001-007 in order, then schema/procedures.sql, then
+this script. The procedures read columns several of those migrations add
+(is_deleted and deleted_batch_id come from 005), so they cannot be called any
+earlier. This fills the summary tables from migration 003 with the rows
+already loaded and extends the activity partitions from migration 002 to the
+current month.
+*/
+use alysio_stg;
+
+CALL RebuildSummaries();
+CALL MaintainActivityPartitions(3, 24);
@@ -0,0 +1,770 @@
+/*
+Stored procedures of the alysio_stg schema: upserts, validations, soft deletes,
+activity partition maintenance and the summary refresh. Every procedure is
+dropped and recreated, so the script can be rerun at any time; run it after
+init.sql on a fresh install and after the last migration on an upgrade.
+*/
+use alysio_stg;
+
+DELIMITER $$
+DROP PROCEDURE IF EXISTS TruncateStagingTables$$
+CREATE PROCEDURE TruncateStagingTables()
+BEGIN
+    -- Truncate the tables
+    TRUNCATE TABLE stg_activities;
+    TRUNCATE TABLE stg_contacts;
+    TRUNCATE TABLE stg_companies;
+    TRUNCATE TABLE stg_opportunities;
+END $$
+
+DELIMITER ;
+
+
+DELIMITER $$
+DROP PROCEDURE IF EXISTS UpsertCompanies$$
+
+CREATE PROCEDURE UpsertCompanies(IN batch_id INT)
+BEGIN
+    -- batch_id first, see UpsertContacts
+    INSERT INTO alysio.companies (source_id, name, domain, industry, size, country, created_date, is_customer, annual_revenue, batch_id)
+    SELECT 
+        id, 
+        name, 
+        domain, 
+        industry, 
+        size, 
+        country, 
+        created_date, 
+        is_customer IN ('1', 'true'), 
+        annual_revenue, 
+        batch_id AS batch_id
+    FROM alysio_stg.stg_companies
+    where is_error != 1
+    ON DUPLICATE KEY UPDATE
+        batch_id = IF(
+            alysio.companies.is_deleted OR
+            NOT (alysio.companies.name <=> VALUES(name)) OR
+            NOT (alysio.companies.domain <=> VALUES(domain)) OR
+            NOT (alysio.companies.industry <=> VALUES(industry)) OR
+            NOT (alysio.companies.size <=> VALUES(size)) OR
+            NOT (alysio.companies.country <=> VALUES(country)) OR
+            NOT (alysio.companies.created_date <=> VALUES(created_date)) OR
+            NOT (alysio.companies.is_customer <=> VALUES(is_customer)) OR
+            NOT (alysio.companies.annual_revenue <=> VALUES(annual_revenue)),
+            VALUES(batch_id), alysio.companies.batch_id),
+        name = VALUES(name),
+        domain = VALUES(domain),
+        industry = VALUES(industry),
+        size = VALUES(size),
+        country = VALUES(country),
+        created_date = VALUES(created_date),
+        is_customer = VALUES(is_customer),
+        annual_revenue = VALUES(annual_revenue),
+        is_deleted = 0,
+        deleted_batch_id = NULL;
+
+END $$
+
+DELIMITER ;
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS UpsertContacts$$
+
+CREATE PROCEDURE UpsertContacts(IN batch_id INT)
+BEGIN
+    /*
+    Single pass over staging: new contacts are inserted and existing ones
+    updated through the unique source_id. The ON DUPLICATE KEY UPDATE
+    assignments run left to right, so batch_id is assigned first, while the
+    other columns still hold their old values, and only moves to this batch
+    when one of them changes.
+    */
+    INSERT INTO alysio.contacts(
+        source_id, email, first_name, last_name, title, company_id, 
+        phone, status, created_date, last_modified, batch_id
+    )
+    SELECT 
+        CO.id,
+        CO.email,
+        CO.first_name,
+        CO.last_name,
+        CO.title,
+        C.company_id,
+        CO.phone,
+        CO.status,
+        CO.created_date,
+        CO.last_modified,
+        batch_id -- Use the parameter batch_id
+    FROM alysio_stg.stg_contacts CO
+	JOIN alysio.companies C ON C.source_id = CO.company_id
+    WHERE CO.is_error != 1
+    ON DUPLICATE KEY UPDATE
+        batch_id = IF(
+            alysio.contacts.is_deleted OR
+            NOT (alysio.contacts.email <=> VALUES(email)) OR
+            NOT (alysio.contacts.first_name <=> VALUES(first_name)) OR
+            NOT (alysio.contacts.last_name <=> VALUES(last_name)) OR
+            NOT (alysio.contacts.title <=> VALUES(title)) OR
+            NOT (alysio.contacts.company_id <=> VALUES(company_id)) OR
+            NOT (alysio.contacts.phone <=> VALUES(phone)) OR
+            NOT (alysio.contacts.status <=> VALUES(status)) OR
+            NOT (alysio.contacts.created_date <=> VALUES(created_date)) OR
+            NOT (alysio.contacts.last_modified <=> VALUES(last_modified)),
+            VALUES(batch_id), alysio.contacts.batch_id),
+        email = VALUES(email),
+        first_name = VALUES(first_name),
+        last_name = VALUES(last_name),
+        title = VALUES(title),
+        company_id = VALUES(company_id),
+        phone = VALUES(phone),
+        status = VALUES(status),
+        created_date = VALUES(created_date),
+        last_modified = VALUES(last_modified),
+        -- A row that reappears after a snapshot deleted it is live again
+        is_deleted = 0,
+        deleted_batch_id = NULL;
+END $$
+
+DELIMITER ;
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS UpsertOpportunities$$
+
+CREATE PROCEDURE UpsertOpportunities(IN batch_id INT)
+BEGIN
+    -- Single pass upsert on the unique source_id; batch_id first, see UpsertContacts
+    INSERT INTO alysio.opportunities(
+			source_id,name,contact_id,company_id,amount,stage,product,probability,
+			created_date,close_date,is_closed,forecast_category,batch_id
+    )
+    SELECT id,
+		O.name,
+		DC.contact_id,
+		C.company_id,
+		O.amount,
+		O.stage,
+		O.product,
+		O.probability,
+		O.created_date,
+		O.close_date,
+		O.is_closed IN ('1', 'true'),
+		O.forecast_category,
+        batch_id  -- Use the parameter batch_id
+    FROM alysio_stg.stg_opportunities O
+	JOIN alysio.companies C ON C.source_id = O.company_id
+    JOIN alysio.contacts DC ON DC.source_id = O.contact_id
+    WHERE O.is_error != 1
+    ON DUPLICATE KEY UPDATE
+        -- VALUES() holds the staged values already converted to the column types
+        batch_id = IF(
+            alysio.opportunities.is_deleted OR
+            NOT (alysio.opportunities.name <=> VALUES(name)) OR
+            NOT (alysio.opportunities.contact_id <=> VALUES(contact_id)) OR
+            NOT (alysio.opportunities.company_id <=> VALUES(company_id)) OR
+            NOT (alysio.opportunities.amount <=> VALUES(amount)) OR
+            NOT (alysio.opportunities.stage <=> VALUES(stage)) OR
+            NOT (alysio.opportunities.product <=> VALUES(product)) OR
+            NOT (alysio.opportunities.probability <=> VALUES(probability)) OR
+            NOT (alysio.opportunities.created_date <=> VALUES(created_date)) OR
+            NOT (alysio.opportunities.close_date <=> VALUES(close_date)) OR
+            NOT (alysio.opportunities.is_closed <=> VALUES(is_closed)) OR
+            NOT (alysio.opportunities.forecast_category <=> VALUES(forecast_category)),
+            VALUES(batch_id), alysio.opportunities.batch_id),
+        name = VALUES(name),
+        contact_id = VALUES(contact_id),
+        company_id = VALUES(company_id),
+        amount = VALUES(amount),
+        stage = VALUES(stage),
+        product = VALUES(product),
+        probability = VALUES(probability),
+        created_date = VALUES(created_date),
+        close_date = VALUES(close_date),
+        is_closed = VALUES(is_closed),
+        forecast_category = VALUES(forecast_category),
+        is_deleted = 0,
+        deleted_batch_id = NULL;
+END $$
+
+DELIMITER ;
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS UpsertActivities $$
+
+CREATE PROCEDURE UpsertActivities(IN batch_id INT)
+BEGIN
+    /*
+    alysio.activities is partitioned by month on timestamp, so its unique key
+    has to be (source_id, timestamp); a unique source_id alone is not allowed.
+    Activities whose timestamp changed are first moved to their new
+    timestamp (and partition), which only joins staging to activities on
+    source_id. After that every loaded activity matches on
+    (source_id, timestamp) and a single upsert inserts or updates the rest.
+    */
+
+    -- Move activities whose timestamp changed
+    UPDATE alysio.activities DA
+    JOIN alysio_stg.stg_activities A ON A.id = DA.source_id
+    SET DA.timestamp = A.timestamp
+        ,DA.batch_id = batch_id  -- Use the parameter batch_id
+    WHERE A.is_error != 1
+    AND NOT (DA.timestamp <=> CAST(A.timestamp AS DATETIME));
+
+    -- Single pass upsert; batch_id first, see UpsertContacts
+    INSERT INTO alysio.activities(source_id,contact_id,opportunity_id,type,subject,timestamp,duration_minutes,outcome,notes,batch_id)
+    SELECT A.id,
+		DC.contact_id,
+		O.opportunity_id,
+		A.type,
+		A.subject,
+		A.timestamp,
+		A.duration_minutes,
+		A.outcome,
+        A.notes,
+        batch_id  -- Use the parameter batch_id
+    FROM alysio_stg.stg_activities A
+	LEFT JOIN alysio.opportunities O ON O.source_id = A.opportunity_id
+    LEFT JOIN alysio.contacts DC ON DC.source_id = A.contact_id
+    WHERE A.is_error != 1
+    ON DUPLICATE KEY UPDATE
+        batch_id = IF(
+            alysio.activities.is_deleted OR
+            NOT (alysio.activities.contact_id <=> VALUES(contact_id)) OR
+            NOT (alysio.activities.opportunity_id <=> VALUES(opportunity_id)) OR
+            NOT (alysio.activities.type <=> VALUES(type)) OR
+            NOT (alysio.activities.subject <=> VALUES(subject)) OR
+            NOT (alysio.activities.duration_minutes <=> VALUES(duration_minutes)) OR
+            NOT (alysio.activities.outcome <=> VALUES(outcome)),
+            VALUES(batch_id), alysio.activities.batch_id),
+        contact_id = VALUES(contact_id),
+        opportunity_id = VALUES(opportunity_id),
+        type = VALUES(type),
+        subject = VALUES(subject),
+        duration_minutes = VALUES(duration_minutes),
+        outcome = VALUES(outcome),
+        -- Notes alone never marked a row as changed, so they follow the other columns
+        notes = IF(alysio.activities.batch_id = VALUES(batch_id), VALUES(notes), alysio.activities.notes),
+        is_deleted = 0,
+        deleted_batch_id = NULL;
+
+END $$
+
+DELIMITER ;
+
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS SoftDeleteMissing$$
+
+CREATE PROCEDURE SoftDeleteMissing(IN p_entity VARCHAR(50), IN p_batch_id INT, OUT p_deleted INT)
+BEGIN
+    /*
+    Snapshot loads only: tombstones the live rows of the entity whose
+    source_id is not in its staging table any more. Staged rows count as
+    present even if run_validations rejected them. The anti-join walks the
+    live rows through idx_<entity>_live (is_deleted, source_id), so earlier
+    tombstones are never read again, and probes staging through
+    idx_stg_<entity>_id. Tombstones are stamped with p_batch_id, so
+    RefreshSummaries takes them out of the summaries.
+    */
+    SET p_deleted = 0;
+
+    IF p_entity = 'companies' THEN
+        UPDATE alysio.companies T
+        LEFT JOIN alysio_stg.stg_companies S ON S.id = T.source_id
+        SET T.is_deleted = 1,
+            T.deleted_batch_id = p_batch_id,
+            T.batch_id = p_batch_id
+        WHERE T.is_deleted = 0 AND S.id IS NULL;
+        SET p_deleted = ROW_COUNT();
+    ELSEIF p_entity = 'contacts' THEN
+        UPDATE alysio.contacts T
+        LEFT JOIN alysio_stg.stg_contacts S ON S.id = T.source_id
+        SET T.is_deleted = 1,
+            T.deleted_batch_id = p_batch_id,
+            T.batch_id = p_batch_id
+        WHERE T.is_deleted = 0 AND S.id IS NULL;
+        SET p_deleted = ROW_COUNT();
+    ELSEIF p_entity = 'opportunities' THEN
+        UPDATE alysio.opportunities T
+        LEFT JOIN alysio_stg.stg_opportunities S ON S.id = T.source_id
+        SET T.is_deleted = 1,
+            T.deleted_batch_id = p_batch_id,
+            T.batch_id = p_batch_id
+        WHERE T.is_deleted = 0 AND S.id IS NULL;
+        SET p_deleted = ROW_COUNT();
+    ELSEIF p_entity = 'activities' THEN
+        UPDATE alysio.activities T
+        LEFT JOIN alysio_stg.stg_activities S ON S.id = T.source_id
+        SET T.is_deleted = 1,
+            T.deleted_batch_id = p_batch_id,
+            T.batch_id = p_batch_id
+        WHERE T.is_deleted = 0 AND S.id IS NULL;
+        SET p_deleted = ROW_COUNT();
+    END IF;
+END $$
+
+DELIMITER ;
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS run_validations$$
+
+CREATE PROCEDURE run_validations()
+BEGIN
+/*
+1: marked as Error and wont get loaded
+2: marked as Warning and will get loaded
+*/
+
+
+    -- Remove Duplicates based on created date
+    UPDATE alysio_stg.stg_contacts AS sc
+	JOIN (
+		SELECT id, MAX(created_date) AS latest_created_date
+		FROM alysio_stg.stg_contacts
+		GROUP BY id
+	) AS latest
+	ON sc.id = latest.id
+	SET sc.is_error = 1,
+		sc.error_description = 'Duplicate record'
+	WHERE sc.created_date < latest.latest_created_date;
+    
+    -- Capture Invalid Phone Numbers; the loader writes valid numbers in E.164
+	UPDATE alysio_stg.stg_contacts C
+    SET C.is_error = 2,
+		C.error_description = 'Invalid Phone Number'
+    WHERE C.phone NOT REGEXP '^[+][1-9][0-9]{7,14}$';
+    
+    -- Capture Invalid Emails
+    UPDATE alysio_stg.stg_contacts C
+    SET C.is_error = 2,
+		C.error_description = 'Invalid Email'
+    WHERE INSTR(email, '@') = 0;
+    
+    -- Invalid Date range
+    -- Dates are staged as 'YYYY-MM-DD HH:MM:SS' (NULL when unparseable), so
+    -- they compare as strings without parsing them again
+    UPDATE alysio_stg.stg_contacts C
+    SET C.is_error = 2,
+		C.error_description = 'Invalid Dates'
+    WHERE C.created_date > DATE_FORMAT(NOW(), '%Y-%m-%d %H:%i:%s')
+    OR C.last_modified > DATE_FORMAT(NOW(), '%Y-%m-%d %H:%i:%s');
+    
+    -- Invalid Country Abbr
+    UPDATE alysio_stg.stg_companies C
+    SET C.is_error = 1,
+		C.error_description = 'Invalid Country'
+    WHERE LENGTH(TRIM(C.country)) > 2;
+    
+    -- Missing Activity Timestamp (activities are partitioned on it)
+    UPDATE alysio_stg.stg_activities A
+    SET A.is_error = 1,
+		A.error_description = 'Invalid Timestamp'
+    WHERE A.timestamp IS NULL;
+    
+    -- Duplicate Activities: keep the latest timestamp of an id, since the
+    -- upsert would otherwise insert one row per (source_id, timestamp)
+    UPDATE alysio_stg.stg_activities AS sa
+	JOIN (
+		SELECT id, MAX(timestamp) AS latest_timestamp
+		FROM alysio_stg.stg_activities
+		GROUP BY id
+	) AS latest
+	ON sa.id = latest.id
+	SET sa.is_error = 1,
+		sa.error_description = 'Duplicate record'
+	WHERE sa.timestamp < latest.latest_timestamp;
+    
+    
+
+END $$
+
+DELIMITER ;
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS MaintainActivityPartitions$$
+
+CREATE PROCEDURE MaintainActivityPartitions(IN months_ahead INT, IN retain_months INT)
+BEGIN
+/*
+Keeps alysio.activities partitioned one month per partition:
+- splits p_future so that monthly partitions exist up to months_ahead months
+  past the current month
+- copies monthly partitions older than retain_months into
+  alysio.activities_archive and folds the emptied months into p_history
+- archives whatever arrived late in p_history when it retires a month
+Full loads bring retired activities back into p_history, so archiving
+upserts on source_id and refreshes the archived copy instead of adding
+another one. Within a month there is nothing to create or retire, and the
+procedure only reads information_schema.
+ALTER TABLE commits implicitly, so call this outside a load transaction.
+*/
+    DECLARE v_partition VARCHAR(64);
+    DECLARE v_retired INT DEFAULT 0;
+    DECLARE v_month DATE;
+    DECLARE v_horizon DATE;
+    DECLARE v_cutoff DATE;
+
+    SET v_horizon = DATE_FORMAT(CURDATE(), '%Y-%m-01') + INTERVAL months_ahead MONTH;
+    SET v_cutoff = DATE_FORMAT(CURDATE(), '%Y-%m-01') - INTERVAL retain_months MONTH;
+
+    -- Create future partitions
+    SELECT MAX(PARTITION_NAME) INTO v_partition
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = 'alysio'
+    AND TABLE_NAME = 'activities'
+    AND PARTITION_NAME REGEXP '^p[0-9]{6}$';
+
+    SET v_month = IFNULL(
+        STR_TO_DATE(CONCAT(SUBSTRING(v_partition, 2), '01'), '%Y%m%d') + INTERVAL 1 MONTH,
+        DATE_FORMAT(CURDATE(), '%Y-%m-01'));
+
+    WHILE v_month <= v_horizon DO
+        SET @ddl = CONCAT(
+            'ALTER TABLE alysio.activities REORGANIZE PARTITION p_future INTO (',
+            'PARTITION p', DATE_FORMAT(v_month, '%Y%m'),
+            ' VALUES LESS THAN (''', DATE_FORMAT(v_month + INTERVAL 1 MONTH, '%Y-%m-%d'), '''), ',
+            'PARTITION p_future VALUES LESS THAN (MAXVALUE))');
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+        SET v_month = v_month + INTERVAL 1 MONTH;
+    END WHILE;
+
+    SET @archive_upsert = CONCAT(
+        'ON DUPLICATE KEY UPDATE activity_id = VALUES(activity_id), contact_id = VALUES(contact_id), ',
+        'opportunity_id = VALUES(opportunity_id), type = VALUES(type), subject = VALUES(subject), ',
+        'timestamp = VALUES(timestamp), duration_minutes = VALUES(duration_minutes), outcome = VALUES(outcome), ',
+        'notes = VALUES(notes), batch_id = VALUES(batch_id), archived_at = CURRENT_TIMESTAMP');
+
+    -- Archive expired partitions
+    archive_loop: LOOP
+        SET v_partition = NULL;
+        SELECT MIN(PARTITION_NAME) INTO v_partition
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = 'alysio'
+        AND TABLE_NAME = 'activities'
+        AND PARTITION_NAME REGEXP '^p[0-9]{6}$'
+        AND STR_TO_DATE(CONCAT(SUBSTRING(PARTITION_NAME, 2), '01'), '%Y%m%d') < v_cutoff;
+
+        IF v_partition IS NULL THEN
+            LEAVE archive_loop;
+        END IF;
+
+        SET @dml = CONCAT(
+            'INSERT INTO alysio.activities_archive ',
+            '(activity_id, source_id, contact_id, opportunity_id, type, subject, timestamp, duration_minutes, outcome, notes, batch_id) ',
+            'SELECT activity_id, source_id, contact_id, opportunity_id, type, subject, timestamp, duration_minutes, outcome, notes, batch_id ',
+            'FROM alysio.activities PARTITION (', v_partition, ') WHERE is_deleted = 0 ',
+            @archive_upsert);
+        PREPARE stmt FROM @dml;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+
+        -- Empty the month and fold it into p_history, so late rows for an
+        -- archived month land below the retention window
+        SET @ddl = CONCAT('ALTER TABLE alysio.activities TRUNCATE PARTITION ', v_partition);
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+
+        SET @ddl = CONCAT(
+            'ALTER TABLE alysio.activities REORGANIZE PARTITION p_history, ', v_partition, ' INTO (',
+            'PARTITION p_history VALUES LESS THAN (''',
+            DATE_FORMAT(STR_TO_DATE(CONCAT(SUBSTRING(v_partition, 2), '01'), '%Y%m%d') + INTERVAL 1 MONTH, '%Y-%m-%d'),
+            '''))');
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+        SET v_retired = v_retired + 1;
+    END LOOP;
+
+    -- p_history ends where the oldest monthly partition starts
+    SELECT STR_TO_DATE(CONCAT(SUBSTRING(MIN(PARTITION_NAME), 2), '01'), '%Y%m%d') INTO v_month
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = 'alysio'
+    AND TABLE_NAME = 'activities'
+    AND PARTITION_NAME REGEXP '^p[0-9]{6}$';
+
+    IF v_retired > 0 AND (v_month IS NULL OR v_month <= v_cutoff) THEN
+        INSERT INTO alysio.activities_archive
+            (activity_id, source_id, contact_id, opportunity_id, type, subject, timestamp, duration_minutes, outcome, notes, batch_id)
+        SELECT activity_id, source_id, contact_id, opportunity_id, type, subject, timestamp, duration_minutes, outcome, notes, batch_id
+        FROM alysio.activities PARTITION (p_history)
+        WHERE is_deleted = 0
+        ON DUPLICATE KEY UPDATE
+            activity_id = VALUES(activity_id),
+            contact_id = VALUES(contact_id),
+            opportunity_id = VALUES(opportunity_id),
+            type = VALUES(type),
+            subject = VALUES(subject),
+            timestamp = VALUES(timestamp),
+            duration_minutes = VALUES(duration_minutes),
+            outcome = VALUES(outcome),
+            notes = VALUES(notes),
+            batch_id = VALUES(batch_id),
+            archived_at = CURRENT_TIMESTAMP;
+
+        ALTER TABLE alysio.activities TRUNCATE PARTITION p_history;
+    END IF;
+
+END $$
+
+DELIMITER ;
+
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS RefreshSummaries$$
+
+CREATE PROCEDURE RefreshSummaries(IN p_batch_id INT)
+BEGIN
+/*
+Folds the rows stamped with p_batch_id by the Upsert* procedures into the
+summary tables. For every changed row the contribution recorded in its ledger
+is subtracted and the current one added, so only the groups touched by the
+batch are written. Rows tombstoned by SoftDeleteMissing contribute nothing
+and lose their ledger rows. Calling it twice for the same batch is a no-op.
+*/
+
+    -- Companies whose rollup changes, by old (ledger) and new membership
+    DROP TEMPORARY TABLE IF EXISTS tmp_summary_companies;
+    CREATE TEMPORARY TABLE tmp_summary_companies (company_id INT PRIMARY KEY);
+
+    INSERT IGNORE INTO tmp_summary_companies
+    SELECT company_id FROM alysio.companies WHERE batch_id = p_batch_id;
+
+    INSERT IGNORE INTO tmp_summary_companies
+    SELECT company_id FROM alysio.contacts
+    WHERE batch_id = p_batch_id AND company_id IS NOT NULL;
+
+    INSERT IGNORE INTO tmp_summary_companies
+    SELECT L.company_id
+    FROM alysio.summary_contact_ledger L
+    JOIN alysio.contacts DC ON DC.contact_id = L.contact_id
+    WHERE DC.batch_id = p_batch_id AND L.company_id IS NOT NULL;
+
+    INSERT IGNORE INTO tmp_summary_companies
+    SELECT company_id FROM alysio.opportunities
+    WHERE batch_id = p_batch_id AND company_id IS NOT NULL;
+
+    INSERT IGNORE INTO tmp_summary_companies
+    SELECT L.company_id
+    FROM alysio.summary_opportunity_ledger L
+    JOIN alysio.opportunities DO ON DO.opportunity_id = L.opportunity_id
+    WHERE DO.batch_id = p_batch_id AND L.company_id IS NOT NULL;
+
+    -- Pipeline by stage / forecast category / product
+    UPDATE alysio.summary_pipeline S
+    JOIN (
+        SELECT L.stage, L.forecast_category, L.product,
+            COUNT(*) AS opportunity_count,
+            SUM(NOT L.is_closed) AS open_count,
+            SUM(L.amount) AS total_amount,
+            SUM(L.amount * L.probability / 100) AS weighted_amount
+        FROM alysio.summary_opportunity_ledger L
+        JOIN alysio.opportunities DO ON DO.opportunity_id = L.opportunity_id
+        WHERE DO.batch_id = p_batch_id
+        GROUP BY L.stage, L.forecast_category, L.product
+    ) D ON D.stage = S.stage
+       AND D.forecast_category = S.forecast_category
+       AND D.product = S.product
+    SET S.opportunity_count = S.opportunity_count - D.opportunity_count,
+        S.open_count = S.open_count - D.open_count,
+        S.total_amount = S.total_amount - D.total_amount,
+        S.weighted_amount = S.weighted_amount - D.weighted_amount,
+        S.batch_id = p_batch_id;
+
+    INSERT INTO alysio.summary_pipeline
+        (stage, forecast_category, product, opportunity_count, open_count, total_amount, weighted_amount, batch_id)
+    SELECT COALESCE(stage, ''),
+        COALESCE(forecast_category, ''),
+        COALESCE(product, ''),
+        COUNT(*),
+        SUM(NOT COALESCE(is_closed, 0)),
+        SUM(COALESCE(amount, 0)),
+        SUM(COALESCE(amount, 0) * COALESCE(probability, 0) / 100),
+        p_batch_id
+    FROM alysio.opportunities
+    WHERE batch_id = p_batch_id AND is_deleted = 0
+    GROUP BY COALESCE(stage, ''), COALESCE(forecast_category, ''), COALESCE(product, '')
+    ON DUPLICATE KEY UPDATE
+        opportunity_count = opportunity_count + VALUES(opportunity_count),
+        open_count = open_count + VALUES(open_count),
+        total_amount = total_amount + VALUES(total_amount),
+        weighted_amount = weighted_amount + VALUES(weighted_amount),
+        batch_id = VALUES(batch_id);
+
+    DELETE FROM alysio.summary_pipeline WHERE opportunity_count = 0;
+
+    REPLACE INTO alysio.summary_opportunity_ledger
+        (opportunity_id, company_id, stage, forecast_category, product, amount, probability, is_closed)
+    SELECT opportunity_id,
+        company_id,
+        COALESCE(stage, ''),
+        COALESCE(forecast_category, ''),
+        COALESCE(product, ''),
+        COALESCE(amount, 0),
+        COALESCE(probability, 0),
+        COALESCE(is_closed, 0)
+    FROM alysio.opportunities
+    WHERE batch_id = p_batch_id AND is_deleted = 0;
+
+    DELETE L
+    FROM alysio.summary_opportunity_ledger L
+    JOIN alysio.opportunities DO ON DO.opportunity_id = L.opportunity_id
+    WHERE DO.batch_id = p_batch_id AND DO.is_deleted = 1;
+
+    -- Activities per contact / opportunity / day
+    UPDATE alysio.summary_activity_daily S
+    JOIN (
+        SELECT L.activity_date, L.contact_id, L.opportunity_id,
+            COUNT(*) AS activity_count,
+            SUM(L.is_completed) AS completed_count,
+            SUM(L.duration_minutes) AS total_duration_minutes
+        FROM alysio.summary_activity_ledger L
+        JOIN alysio.activities DA ON DA.source_id = L.source_id
+        WHERE DA.batch_id = p_batch_id
+        GROUP BY L.activity_date, L.contact_id, L.opportunity_id
+    ) D ON D.activity_date = S.activity_date
+       AND D.contact_id = S.contact_id
+       AND D.opportunity_id = S.opportunity_id
+    SET S.activity_count = S.activity_count - D.activity_count,
+        S.completed_count = S.completed_count - D.completed_count,
+        S.total_duration_minutes = S.total_duration_minutes - D.total_duration_minutes,
+        S.batch_id = p_batch_id;
+
+    INSERT INTO alysio.summary_activity_daily
+        (activity_date, contact_id, opportunity_id, activity_count, completed_count, total_duration_minutes, batch_id)
+    SELECT DATE(timestamp),
+        COALESCE(contact_id, 0),
+        COALESCE(opportunity_id, 0),
+        COUNT(*),
+        SUM(outcome = 'Completed'),
+        SUM(COALESCE(duration_minutes, 0)),
+        p_batch_id
+    FROM alysio.activities
+    WHERE batch_id = p_batch_id AND is_deleted = 0
+    GROUP BY DATE(timestamp), COALESCE(contact_id, 0), COALESCE(opportunity_id, 0)
+    ON DUPLICATE KEY UPDATE
+        activity_count = activity_count + VALUES(activity_count),
+        completed_count = completed_count + VALUES(completed_count),
+        total_duration_minutes = total_duration_minutes + VALUES(total_duration_minutes),
+        batch_id = VALUES(batch_id);
+
+    DELETE FROM alysio.summary_activity_daily WHERE activity_count = 0;
+
+    REPLACE INTO alysio.summary_activity_ledger
+        (source_id, activity_date, contact_id, opportunity_id, duration_minutes, is_completed)
+    SELECT source_id,
+        DATE(timestamp),
+        COALESCE(contact_id, 0),
+        COALESCE(opportunity_id, 0),
+        COALESCE(duration_minutes, 0),
+        COALESCE(outcome = 'Completed', 0)
+    FROM alysio.activities
+    WHERE batch_id = p_batch_id AND is_deleted = 0;
+
+    DELETE L
+    FROM alysio.summary_activity_ledger L
+    JOIN alysio.activities DA ON DA.source_id = L.source_id
+    WHERE DA.batch_id = p_batch_id AND DA.is_deleted = 1;
+
+    -- Company customer rollups, recomputed for the affected companies only
+    REPLACE INTO alysio.summary_company_customers
+        (company_id, is_customer, contact_count, customer_contact_count, opportunity_count,
+         open_opportunity_count, open_pipeline_amount, won_amount, batch_id)
+    SELECT C.company_id,
+        C.is_customer,
+        CT.contact_count,
+        COALESCE(CT.customer_contact_count, 0),
+        OP.opportunity_count,
+        COALESCE(OP.open_opportunity_count, 0),
+        COALESCE(OP.open_pipeline_amount, 0),
+        COALESCE(OP.won_amount, 0),
+        p_batch_id
+    FROM tmp_summary_companies T
+    JOIN alysio.companies C ON C.company_id = T.company_id AND C.is_deleted = 0
+    JOIN LATERAL (
+        SELECT COUNT(*) AS contact_count,
+            SUM(DC.status = 'Customer') AS customer_contact_count
+        FROM alysio.contacts DC
+        WHERE DC.company_id = C.company_id AND DC.is_deleted = 0
+    ) CT ON TRUE
+    JOIN LATERAL (
+        SELECT COUNT(*) AS opportunity_count,
+            SUM(NOT COALESCE(DO.is_closed, 0)) AS open_opportunity_count,
+            SUM(CASE WHEN NOT COALESCE(DO.is_closed, 0) THEN DO.amount END) AS open_pipeline_amount,
+            SUM(CASE WHEN DO.stage = 'Closed Won' THEN DO.amount END) AS won_amount
+        FROM alysio.opportunities DO
+        WHERE DO.company_id = C.company_id AND DO.is_deleted = 0
+    ) OP ON TRUE;
+
+    DELETE S
+    FROM alysio.summary_company_customers S
+    JOIN alysio.companies C ON C.company_id = S.company_id
+    WHERE C.batch_id = p_batch_id AND C.is_deleted = 1;
+
+    REPLACE INTO alysio.summary_contact_ledger (contact_id, company_id)
+    SELECT contact_id, company_id
+    FROM alysio.contacts
+    WHERE batch_id = p_batch_id AND is_deleted = 0;
+
+    DELETE L
+    FROM alysio.summary_contact_ledger L
+    JOIN alysio.contacts DC ON DC.contact_id = L.contact_id
+    WHERE DC.batch_id = p_batch_id AND DC.is_deleted = 1;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_summary_companies;
+
+END $$
+
+DELIMITER ;
+
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS RebuildSummaries$$
+
+CREATE PROCEDURE RebuildSummaries()
+BEGIN
+/*
+Recomputes every summary from scratch. Each target row carries exactly one
+batch_id, so replaying RefreshSummaries for every batch in order covers all
+rows once. Use after init or to recover from a failed refresh.
+*/
+    DECLARE v_batch_id INT DEFAULT 0;
+
+    TRUNCATE TABLE alysio.summary_pipeline;
+    TRUNCATE TABLE alysio.summary_activity_daily;
+    TRUNCATE TABLE alysio.summary_company_customers;
+    TRUNCATE TABLE alysio.summary_opportunity_ledger;
+    TRUNCATE TABLE alysio.summary_activity_ledger;
+    TRUNCATE TABLE alysio.summary_contact_ledger;
+
+    rebuild_loop: LOOP
+        SELECT MIN(batch_id) INTO v_batch_id
+        FROM (
+            SELECT MIN(batch_id) AS batch_id FROM alysio.companies WHERE batch_id > v_batch_id
+            UNION ALL
+            SELECT MIN(batch_id) FROM alysio.contacts WHERE batch_id > v_batch_id
+            UNION ALL
+            SELECT MIN(batch_id) FROM alysio.opportunities WHERE batch_id > v_batch_id
+            UNION ALL
+            SELECT MIN(batch_id) FROM alysio.activities WHERE batch_id > v_batch_id
+        ) B;
+
+        IF v_batch_id IS NULL THEN
+            LEAVE rebuild_loop;
+        END IF;
+
+        CALL RefreshSummaries(v_batch_id);
+    END LOOP;
+
+END $$
+
+DELIMITER ;
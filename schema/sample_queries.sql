@@ -0,0 +1,82 @@
+/*
+Sample queries against the alysio target and summary tables.
+Summary tables are refreshed by every batch (see RefreshSummaries), so the
+reporting queries below read a few hundred rows instead of aggregating the
+raw opportunities and activities tables. Rows tombstoned by snapshot loads
+stay in the target tables with is_deleted = 1, so every query on them keeps
+to live rows (is_deleted = 0).
+*/
+use alysio;
+
+-- Pipeline by stage, largest weighted pipeline first
+SELECT stage,
+    SUM(opportunity_count) AS opportunities,
+    SUM(open_count) AS open_opportunities,
+    SUM(total_amount) AS total_amount,
+    SUM(weighted_amount) AS weighted_amount
+FROM summary_pipeline
+GROUP BY stage
+ORDER BY weighted_amount DESC;
+
+-- Forecast by category and product
+SELECT forecast_category, product, total_amount, weighted_amount
+FROM summary_pipeline
+WHERE stage NOT IN ('Closed Won', 'Closed Lost')
+ORDER BY forecast_category, product;
+
+-- Activity volume per day over the last 30 days
+SELECT activity_date,
+    SUM(activity_count) AS activities,
+    SUM(completed_count) AS completed,
+    SUM(total_duration_minutes) AS minutes
+FROM summary_activity_daily
+WHERE activity_date >= CURDATE() - INTERVAL 30 DAY
+GROUP BY activity_date
+ORDER BY activity_date;
+
+-- Most engaged contacts over the last 90 days
+SELECT C.source_id, C.first_name, C.last_name, C.email,
+    SUM(S.activity_count) AS activities,
+    SUM(S.total_duration_minutes) AS minutes
+FROM summary_activity_daily S
+JOIN contacts C ON C.contact_id = S.contact_id AND C.is_deleted = 0
+WHERE S.activity_date >= CURDATE() - INTERVAL 90 DAY
+GROUP BY C.contact_id, C.source_id, C.first_name, C.last_name, C.email
+ORDER BY activities DESC
+LIMIT 20;
+
+-- Customer companies with open pipeline
+SELECT C.source_id, C.name, C.industry,
+    S.contact_count, S.customer_contact_count,
+    S.open_opportunity_count, S.open_pipeline_amount, S.won_amount
+FROM summary_company_customers S
+JOIN companies C ON C.company_id = S.company_id AND C.is_deleted = 0
+WHERE S.is_customer = 1
+AND S.open_opportunity_count > 0
+ORDER BY S.open_pipeline_amount DESC;
+
+-- Opportunities closing this quarter (idx_opportunities_stage_close_date)
+SELECT O.source_id, O.name, O.stage, O.amount, O.probability, O.close_date
+FROM opportunities O
+WHERE O.stage IN ('Proposal', 'Negotiation')
+AND O.is_deleted = 0
+AND O.close_date >= MAKEDATE(YEAR(CURDATE()), 1) + INTERVAL QUARTER(CURDATE()) - 1 QUARTER
+AND O.close_date < MAKEDATE(YEAR(CURDATE()), 1) + INTERVAL QUARTER(CURDATE()) QUARTER
+ORDER BY O.close_date;
+
+-- Activity timeline for one contact (idx_activities_contact_timestamp, recent partitions only)
+SELECT A.timestamp, A.type, A.subject, A.outcome, A.duration_minutes, O.name AS opportunity
+FROM activities A
+JOIN contacts C ON C.contact_id = A.contact_id AND C.is_deleted = 0
+LEFT JOIN opportunities O ON O.opportunity_id = A.opportunity_id AND O.is_deleted = 0
+WHERE C.source_id = 'CONT070'
+AND A.timestamp >= CURDATE() - INTERVAL 6 MONTH
+AND A.is_deleted = 0
+ORDER BY A.timestamp DESC;
+
+-- Contact lookup by email (idx_contacts_email)
+SELECT C.source_id, C.first_name, C.last_name, C.phone, C.status, CO.name AS company
+FROM contacts C
+LEFT JOIN companies CO ON CO.company_id = C.company_id AND CO.is_deleted = 0
+WHERE C.email = 'first1.last1@company66.com'
+AND C.is_deleted = 0;